@@ -17,6 +17,7 @@ from backend.models.db import init_db, get_session
 from backend.routers import auth, emails, generate
 from backend.routers import sync as sync_router
 from backend.routers import send as send_router 
+from backend.services import draft_cache, email_gen, local_pool, sync_jobs, sync_scheduler
 
 
 class Settings(BaseSettings):
@@ -43,6 +44,20 @@ PORT = int(os.environ.get("PORT", 8000))
 @app.on_event("startup")
 def on_startup():
     init_db()
+    if draft_cache.DRAFT_CACHE_SHARED:
+        draft_cache.cache.share()
+    sync_jobs.pool.start()
+    email_gen.start_local_pool()
+    # scheduled jobs need workers in this process to run them
+    if sync_scheduler.SYNC_SCHEDULER_ENABLED and sync_jobs.SYNC_WORKERS > 0:
+        sync_scheduler.scheduler.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    sync_scheduler.scheduler.stop()
+    sync_jobs.pool.stop()
+    local_pool.pool.stop()
+    await email_gen.aclose_llm_client()
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request, session=Depends(get_session)):
@@ -1,13 +1,66 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import logging
+from sqlalchemy import create_engine, event, inspect, insert, select, text, Column, Integer, String, Boolean, DateTime, Text, Index
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
 from datetime import datetime
+from typing import Dict, List
 
 # Determine database path (use persistent disk if on Render)
 DEFAULT_DB = "/data/emailapp.db" if os.path.exists("/data") else "./emailapp.db"
 DB_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DEFAULT_DB}")
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {})
+# SQLite connection profile. "wal" lets inbox reads proceed while a sync holds
+# the write lock; "default" keeps SQLite's rollback journal and built-in settings.
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "wal").lower()
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    # NORMAL is durable across app crashes in WAL mode; only an OS crash can lose the last commits
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # wait for a competing writer instead of failing with "database is locked"
+    "busy_timeout": os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "mmap_size": os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    # negative = KiB, i.e. 64 MB of page cache per connection
+    "cache_size": os.environ.get("SQLITE_CACHE_SIZE", "-65536"),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+logger = logging.getLogger("db")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+def _is_memory_sqlite(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def make_engine(url: str = DB_URL, sqlite_profile: str = SQLITE_PROFILE):
+    """Create the app engine; file-backed SQLite gets a sized pool and the connect-time pragma profile."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    if _is_memory_sqlite(url):
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    eng = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if sqlite_profile == "wal":
+        @event.listens_for(eng, "connect")
+        def _apply_sqlite_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            for name, value in SQLITE_PRAGMAS.items():
+                cur.execute(f"PRAGMA {name}={value}")
+            cur.close()
+    return eng
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 class Base(DeclarativeBase):
@@ -15,6 +68,14 @@ class Base(DeclarativeBase):
 
 class Email(Base):
     __tablename__ = "emails"
+    __table_args__ = (
+        # one row per Gmail message per account, even with concurrent syncs
+        Index("ux_emails_user_gmail", "user_email", "gmail_id", unique=True),
+        # keyset pagination: WHERE user_email = ? AND (received_at, id) < (?, ?) ORDER BY received_at DESC, id DESC
+        Index("ix_emails_user_received", "user_email", "received_at", "id"),
+        # folder views: WHERE user_email = ? AND folder = ? ORDER BY received_at DESC, id DESC
+        Index("ix_emails_user_folder_received", "user_email", "folder", "received_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, index=True)
     gmail_id = Column(String, index=True)
@@ -26,9 +87,213 @@ class Email(Base):
     received_at = Column(DateTime, default=datetime.utcnow)
     is_spam = Column(Boolean, default=False)
     lang = Column(String, default="en")
+    # materialized at ingest/send time so folder views never pattern-match from_addr
+    is_sent = Column(Boolean, default=False)
+    folder = Column(String, default="inbox")  # inbox | spam | sent, see folder_for()
+
+def folder_for(is_sent: bool, is_spam: bool) -> str:
+    """The single folder a message is listed under; sent mail stays in Sent even if flagged spam."""
+    if is_sent:
+        return "sent"
+    return "spam" if is_spam else "inbox"
+
+def is_sent_by(user_email: str, from_addr: str) -> bool:
+    """True when the From header belongs to the mailbox owner (handles "Name <addr>" forms)."""
+    return bool(user_email) and user_email.lower() in (from_addr or "").lower()
+
+class SyncState(Base):
+    """Per-user Gmail sync checkpoint (historyId of the last completed sync)."""
+    __tablename__ = "sync_state"
+    user_email = Column(String, primary_key=True)
+    history_id = Column(String)
+    last_sync_at = Column(DateTime)
+
+class BackfillState(Base):
+    """Resumable full-mailbox backfill cursor and progress for one user."""
+    __tablename__ = "backfill_state"
+    user_email = Column(String, primary_key=True)
+    status = Column(String, default="idle")  # idle | running | done | failed
+    page_token = Column(String)  # next messages.list page to process; NULL = start/finished
+    pages = Column(Integer, default=0)
+    fetched = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # listed ids already stored, not re-fetched
+    inserted = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    total_estimate = Column(Integer)
+    error = Column(Text)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+class SyncJob(Base):
+    """
+    One queued/running/finished sync or backfill for a user. Rows persist so
+    a job id stays queryable and queued work survives a restart.
+    """
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        # worker claim: WHERE status = 'queued' ORDER BY id
+        Index("ix_sync_jobs_status_id", "status", "id"),
+        Index("ix_sync_jobs_user_status", "user_email", "status"),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, default="sync")  # sync | backfill
+    user_email = Column(String, nullable=False)
+    params = Column(Text)  # JSON keyword arguments for the job
+    status = Column(String, default="queued")  # queued | running | done | failed
+    fetched = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    deleted = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    result = Column(Text)  # JSON summary returned by the sync
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # renewed while a worker runs the job; a stale one means that worker's process is gone
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class DraftCacheEntry(Base):
+    """An LLM draft reply shared by every app worker (second tier of services/draft_cache)."""
+    __tablename__ = "draft_cache"
+    __table_args__ = (Index("ix_draft_cache_expires", "expires_at"),)
+    key = Column(String, primary_key=True)  # sha256 of provider, model, sampling params and rendered prompt
+    reply = Column(Text, nullable=False)  # JSON {"raw": ..., "parsed": {...}}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+def _unstored_email_rows(session: Session, rows: List[Dict], chunk: int = 500) -> List[Dict]:
+    """`rows` minus the (user_email, gmail_id) pairs already stored or repeated earlier in `rows`."""
+    by_user: Dict[str, List[str]] = {}
+    for r in rows:
+        by_user.setdefault(r.get("user_email"), []).append(r.get("gmail_id"))
+    seen = set()
+    for user_email, ids in by_user.items():
+        for start in range(0, len(ids), chunk):
+            seen.update((user_email, gid) for gid in session.scalars(
+                select(Email.gmail_id).where(Email.user_email == user_email, Email.gmail_id.in_(ids[start:start + chunk]))
+            ))
+    new = []
+    for r in rows:
+        key = (r.get("user_email"), r.get("gmail_id"))
+        if key not in seen:
+            seen.add(key)
+            new.append(r)
+    return new
+
+def insert_ignore_emails(session: Session, rows: List[Dict]) -> int:
+    """
+    Bulk-insert Email rows, silently skipping any (user_email, gmail_id) that
+    already exists. Returns the number of rows actually inserted.
+
+    SQLite and PostgreSQL skip duplicates in the INSERT itself (ON CONFLICT
+    DO NOTHING); other databases get the stored pairs filtered out first,
+    which a concurrent writer of the same rows can still race.
+    """
+    if not rows:
+        return 0
+    rows = [
+        {**r, "is_sent": bool(r.get("is_sent")), "folder": r.get("folder") or folder_for(r.get("is_sent"), r.get("is_spam"))}
+        for r in rows
+    ]
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    table = Email.__table__
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=["user_email", "gmail_id"])
+    else:
+        rows = _unstored_email_rows(session, rows)
+        if not rows:
+            return 0
+        stmt = insert(table)
+    # one executemany on the Core table: a single cached statement, no ORM identity-map work
+    return session.connection().execute(stmt, rows).rowcount
+
+def _migrate(conn):
+    """Upgrade tables created by older versions; create_all only adds missing tables."""
+    insp = inspect(conn)
+    columns = {c["name"] for c in insp.get_columns("emails")}
+    if "is_sent" not in columns:
+        conn.execute(text("ALTER TABLE emails ADD COLUMN is_sent BOOLEAN DEFAULT 0"))
+        conn.execute(text(
+            # instr(x, '') is 1: rows without an owner address are not sent mail
+            "UPDATE emails SET is_sent = COALESCE(user_email != '' "
+            "AND instr(lower(from_addr), lower(user_email)) > 0, 0)"
+        ))
+    if "folder" not in columns:
+        conn.execute(text("ALTER TABLE emails ADD COLUMN folder VARCHAR DEFAULT 'inbox'"))
+        conn.execute(text(
+            "UPDATE emails SET folder = CASE WHEN is_sent THEN 'sent' WHEN is_spam THEN 'spam' ELSE 'inbox' END"
+        ))
+
+    for table in ("backfill_state", "sync_jobs"):
+        if insp.has_table(table) and "skipped" not in {c["name"] for c in insp.get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN skipped INTEGER DEFAULT 0"))
+    if insp.has_table("sync_jobs") and "heartbeat_at" not in {c["name"] for c in insp.get_columns("sync_jobs")}:
+        conn.execute(text("ALTER TABLE sync_jobs ADD COLUMN heartbeat_at DATETIME"))
+
+    existing = {ix["name"] for ix in insp.get_indexes("emails")}
+    if "ux_emails_user_gmail" not in existing:
+        # drop duplicates left by the old check-then-insert sync before enforcing uniqueness
+        conn.execute(text(
+            "DELETE FROM emails WHERE id NOT IN "
+            "(SELECT MIN(id) FROM emails GROUP BY user_email, gmail_id)"
+        ))
+    for ix in Email.__table__.indexes:
+        if ix.name not in existing:
+            ix.create(conn)
+
+# External-content FTS5 index over the searchable columns of `emails`; the
+# triggers keep it in step with every insert, delete and content update.
+FTS_COLUMNS = ("subject", "from_addr", "to_addr", "body_text")
+_cols = ", ".join(FTS_COLUMNS)
+_new = ", ".join("new." + c for c in FTS_COLUMNS)
+_old = ", ".join("old." + c for c in FTS_COLUMNS)
+FTS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+      INSERT INTO emails_fts(rowid, {_cols}) VALUES (new.id, {_new});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN
+      INSERT INTO emails_fts(emails_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF {_cols} ON emails BEGIN
+      INSERT INTO emails_fts(emails_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old});
+      INSERT INTO emails_fts(rowid, {_cols}) VALUES (new.id, {_new});
+    END""",
+)
+
+def setup_fts(conn) -> bool:
+    """Create the emails_fts index and its triggers (SQLite only). Returns False if FTS5 is unavailable."""
+    if conn.dialect.name != "sqlite":
+        return False
+    created = "emails_fts" not in inspect(conn).get_table_names()
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5({_cols}, "
+            "content='emails', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+    except Exception as e:
+        logger.warning("SQLite FTS5 not available, /emails/search disabled: %s", e)
+        return False
+    for stmt in FTS_TRIGGERS:
+        conn.exec_driver_sql(stmt)
+    if created:
+        # index mail stored before search existed
+        conn.execute(text("INSERT INTO emails_fts(emails_fts) VALUES ('rebuild')"))
+    return True
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _migrate(conn)
+        setup_fts(conn)
 
 def get_session():
     db = SessionLocal()
@@ -1,7 +1,9 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional, List
 
-class EmailOut(BaseModel):
+class EmailListItem(BaseModel):
+    """Inbox row: everything the list view shows, without the message body."""
     id: int
     user_email: str
     gmail_id: str
@@ -9,12 +11,32 @@ class EmailOut(BaseModel):
     to_addr: str
     subject: str
     snippet: Optional[str] = ""
-    body_text: Optional[str] = ""
+    received_at: Optional[datetime] = None
     is_spam: bool
+    is_sent: Optional[bool] = False
+    folder: Optional[str] = "inbox"
     lang: str
     class Config:
         from_attributes = True
 
+class EmailOut(EmailListItem):
+    body_text: Optional[str] = ""
+
+class EmailPage(BaseModel):
+    items: List[EmailListItem]
+    # opaque keyset cursor for the next page; None when this is the last page
+    next_cursor: Optional[str] = None
+
+class SearchHit(EmailListItem):
+    # body/subject fragments with matches wrapped in <mark>...</mark>
+    highlight: str = ""
+    subject_highlight: str = ""
+    rank: float
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_offset: Optional[int] = None
+
 class DraftIn(BaseModel):
     prompt: str
     tone: str = "formal"
@@ -1,50 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from backend.models.db import Email, get_session
-from backend.models.schemas import EmailOut
+import re
+import base64
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text, tuple_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, load_only
+from typing import Optional, Tuple
+from backend.models.db import Email, folder_for, get_session, insert_ignore_emails
+from backend.models.schemas import EmailOut, EmailPage, SearchPage
 from backend.services import nlp
 
 router = APIRouter()
 
-@router.get("", response_model=List[EmailOut])
-def list_emails(folder: Optional[str] = "all", user_email: Optional[str] = None, session: Session = Depends(get_session)):
-    q = session.query(Email).order_by(Email.received_at.desc())
-    
+# columns hydrated for list rows; body_text stays unloaded until GET /emails/{id}
+LIST_COLUMNS = (
+    Email.id, Email.user_email, Email.gmail_id, Email.from_addr, Email.to_addr,
+    Email.subject, Email.snippet, Email.received_at, Email.is_spam, Email.is_sent, Email.folder, Email.lang,
+)
+
+def encode_cursor(em: Email) -> str:
+    raw = f"{em.received_at.isoformat()}|{em.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, email_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(email_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+# UI folder name -> materialized Email.folder value ("all" has no folder filter)
+FOLDERS = {"inbox": "inbox", "not_spam": "inbox", "spam": "spam", "sent": "sent"}
+
+def folder_query(session: Session, folder: Optional[str], user_email: Optional[str], cursor: Optional[str] = None):
+    """
+    Newest-first query for one folder view.
+
+    Every filter is an equality on an indexed column, so with a user_email
+    the whole query (filter, keyset cursor and ORDER BY) is served by
+    ix_emails_user_folder_received / ix_emails_user_received without a scan
+    or sort. Keyset pagination on (received_at, id) makes page N cost the
+    same as page 1, and rows inserted meanwhile cannot shift later pages.
+    """
+    q = (
+        session.query(Email)
+        .options(load_only(*LIST_COLUMNS, raiseload=True))
+        .order_by(Email.received_at.desc(), Email.id.desc())
+    )
     # Filter by user if provided (multi-user support)
     if user_email:
         q = q.filter(Email.user_email == user_email)
+    if folder in FOLDERS:
+        q = q.filter(Email.folder == FOLDERS[folder])
+    if cursor:
+        q = q.filter(tuple_(Email.received_at, Email.id) < tuple_(*decode_cursor(cursor)))
+    return q
+
+@router.get("", response_model=EmailPage)
+def list_emails(
+    folder: Optional[str] = "all",
+    user_email: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session: Session = Depends(get_session),
+):
+    rows = folder_query(session, folder, user_email, cursor).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+def fts_query(q: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must match
+    (implicit AND), words are quoted so FTS operators/punctuation in user
+    input cannot cause syntax errors, and the last word is a prefix match so
+    results update while typing.
+    """
+    terms = [t for t in re.split(r"\s+", q.strip()) if t]
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    if quoted:
+        quoted[-1] += "*"
+    return " ".join(quoted)
 
-    if folder == "sent":
-        # Sent emails: from the user
-        if user_email:
-            q = q.filter(Email.from_addr.ilike(f"%{user_email}%"))
-    elif folder == "inbox":
-        q = q.filter(Email.is_spam == False)
-        if user_email:
-            q = q.filter(Email.from_addr.notilike(f"%{user_email}%"))
-    elif folder == "spam":
-        q = q.filter(Email.is_spam == True)
-    elif folder == "not_spam":
-        q = q.filter(Email.is_spam == False)
-        # Exclude sent emails from "Not Spam" (Inbox) view if user_email is known
-        if user_email:
-            q = q.filter(Email.from_addr.notilike(f"%{user_email}%"))
-    
-    return q.all()
+# bm25 column weights, in FTS_COLUMNS order: subject, from_addr, to_addr, body_text
+_SEARCH_SQL = """
+SELECT e.id, e.user_email, e.gmail_id, e.from_addr, e.to_addr, e.subject, e.snippet,
+       e.received_at, e.is_spam, e.is_sent, e.folder, e.lang,
+       snippet(emails_fts, -1, '<mark>', '</mark>', '…', 16) AS highlight,
+       highlight(emails_fts, 0, '<mark>', '</mark>') AS subject_highlight,
+       bm25(emails_fts, 5.0, 3.0, 1.0, 1.0) AS rank
+FROM emails_fts
+JOIN emails e ON e.id = emails_fts.rowid
+WHERE emails_fts MATCH :match {filters}
+ORDER BY rank
+LIMIT :limit OFFSET :offset
+"""
+
+@router.get("/search", response_model=SearchPage)
+def search_emails(
+    q: str = Query(..., min_length=1, description="Words to find in subject, from/to and body"),
+    user_email: Optional[str] = None,
+    folder: Optional[str] = "all",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+):
+    match = fts_query(q)
+    if not match:
+        return {"items": [], "next_offset": None}
+    filters, params = "", {"match": match, "limit": limit + 1, "offset": offset}
+    if user_email:
+        filters += " AND e.user_email = :user_email"
+        params["user_email"] = user_email
+    if folder in FOLDERS:
+        filters += " AND e.folder = :folder"
+        params["folder"] = FOLDERS[folder]
+    try:
+        rows = session.execute(text(_SEARCH_SQL.format(filters=filters)), params).mappings().all()
+    except OperationalError as e:
+        if "no such table" in str(e):
+            raise HTTPException(501, "Full-text search is not available on this database")
+        raise
+    items = [dict(r) for r in rows[:limit]]
+    for it in items:
+        # raw SQL returns SQLite's text timestamps
+        if isinstance(it["received_at"], str):
+            it["received_at"] = datetime.fromisoformat(it["received_at"])
+    return {"items": items, "next_offset": offset + limit if len(rows) > limit else None}
+
+@router.get("/{email_id:int}", response_model=EmailOut)
+def get_email(email_id: int, session: Session = Depends(get_session)):
+    em = session.get(Email, email_id)
+    if not em:
+        raise HTTPException(404, "Email not found")
+    return em
 
 @router.post("/ingest/sample")
 def ingest_sample(session: Session = Depends(get_session)):
     # Seed a few emails to demo UI
     samples = [
-        Email(user_email="demo@user", gmail_id="local1", from_addr="hr@company.com", to_addr="you@demo", subject="Interview schedule", body_text="Can we schedule a meeting this Friday? Share your available slots.", is_spam=False, lang="en"),
-        Email(user_email="demo@user", gmail_id="local2", from_addr="lotto@scam.com", to_addr="you@demo", subject="You WIN money!!!", body_text="Claim your urgent reward now, 100% free!", is_spam=True, lang="en"),
-        Email(user_email="demo@user", gmail_id="local3", from_addr="prof@uni.edu", to_addr="you@demo", subject="Assignment submission", body_text="Please submit the report by Monday. Attach the PDF.", is_spam=False, lang="en"),
+        dict(user_email="demo@user", gmail_id="local1", from_addr="hr@company.com", to_addr="you@demo", subject="Interview schedule", body_text="Can we schedule a meeting this Friday? Share your available slots.", is_spam=False, lang="en"),
+        dict(user_email="demo@user", gmail_id="local2", from_addr="lotto@scam.com", to_addr="you@demo", subject="You WIN money!!!", body_text="Claim your urgent reward now, 100% free!", is_spam=True, lang="en"),
+        dict(user_email="demo@user", gmail_id="local3", from_addr="prof@uni.edu", to_addr="you@demo", subject="Assignment submission", body_text="Please submit the report by Monday. Attach the PDF.", is_spam=False, lang="en"),
     ]
-    for s in samples:
-        session.add(s)
+    inserted = insert_ignore_emails(session, samples)
     session.commit()
-    return {"ok": True, "count": len(samples)}
+    return {"ok": True, "count": inserted}
 
 @router.post("/mark/{email_id}")
 def mark_email(email_id: int, spam: bool, session: Session = Depends(get_session)):
@@ -52,6 +153,7 @@ def mark_email(email_id: int, spam: bool, session: Session = Depends(get_session
     if not em:
         raise HTTPException(404, "Email not found")
     em.is_spam = spam
+    em.folder = folder_for(em.is_sent, spam)
     session.add(em)
     session.commit()
     return {"ok": True}
@@ -1,8 +1,12 @@
 # backend/routers/generate.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
 import logging
-from backend.services.email_gen import generate_email_json_forced
+from backend.services import draft_batch, draft_cache, local_pool
+from backend.services.email_gen import agenerate_email_json_forced, draft_parse_stats, llm_flight_stats, llm_provider_stats
+from backend.services.draft_stream import stream_draft_events
 
 # simple logger
 logger = logging.getLogger("generate_router")
@@ -21,18 +25,103 @@ class DraftReq(BaseModel):
     length: str = "medium"
     target_lang: str = "en"
     sender_name: str = ""  # Name of the logged-in user for signature
+    cache: Literal["use", "refresh", "off"] = "use"  # refresh = regenerate and replace the cached reply
+
+def _cache_mode(req: DraftReq, cache_control: Optional[str]) -> str:
+    """Standard Cache-Control request directives also work: no-store -> off, no-cache -> refresh."""
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    if "no-store" in directives:
+        return "off"
+    if "no-cache" in directives and req.cache == "use":
+        return "refresh"
+    return req.cache
 
 @router.post("/draft")
-def create_draft(req: DraftReq):
+async def create_draft(req: DraftReq, cache_control: Optional[str] = Header(None)):
     try:
         logger.info("generate/draft request prompt=%s tone=%s length=%s sender=%s", (req.prompt or "")[:120], req.tone, req.length, req.sender_name)
-        out = generate_email_json_forced(req.prompt, tone=req.tone, length=req.length, target_lang=req.target_lang, sender_name=req.sender_name)
+        out = await agenerate_email_json_forced(req.prompt, tone=req.tone, length=req.length, target_lang=req.target_lang, sender_name=req.sender_name,
+                                                 cache=_cache_mode(req, cache_control))
         logger.info("Model raw (first 400 chars): %s", out.get("raw", "")[:400])
         return out
     except Exception as e:
         logger.exception("Error generating draft")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/draft/stream")
+async def stream_draft(req: DraftReq, cache_control: Optional[str] = Header(None)):
+    """Same draft as /draft, sent as Server-Sent Events while the model writes it (see services/draft_stream)."""
+    logger.info("generate/draft/stream request prompt=%s tone=%s length=%s sender=%s", (req.prompt or "")[:120], req.tone, req.length, req.sender_name)
+    events = stream_draft_events(req.prompt, tone=req.tone, length=req.length, target_lang=req.target_lang,
+                                 sender_name=req.sender_name, cache=_cache_mode(req, cache_control))
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class BatchDraftItem(BaseModel):
+    id: Optional[str] = None  # echoed back, to match results to recipients
+    prompt: Optional[str] = None  # or fill the batch template from `variables`
+    variables: Dict[str, str] = {}
+    tone: Optional[str] = None  # per-item overrides of the batch settings
+    length: Optional[str] = None
+    target_lang: Optional[str] = None
+    sender_name: Optional[str] = None
+
+class DraftBatchReq(BaseModel):
+    items: List[BatchDraftItem]
+    template: Optional[str] = None  # e.g. "invite {name} to the {event} on {date}"
+    tone: str = "formal"
+    length: str = "medium"
+    target_lang: str = "en"
+    sender_name: str = ""
+    concurrency: Optional[int] = None  # drafts in flight at once, up to DRAFT_BATCH_CONCURRENCY
+    cache: Literal["use", "refresh", "off"] = "use"
+
+@router.post("/drafts/batch")
+async def batch_drafts(req: DraftBatchReq, cache_control: Optional[str] = Header(None)):
+    """Many drafts in one request, streamed back as NDJSON as each completes (see services/draft_batch)."""
+    if len(req.items) > draft_batch.DRAFT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {draft_batch.DRAFT_BATCH_MAX_ITEMS} items per batch")
+    if not req.template and any(not item.prompt for item in req.items):
+        raise HTTPException(status_code=422, detail="Each item needs a prompt, or the batch a template")
+    concurrency = max(1, min(req.concurrency or draft_batch.DRAFT_BATCH_CONCURRENCY, draft_batch.DRAFT_BATCH_CONCURRENCY))
+    logger.info("generate/drafts/batch request items=%d template=%s concurrency=%d", len(req.items), bool(req.template), concurrency)
+    lines = draft_batch.stream_batch_lines(
+        [item.model_dump() for item in req.items], template=req.template,
+        defaults={"tone": req.tone, "length": req.length, "target_lang": req.target_lang, "sender_name": req.sender_name},
+        concurrency=concurrency, cache=_cache_mode(req, cache_control))
+    return StreamingResponse(lines, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/cache")
+def cache_stats():
+    """Draft cache hit/miss counters for this worker (the shared tier's rows are not counted)."""
+    return draft_cache.cache.stats()
+
+@router.delete("/cache")
+def clear_cache():
+    draft_cache.cache.clear()
+    return {"cleared": True}
+
+@router.get("/inflight")
+def inflight_stats():
+    """LLM calls coalesced with an identical in-flight call (singleflight counters)."""
+    return llm_flight_stats()
+
+@router.get("/parsing")
+def parsing_stats():
+    """How draft replies parsed (native JSON, repaired, unparsed) and how often the retry call still ran."""
+    return draft_parse_stats()
+
+@router.get("/providers")
+def provider_stats():
+    """Provider pool routing (breakers, rolling latency/error rates, latency histograms, recent decisions) and rate limits."""
+    return llm_provider_stats()
+
+@router.get("/local")
+def local_model_stats():
+    """Local model worker pool: workers alive/busy, queue depth, timeouts and respawns, queue wait and generation latency."""
+    return local_pool.pool.stats()
+
 class SummaryReq(BaseModel):
     text: str
     length: int = 3
@@ -2,10 +2,9 @@ import base64
 from email.mime.text import MIMEText
 from fastapi import APIRouter, HTTPException, Depends  # type: ignore
 from pydantic import BaseModel  # type: ignore
-from googleapiclient.discovery import build
 from sqlalchemy.orm import Session  # type: ignore
-from backend.models.db import get_session, Email
-from backend.routers.sync import load_creds
+from backend.models.db import get_session, insert_ignore_emails
+from backend.services.gmail import user_service
 
 router = APIRouter(tags=["send"])
 
@@ -42,11 +41,8 @@ def send_email(req: SendEmailRequest, session: Session = Depends(get_session)):
     user_email = req.user_email.strip().lower()
     
     try:
-        # Load credentials for the user
-        creds = load_creds(user_email)
-        
-        # Build Gmail service
-        service = build("gmail", "v1", credentials=creds)
+        # Cached per-user Gmail client (credentials loaded/refreshed as needed)
+        service = user_service(user_email)
         
         # Create the message
         message = create_message(user_email, req.to, req.subject, req.body)
@@ -55,7 +51,8 @@ def send_email(req: SendEmailRequest, session: Session = Depends(get_session)):
         sent_message = service.users().messages().send(userId="me", body=message).execute()
         
         # Save to local DB so it appears in "Sent" immediately
-        new_email = Email(
+        # (insert-or-ignore: a concurrent sync may already have stored this id)
+        insert_ignore_emails(session, [dict(
             user_email=user_email,
             gmail_id=sent_message.get("id"),
             from_addr=user_email,
@@ -64,9 +61,9 @@ def send_email(req: SendEmailRequest, session: Session = Depends(get_session)):
             snippet=req.body[:100], # Simple snippet
             body_text=req.body,
             is_spam=False,
+            is_sent=True,
             lang="en"
-        )
-        session.add(new_email)
+        )])
         session.commit()
 
         return {
@@ -1,83 +1,68 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from sqlalchemy.orm import Session
-from backend.models.db import Email, get_session
-from backend.services.gmail import fetch_messages
-from backend.services import nlp  # optional: for spam prediction
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-import os, json
+from backend.models.db import SyncJob, get_session
+from backend.services.gmail import load_creds, token_path_for as _token_path_for  # noqa: F401 (re-exported)
+from backend.services.mail_sync import backfill_progress, get_backfill_state
+from backend.services.sync_jobs import active_job, enqueue_job, job_progress
+from backend.services.sync_scheduler import scheduler
+from backend.services.ingest_pipeline import pipeline_stats
+import os
 
 router = APIRouter(tags=["sync"])
 
-def _token_path_for(email_addr: str) -> str:
-    # Use persistent disk on Render if available
-    base_dir = "/data/tokens" if os.path.exists("/data") else os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "models"))
-    return os.path.join(base_dir, f"token_{email_addr}.json")
+def _require_token(user_email: str):
+    if not os.path.exists(_token_path_for(user_email)):
+        raise HTTPException(400, "Token file not found. Sign in via /auth/google first.")
 
-def load_creds(email_addr: str) -> Credentials:
-    token_path = _token_path_for(email_addr)
-    if not os.path.exists(token_path):
-        raise FileNotFoundError("Token file not found. Sign in via /auth/google first.")
-    with open(token_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    creds = Credentials(**data)
-
-    # Refresh if needed (uses stored refresh_token)
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        # persist refreshed access token
-        with open(token_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "token": creds.token,
-                "refresh_token": creds.refresh_token,
-                "token_uri": creds.token_uri,
-                "client_id": creds.client_id,
-                "client_secret": creds.client_secret,
-                "scopes": creds.scopes,
-            }, f)
-    return creds
-
-@router.post("/emails/sync")
+@router.post("/emails/sync", status_code=202)
 def sync_emails(
     user_email: str = Query(..., description="Your Gmail address used to sign in"),
     max_results: int = 50,
+    full: bool = Query(False, description="Ignore the stored checkpoint and re-list the newest messages"),
     session: Session = Depends(get_session),
 ):
-    try:
-        creds = load_creds(user_email)
-    except FileNotFoundError as e:
-        raise HTTPException(400, str(e))
+    """Queue a sync and return at once; poll GET /emails/sync/{job_id} for the outcome."""
+    _require_token(user_email)
+    job = enqueue_job(session, user_email, "sync", max_results=max_results, full=full)
+    return {"ok": True, **job_progress(job)}
 
-    svc = build("gmail", "v1", credentials=creds)
-    # fetch_messages returns minimal decoded fields
-    msgs = fetch_messages(svc, max_results=max_results)
+@router.get("/emails/sync/scheduler")
+def sync_scheduler_state():
+    """Background scheduler: per-account interval, next run and last sync latency."""
+    return scheduler.state()
 
-    created = 0
-    for m in msgs:
-        # idempotency: skip if already saved
-        exists = session.query(Email).filter_by(gmail_id=m["gmail_id"], user_email=user_email).first()
-        if exists:
-            continue
+@router.get("/emails/sync/pipeline")
+def sync_pipeline_stats():
+    """Per-stage ingest throughput (fetch/parse/lang/spam/write), since start-up and for the last run."""
+    return pipeline_stats()
 
-        # optional auto-spam
-        try:
-            is_spam = nlp.predict_spam(f"{m.get('subject','')} {m.get('body_text','')}")
-        except Exception:
-            is_spam = False  # fallback
+@router.get("/emails/sync/{job_id}")
+def sync_job_status(job_id: int, session: Session = Depends(get_session)):
+    job = session.get(SyncJob, job_id)
+    if not job:
+        raise HTTPException(404, "Sync job not found")
+    return job_progress(job)
 
-        session.add(Email(
-            user_email=user_email,
-            gmail_id=m.get("gmail_id",""),
-            from_addr=m.get("from_addr",""),
-            to_addr=m.get("to_addr",""),
-            subject=m.get("subject",""),
-            snippet=m.get("snippet",""),
-            body_text=m.get("body_text",""),
-            is_spam=is_spam,
-            lang="en",
-        ))
-        created += 1
+@router.post("/emails/backfill", status_code=202)
+def start_backfill(
+    user_email: str = Query(..., description="Your Gmail address used to sign in"),
+    restart: bool = Query(False, description="Discard the saved cursor and walk the mailbox from the start"),
+    session: Session = Depends(get_session),
+):
+    _require_token(user_email)
+    if active_job(session, user_email, "backfill"):
+        raise HTTPException(409, "A backfill is already queued or running for this account.")
+    job = enqueue_job(session, user_email, "backfill", restart=restart)
+    state = get_backfill_state(session, user_email)
+    session.commit()
+    return {"ok": True, "started": True, "job_id": job.id, **backfill_progress(state)}
 
+@router.get("/emails/backfill")
+def backfill_status(
+    user_email: str = Query(..., description="Your Gmail address used to sign in"),
+    session: Session = Depends(get_session),
+):
+    state = get_backfill_state(session, user_email)
+    job = active_job(session, user_email, "backfill")
     session.commit()
-    return {"ok": True, "inserted": created}
+    return {**backfill_progress(state), "job_id": job.id if job else None}
@@ -0,0 +1,99 @@
+# backend/services/draft_batch.py
+"""
+Batch draft generation for /generate/drafts/batch (mail merge).
+
+Each item is drafted through agenerate_email_json_forced, like /generate/draft,
+so the draft cache, singleflight, provider failover and rate limits apply per
+item. At most `concurrency` items are in flight at once (DRAFT_BATCH_CONCURRENCY;
+LLM_MAX_CONCURRENCY still caps calls across all requests). Items come from a
+prompt each, or from the batch template with the item's variables filled in.
+
+Results are NDJSON, one line per item in completion order; a failed item gets
+its own line and the rest of the batch carries on:
+  {index, id, ok: true, draft: {subject, body, intent, language, cached}, ms}
+  {index, id, ok: false, error, ms}
+  {done: true, total, succeeded, failed, elapsed_ms, drafts_per_s}   always last
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+from backend.services import email_gen
+
+DRAFT_BATCH_CONCURRENCY = int(os.getenv("DRAFT_BATCH_CONCURRENCY", "8"))
+DRAFT_BATCH_MAX_ITEMS = int(os.getenv("DRAFT_BATCH_MAX_ITEMS", "500"))
+
+logger = logging.getLogger("draft_batch")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+_PLACEHOLDER = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+
+
+def render_template(template: str, variables: Dict[str, str]) -> str:
+    """Fill {name} placeholders from `variables`; {{ and }} are literal braces."""
+    def fill(m):
+        if m.group(1) is None:
+            return m.group(0)[0]
+        if m.group(1) not in variables:
+            raise ValueError(f"Missing template variable: {m.group(1)}")
+        return str(variables[m.group(1)])
+    return _PLACEHOLDER.sub(fill, template)
+
+
+async def _draft_item(index: int, item: Dict, template: Optional[str], defaults: Dict, cache: str) -> Dict:
+    start = time.perf_counter()
+    line = {"index": index, "id": item.get("id")}
+    try:
+        prompt = item.get("prompt") or render_template(template or "", item.get("variables") or {})
+        opts = {k: item.get(k) if item.get(k) is not None else defaults.get(k, "")
+                for k in ("tone", "length", "target_lang", "sender_name")}
+        out = await email_gen.agenerate_email_json_forced(prompt, cache=cache, **opts)
+        line.update(ok=True, draft={k: v for k, v in out.items() if k != "raw"})
+    except Exception as e:
+        logger.warning("batch item %d failed: %s", index, e)
+        line.update(ok=False, error=str(e))
+    line["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return line
+
+
+async def stream_batch_lines(
+    items: List[Dict],
+    template: Optional[str] = None,
+    defaults: Optional[Dict] = None,
+    concurrency: int = DRAFT_BATCH_CONCURRENCY,
+    cache: str = "use",
+) -> AsyncIterator[str]:
+    """NDJSON lines for the batch; `items` are dicts of id, prompt or variables, and per-item draft options."""
+    start = time.perf_counter()
+    defaults = {"tone": "formal", "length": "medium", "target_lang": "en", "sender_name": "", **(defaults or {})}
+    results: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(items))
+
+    async def worker():
+        for index, item in pending:  # shared: each worker takes the next undrafted item
+            results.put_nowait(await _draft_item(index, item, template, defaults, cache))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    succeeded = 0
+    try:
+        for _ in range(len(items)):
+            line = await results.get()
+            succeeded += line["ok"]
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        elapsed = time.perf_counter() - start
+        yield json.dumps({"done": True, "total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded,
+                          "elapsed_ms": round(elapsed * 1000, 1),
+                          "drafts_per_s": round(len(items) / elapsed, 2) if elapsed else None}) + "\n"
+    finally:
+        # client gone (or done): stop drafting the rest
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
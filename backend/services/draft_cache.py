@@ -0,0 +1,258 @@
+# backend/services/draft_cache.py
+"""
+Cache of LLM draft replies, so repeated requests (support-team templates,
+double clicks) skip the model.
+
+The key is a hash of exactly what would be sent to the model: provider,
+model, sampling parameters and the rendered chat messages (which already
+contain the normalized prompt, tone, length and language). The value is
+the model's reply, not the finished draft: finalize_draft runs on every
+hit, so weekday dates stay current and the sender's name is applied
+without splitting the cache per user.
+
+Two tiers: an in-process LRU with TTL, and (DRAFT_CACHE_SHARED=1) the
+draft_cache table, so all uvicorn workers share hits. The app attaches the
+shared tier at startup, once init_db has created the table; standalone
+scripts stay memory-only. It is best effort: a database error there is
+logged and treated as a miss.
+
+Per-request modes: "use" (default), "refresh" (skip the lookup, store the
+new reply), "off" (neither read nor write).
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from backend.models.db import DraftCacheEntry, SessionLocal
+
+DRAFT_CACHE_ENABLED = os.getenv("DRAFT_CACHE_ENABLED", "1") == "1"
+# entries kept in each worker's memory
+DRAFT_CACHE_SIZE = int(os.getenv("DRAFT_CACHE_SIZE", "512"))
+# seconds a reply stays valid, in both tiers
+DRAFT_CACHE_TTL = float(os.getenv("DRAFT_CACHE_TTL", "86400"))
+# share replies across workers through the app database
+DRAFT_CACHE_SHARED = os.getenv("DRAFT_CACHE_SHARED", "1") == "1"
+# expired shared rows are purged every this many stores
+DRAFT_CACHE_PURGE_EVERY = 200
+
+CACHE_MODES = ("use", "refresh", "off")
+_EPOCH = datetime(1970, 1, 1)
+
+logger = logging.getLogger("draft_cache")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+def _utc(ts: float) -> datetime:
+    """Clock seconds as the naive UTC datetimes the models use."""
+    return _EPOCH + timedelta(seconds=ts)
+
+
+def cache_key(messages: List[Dict], provider: str, model: str, temperature: float, max_tokens: int,
+              schema: Optional[Dict] = None) -> str:
+    parts = [provider, model, temperature, max_tokens, messages] + ([schema] if schema else [])
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _upsert(session: Session, row: Dict):
+    """Insert or replace one draft_cache row in a single statement, so concurrent workers never collide."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        session.merge(DraftCacheEntry(**row))
+        return
+    stmt = dialect_insert(DraftCacheEntry.__table__).values(**row)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["key"],
+        set_={c: stmt.excluded[c] for c in ("reply", "created_at", "expires_at")},
+    ))
+
+
+class DraftCache:
+    def __init__(
+        self,
+        max_size: int = DRAFT_CACHE_SIZE,
+        ttl: float = DRAFT_CACHE_TTL,
+        session_factory: Optional[Callable[[], Session]] = None,
+        enabled: bool = DRAFT_CACHE_ENABLED,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.session_factory = session_factory
+        self.enabled = enabled and max_size > 0 and ttl > 0
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, reply)
+        self._shared_stores = 0
+        self._counts = dict.fromkeys(
+            ("memory_hits", "shared_hits", "misses", "bypassed", "stores", "evictions", "expired", "shared_errors"), 0)
+
+    def share(self, session_factory: Callable[[], Session] = SessionLocal):
+        """Use the draft_cache table as the second tier."""
+        self.session_factory = session_factory
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counts[name] += n
+
+    # ---- lookups ----
+    def get(self, key: str, mode: str = "use") -> Optional[Dict]:
+        if not self._readable(mode):
+            return None
+        reply = self._memory_get(key)
+        if reply is None and self.session_factory is not None:
+            reply = self._shared_get(key)
+        if reply is None:
+            self._count("misses")
+        return reply
+
+    async def aget(self, key: str, mode: str = "use") -> Optional[Dict]:
+        """get() without blocking the event loop on the shared tier."""
+        if not self._readable(mode):
+            return None
+        reply = self._memory_get(key)
+        if reply is None and self.session_factory is not None:
+            reply = await asyncio.to_thread(self._shared_get, key)
+        if reply is None:
+            self._count("misses")
+        return reply
+
+    def _readable(self, mode: str) -> bool:
+        if not self.enabled:
+            return False
+        if mode != "use":
+            self._count("bypassed")
+            return False
+        return True
+
+    def _memory_get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                self._counts["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["memory_hits"] += 1
+            return entry[1]
+
+    def _shared_get(self, key: str) -> Optional[Dict]:
+        now = self.clock()
+        try:
+            session = self.session_factory()
+            try:
+                row = session.execute(
+                    select(DraftCacheEntry.reply, DraftCacheEntry.expires_at)
+                    .where(DraftCacheEntry.key == key, DraftCacheEntry.expires_at > _utc(now))
+                ).first()
+            finally:
+                session.close()
+        except Exception:
+            logger.warning("Shared draft cache lookup failed", exc_info=True)
+            self._count("shared_errors")
+            return None
+        if row is None:
+            return None
+        reply = json.loads(row.reply)
+        # keep the shared expiry so a copy never outlives the row it came from
+        expires = (row.expires_at - _EPOCH).total_seconds()
+        self._memory_put(key, reply, expires, count=False)
+        self._count("shared_hits")
+        return reply
+
+    # ---- stores ----
+    def put(self, key: str, reply: Dict, mode: str = "use"):
+        if not self.enabled or mode == "off":
+            return
+        expires = self.clock() + self.ttl
+        self._memory_put(key, reply, expires)
+        if self.session_factory is not None:
+            self._shared_put(key, reply, expires)
+
+    async def aput(self, key: str, reply: Dict, mode: str = "use"):
+        if not self.enabled or mode == "off":
+            return
+        expires = self.clock() + self.ttl
+        self._memory_put(key, reply, expires)
+        if self.session_factory is not None:
+            await asyncio.to_thread(self._shared_put, key, reply, expires)
+
+    def _memory_put(self, key: str, reply: Dict, expires: float, count: bool = True):
+        with self._lock:
+            self._entries[key] = (expires, reply)
+            self._entries.move_to_end(key)
+            if count:
+                self._counts["stores"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def _shared_put(self, key: str, reply: Dict, expires: float):
+        now = self.clock()
+        try:
+            session = self.session_factory()
+            try:
+                _upsert(session, dict(key=key, reply=json.dumps(reply), created_at=_utc(now), expires_at=_utc(expires)))
+                with self._lock:
+                    self._shared_stores += 1
+                    purge = self._shared_stores % DRAFT_CACHE_PURGE_EVERY == 0
+                if purge:
+                    session.execute(delete(DraftCacheEntry).where(DraftCacheEntry.expires_at <= _utc(now)))
+                session.commit()
+            finally:
+                session.close()
+        except Exception:
+            logger.warning("Shared draft cache store failed", exc_info=True)
+            self._count("shared_errors")
+
+    # ---- admin ----
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.session_factory is not None:
+            session = self.session_factory()
+            try:
+                session.execute(delete(DraftCacheEntry))
+                session.commit()
+            finally:
+                session.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        hits = counts["memory_hits"] + counts["shared_hits"]
+        lookups = hits + counts["misses"]
+        return {
+            "enabled": self.enabled,
+            "shared": self.session_factory is not None,
+            "entries": entries,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            **counts,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+        }
+
+
+cache = DraftCache()
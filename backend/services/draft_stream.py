@@ -0,0 +1,96 @@
+# backend/services/draft_stream.py
+"""
+Streaming draft generation for /generate/draft/stream.
+
+The model is asked for the same {"subject": ..., "body": ...} object as the
+non-streaming path. DraftJSONStream (services/json_repair) picks the two
+string values out of the reply while it is still arriving, so their text can
+be forwarded as Server-Sent Events; the final `done` event carries the post-processed draft
+(weekday dates, signature) and is what clients should keep.
+
+Events (each `data:` is a JSON object):
+  start  {intent, provider, model}
+  subject / body  {delta}           decoded text as it streams
+  reset  {}                         reply was not valid JSON; discard deltas, a retry follows
+  done   {<draft>, timing: {first_token_ms, total_ms}}   (a cache hit goes straight to done)
+  error  {detail}
+"""
+import json
+import time
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+from backend.services import draft_cache, email_gen
+from backend.services.json_repair import DraftJSONStream
+
+logger = logging.getLogger("draft_stream")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+def sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_draft_events(
+    user_prompt: str,
+    tone: str = "formal",
+    length: str = "medium",
+    target_lang: str = "en",
+    intent: Optional[str] = None,
+    model: Optional[str] = None,
+    sender_name: str = "",
+    cache: str = "use",
+) -> AsyncIterator[str]:
+    """SSE frames for one draft; errors become an `error` event since the response has already started."""
+    start = time.perf_counter()
+    model = model or email_gen.MODEL
+    first_token_ms = None
+    try:
+        messages, intent = email_gen.build_draft_messages(user_prompt, tone, length, target_lang, intent)
+        yield sse("start", {"intent": intent, "provider": email_gen.PROVIDER, "model": model})
+
+        max_tokens = email_gen.draft_max_tokens(length, target_lang)
+        key = email_gen.draft_cache_key(messages, model, max_tokens)
+        hit = await draft_cache.cache.aget(key, cache)
+        if hit is not None:
+            draft = email_gen.finalize_draft(hit["raw"], hit["parsed"], user_prompt, intent, target_lang, sender_name, cached=True)
+            draft["timing"] = {"first_token_ms": None, "total_ms": round((time.perf_counter() - start) * 1000, 1)}
+            yield sse("done", draft)
+            return
+
+        parser = DraftJSONStream()
+        pieces: List[str] = []
+        served: List[str] = []
+        async for piece in email_gen.allm_stream(messages, model=model, temperature=0.2, max_tokens=max_tokens,
+                                                 schema=email_gen.draft_schema(), served=served):
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+            pieces.append(piece)
+            for field, delta in parser.feed(piece):
+                yield sse(field, {"delta": delta})
+
+        raw_str, parsed = email_gen.parse_draft_reply("".join(pieces))
+        logger.info("LLM streamed reply: %s", raw_str[:400])
+        if parsed is None:
+            # same single strict retry as the non-streaming path, without streaming it
+            yield sse("reset", {})
+            email_gen.add_retry_instruction(messages)
+            raw = await email_gen.allm_chat(messages, model=model, temperature=0.2, max_tokens=max_tokens,
+                                            schema=email_gen.draft_schema())
+            raw_str, parsed = email_gen.parse_draft_reply(raw)
+            logger.info("LLM raw reply (retry): %s", raw_str[:400])
+            served.append(getattr(raw, "provider", email_gen.PROVIDER))
+
+        # the key names LLM_PROVIDER: a fallback's reply is not cached under it
+        if parsed is not None and served[-1:] == [email_gen.PROVIDER]:
+            await draft_cache.cache.aput(key, {"raw": raw_str, "parsed": parsed}, cache)
+        draft = email_gen.finalize_draft(raw_str, parsed, user_prompt, intent, target_lang, sender_name)
+        draft["timing"] = {"first_token_ms": first_token_ms, "total_ms": round((time.perf_counter() - start) * 1000, 1)}
+        yield sse("done", draft)
+    except Exception as e:
+        logger.exception("Streaming draft failed")
+        yield sse("error", {"detail": str(e)})
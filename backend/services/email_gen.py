@@ -3,7 +3,7 @@
 Drop-in email generation service that forces JSON output.
 
 Requirements:
-  pip install openai requests python-dateutil
+  pip install openai requests httpx python-dateutil
 
 Environment:
   LLM_PROVIDER - optional (default: "openai", options: "openai", "gemini", "ollama")
@@ -11,18 +11,33 @@ Environment:
   GEMINI_API_KEY - required if LLM_PROVIDER=gemini
   EMAIL_GEN_MODEL - optional (default: gpt-3.5-turbo for openai, gemini-2.5-flash for gemini, llama2 for ollama, tinyllama for local)
   LOCAL_MODEL_PATH - optional (path to GGUF file for local provider)
+  LOCAL_WORKERS / LOCAL_THREADS / LOCAL_TIMEOUT / LOCAL_QUEUE_MAX - optional local model worker processes (services/local_pool)
+  LOCAL_BACKEND / LOCAL_PREFIX_CACHE - optional (default: llama_cpp when installed, on) reuse the evaluated prompt prefix
+  GEMINI_API_BASE / OPENAI_API_BASE / OLLAMA_HOST - optional endpoint overrides (proxies, local fakes)
+  LLM_MAX_CONCURRENCY - optional (default: 8) LLM calls in flight at once on the async path
+  LLM_HTTP_TIMEOUT / LLM_MAX_CONNECTIONS - optional async HTTP client limits
+  LLM_SINGLEFLIGHT / LLM_SINGLEFLIGHT_TIMEOUT - optional (default: on, 120s) share one upstream call between concurrent identical requests
+  LLM_FALLBACK_PROVIDERS - optional (e.g. "openai,ollama,local") providers tried after LLM_PROVIDER; GEMINI_MODEL / OPENAI_MODEL / OLLAMA_MODEL / LOCAL_MODEL pick their models
+  LLM_PROVIDER_TIMEOUT / LLM_HEDGE / LLM_BREAKER_* - optional failover timeout, hedging and circuit breaker (services/llm_router)
+  LLM_STRUCTURED_OUTPUT - optional (default: on) use each provider's native JSON / schema mode for drafts
+  LLM_RATE_LIMITS - optional (e.g. "gemini=10/250000") requests/tokens per minute shared by all workers (services/rate_limit)
 """
 
 import os
 import re
 import json
+import asyncio
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from backend.services import draft_cache, llm_router, local_pool, rate_limit, token_budget
+from backend.services.json_repair import repair_draft_json
+from backend.services.singleflight import AsyncSingleFlight, SingleFlight
 
 # Fallback load_dotenv for standalone usage/testing
 ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -42,14 +57,6 @@ try:
 except Exception:
     _HAS_OPENAI = False
 
-# try local model dependencies
-try:
-    from ctransformers import AutoModelForCausalLM
-    _HAS_LOCAL = True
-except ImportError as e:
-    print(f"DEBUG: Failed to import ctransformers: {e}")
-    _HAS_LOCAL = False
-
 # Configuration
 # Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -60,8 +67,46 @@ PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
 print(f"DEBUG email_gen: LLM_PROVIDER is {PROVIDER}")
 print(f"DEBUG email_gen: GEMINI_API_KEY exists: {bool(GEMINI_API_KEY)}")
 
-LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH")
-LOCAL_MODEL_TYPE = os.getenv("LOCAL_MODEL_TYPE", "llama") # "llama", "mistral", etc.
+# Endpoints (overridable for proxies and the local fake used by the benchmarks)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com").rstrip("/")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
+# Async path: LLM calls in flight at once (across all requests) and HTTP client limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_RETRIES = 3
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Coalesce concurrent identical LLM calls into one upstream request; waiters give up after the timeout
+LLM_SINGLEFLIGHT = os.getenv("LLM_SINGLEFLIGHT", "1") == "1"
+LLM_SINGLEFLIGHT_TIMEOUT = float(os.getenv("LLM_SINGLEFLIGHT_TIMEOUT", "120"))
+_flights = SingleFlight()
+_aflights = AsyncSingleFlight()
+
+# Failover pool: LLM_PROVIDER first, then these in order (e.g. "openai,ollama,local"); see services/llm_router
+LLM_FALLBACK_PROVIDERS = [p.strip().lower() for p in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+# Model a provider uses when it serves as a fallback (the primary uses MODEL / the caller's model)
+PROVIDER_MODELS = {
+    "gemini": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+    "openai": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+    "http": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+    "ollama": os.getenv("OLLAMA_MODEL", "llama2"),
+    "local": os.getenv("LOCAL_MODEL", "tinyllama"),
+}
+
+# Drafts use the providers' native JSON output (schema / JSON mode) instead of only asking for JSON in the prompt
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+DRAFT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subject": {"type": "string", "description": "Short subject line"},
+        "body": {"type": "string", "description": "Full email body, paragraphs separated by blank lines"},
+    },
+    "required": ["subject", "body"],
+    "additionalProperties": False,
+}
 
 # Set default model based on provider
 if PROVIDER == "gemini":
@@ -115,6 +160,9 @@ def prompt_enhancer(user_prompt: str) -> str:
     if not user_prompt:
         return ""
     p = user_prompt.strip()
+    # collapse whitespace so trivially different prompts render (and cache) the same
+    p = re.sub(r"[ \t]+", " ", p)
+    p = re.sub(r" ?\n\s*", "\n", p)
     p = re.sub(r"\b(beacuse|becuase)\b", "because", p, flags=re.I)
     # capitalize weekdays
     p = re.sub(r"\bmonday\b", "Monday", p, flags=re.I)
@@ -166,20 +214,27 @@ def replace_weekday_with_date(body: str, user_prompt: str) -> str:
 
 
 # ---------------- LLM wrappers ----------------
-def call_openai_sdk(messages, model=MODEL, temperature=0.2, max_tokens=500):
+def _throttle(provider: str, model: str, messages, max_tokens: int):
+    """Wait for the provider's shared requests/tokens-per-minute budget (no-op unless LLM_RATE_LIMITS covers it)."""
+    rate_limit.limiter.acquire(provider, model, rate_limit.estimate_tokens(messages, max_tokens))
+
+
+def call_openai_sdk(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
     """
     Unified SDK call that supports both openai<1.0 (old) and openai>=1.0 (new).
     For openai>=1.0 we use the `OpenAI` client: client = openai.OpenAI(); client.chat.completions.create(...)
     For older versions we fall back to openai.ChatCompletion.create or openai.chat.completions.create
     """
     if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY not set")
+        raise llm_router.ProviderConfigError("OPENAI_API_KEY not set")
+    _throttle("openai", model, messages, max_tokens)
 
     # Newer openai package (v1+): has OpenAI class
     if hasattr(openai, "OpenAI"):
         client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        extra = {"response_format": _openai_response_format(model, schema)} if schema else {}
         # the new client returns a complex object; we extract text safely
-        resp = client.chat.completions.create(model=model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        resp = client.chat.completions.create(model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **extra)
         # Try common shapes for response
         try:
             # v1: resp.choices[0].message.content (attribute access first)
@@ -207,32 +262,60 @@ def call_openai_sdk(messages, model=MODEL, temperature=0.2, max_tokens=500):
 
 
 
-def call_openai_http(messages, model=MODEL, temperature=0.2, max_tokens=500):
+def _openai_response_format(model: str, schema: Dict) -> Dict:
+    # Structured Outputs (json_schema) needs gpt-4o-2024-08-06 or newer; older chat models only have JSON mode
+    if (model or "").startswith(("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")):
+        return {"type": "json_schema", "json_schema": {"name": "email_draft", "strict": True, "schema": schema}}
+    return {"type": "json_object"}
+
+
+def _openai_request(messages, model, temperature, max_tokens, schema=None) -> Tuple[str, Dict, Dict]:
     if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    url = "https://api.openai.com/v1/chat/completions"
+        raise llm_router.ProviderConfigError("OPENAI_API_KEY not set")
+    url = f"{OPENAI_API_BASE}/chat/completions"
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
     payload = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
-    r = requests.post(url, json=payload, headers=headers, timeout=30)
-    r.raise_for_status()
-    data = r.json()
+    if schema:
+        payload["response_format"] = _openai_response_format(model, schema)
+    return url, payload, headers
+
+
+def _openai_text(data: Dict) -> str:
     try:
         return data["choices"][0]["message"]["content"]
     except Exception:
         raise RuntimeError("Unexpected response from OpenAI HTTP API: " + str(data))
 
 
-def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tokens=500):
-    """Call Google Gemini API (free tier available)"""
+def call_openai_http(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _openai_request(messages, model, temperature, max_tokens, schema)
+    _throttle("openai", model, messages, max_tokens)
+    r = requests.post(url, json=payload, headers=headers, timeout=30)
+    r.raise_for_status()
+    return _openai_text(r.json())
+
+
+def _gemini_schema(schema: Dict) -> Dict:
+    """JSON Schema -> Gemini responseSchema (OpenAPI subset: no additionalProperties, explicit property order)."""
+    out = {k: v for k, v in schema.items() if k in ("type", "description", "enum", "required", "nullable", "format")}
+    if "properties" in schema:
+        out["properties"] = {name: _gemini_schema(sub) for name, sub in schema["properties"].items()}
+        out["propertyOrdering"] = list(schema["properties"])  # subject before body, which the stream endpoint relies on
+    if "items" in schema:
+        out["items"] = _gemini_schema(schema["items"])
+    return out
+
+
+def _gemini_request(messages, model, temperature, max_tokens, schema=None) -> Tuple[str, Dict, Dict]:
     if not GEMINI_API_KEY:
-        raise RuntimeError("GEMINI_API_KEY not set")
+        raise llm_router.ProviderConfigError("GEMINI_API_KEY not set")
     
     # Standardize model name for the API - use stable model
     if "gemini" not in model.lower():
         model = "gemini-2.5-flash"
     
     # Use v1beta for broader model support
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
+    url = f"{GEMINI_API_BASE}/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
     
     # Convert messages to Gemini format
     text_parts = []
@@ -255,6 +338,66 @@ def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tok
             "maxOutputTokens": max_tokens,
         }
     }
+    thinking = token_budget.gemini_thinking_config(model)
+    if thinking:
+        payload["generationConfig"]["thinkingConfig"] = thinking
+    if schema:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = _gemini_schema(schema)
+    return url, payload, headers
+
+
+def _gemini_text(data: Dict) -> str:
+    try:
+        # Check if we have candidates
+        if not data.get("candidates") or len(data["candidates"]) == 0:
+            raise RuntimeError("No candidates in Gemini API response: " + str(data))
+        
+        candidate = data["candidates"][0]
+        
+        # Check finish reason
+        finish_reason = candidate.get("finishReason", "")
+        if finish_reason == "MAX_TOKENS":
+            logger.warning("Gemini API hit MAX_TOKENS limit. Response may be truncated.")
+        
+        # Try to get the content
+        content = candidate.get("content", {})
+        text_content = ""
+        
+        if "parts" in content and len(content["parts"]) > 0:
+            text_content = content["parts"][0].get("text", "")
+        elif "text" in content:
+            text_content = content["text"]
+        
+        # If we got some text, return it (even if truncated)
+        if text_content:
+            if finish_reason == "MAX_TOKENS":
+                logger.warning(f"Gemini response truncated at MAX_TOKENS. Got {len(text_content)} chars.")
+            return text_content
+        
+        # If no text at all, this is a problem
+        if finish_reason == "MAX_TOKENS":
+            raise RuntimeError(
+                f"Gemini API hit MAX_TOKENS limit but generated no text. "
+                f"This usually means the token limit is too low. Try increasing max_tokens. "
+                f"Response: {str(data)[:500]}"
+            )
+        else:
+            raise RuntimeError(
+                f"Gemini API response missing text content. Finish reason: {finish_reason}. "
+                f"Response: {str(data)[:500]}"
+            )
+    except KeyError as e:
+        raise RuntimeError(f"Unexpected response structure from Gemini API (missing key: {e}): " + str(data))
+    except Exception as e:
+        if isinstance(e, RuntimeError):
+            raise
+        raise RuntimeError("Unexpected error processing Gemini API response: " + str(e) + " | Response: " + str(data))
+
+
+def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tokens=500, schema=None):
+    """Call Google Gemini API (free tier available)"""
+    url, payload, headers = _gemini_request(messages, model, temperature, max_tokens, schema)
     
     # Use session with retries and longer timeout for connection stability
     session = get_session()
@@ -263,12 +406,14 @@ def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tok
     
     for attempt in range(max_retries):
         try:
+            _throttle("gemini", model, messages, max_tokens)
             r = session.post(url, json=payload, headers=headers, timeout=(10, 60))
             
-            # Handle Rate Limiting (429) explicitly
+            # Handle Rate Limiting (429) explicitly: honour Retry-After and make every worker hold off
             if r.status_code == 429:
-                wait_time = (attempt + 1) * 5 # Wait 5, 10... seconds
+                wait_time = _retry_delay(r, attempt)
                 logger.warning(f"Rate limited (429). Waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
+                rate_limit.limiter.penalize("gemini", model, wait_time)
                 time.sleep(wait_time)
                 continue
             
@@ -295,6 +440,8 @@ def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tok
                 continue
             raise RuntimeError(f"Request timeout after {max_retries} attempts. The API may be slow. Error: {str(e)}")
         except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code < 500:
+                raise  # the request itself was rejected: retrying will not help
             last_error = e
             logger.error(f"Request error on attempt {attempt + 1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
@@ -305,56 +452,11 @@ def call_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tok
         if last_error:
             raise RuntimeError(f"Failed to connect to Gemini API after {max_retries} attempts: {str(last_error)}")
     
-    try:
-        # Check if we have candidates
-        if not data.get("candidates") or len(data["candidates"]) == 0:
-            raise RuntimeError("No candidates in Gemini API response: " + str(data))
-        
-        candidate = data["candidates"][0]
-        
-        # Check finish reason
-        finish_reason = candidate.get("finishReason", "")
-        if finish_reason == "MAX_TOKENS":
-            logger.warning("Gemini API hit MAX_TOKENS limit. Response may be truncated.")
-        
-        # Try to get the content
-        content = candidate.get("content", {})
-        text_content = ""
-        
-        if "parts" in content and len(content["parts"]) > 0:
-            text_content = content["parts"][0].get("text", "")
-        elif "text" in content:
-            text_content = content["text"]
-        
-        # If we got some text, return it (even if truncated)
-        if text_content:
-            if finish_reason == "MAX_TOKENS":
-                logger.warning(f"Gemini response truncated at MAX_TOKENS. Got {len(text_content)} chars.")
-            return text_content
-        
-        # If no text at all, this is a problem
-        if finish_reason == "MAX_TOKENS":
-            raise RuntimeError(
-                f"Gemini API hit MAX_TOKENS limit but generated no text. "
-                f"This usually means the token limit is too low. Try increasing max_tokens. "
-                f"Response: {str(data)[:500]}"
-            )
-        else:
-            raise RuntimeError(
-                f"Gemini API response missing text content. Finish reason: {finish_reason}. "
-                f"Response: {str(data)[:500]}"
-            )
-    except KeyError as e:
-        raise RuntimeError(f"Unexpected response structure from Gemini API (missing key: {e}): " + str(data))
-    except Exception as e:
-        if isinstance(e, RuntimeError):
-            raise
-        raise RuntimeError("Unexpected error processing Gemini API response: " + str(e) + " | Response: " + str(data))
+    return _gemini_text(data)
 
 
-def call_ollama_api(messages, model="llama2", temperature=0.2, max_tokens=500):
-    """Call local Ollama API (completely free, runs locally)"""
-    url = "http://localhost:11434/api/chat"
+def _ollama_request(messages, model, temperature, max_tokens, schema=None) -> Tuple[str, Dict, Dict]:
+    url = f"{OLLAMA_HOST}/api/chat"
     
     # Convert to Ollama format
     ollama_messages = []
@@ -373,70 +475,29 @@ def call_ollama_api(messages, model="llama2", temperature=0.2, max_tokens=500):
             "num_predict": max_tokens
         }
     }
-    
-    r = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    
+    if schema:
+        payload["format"] = "json"  # JSON mode; a schema object here needs Ollama >= 0.5
+    return url, payload, {"Content-Type": "application/json"}
+
+
+def _ollama_text(data: Dict) -> str:
     try:
         return data["message"]["content"]
     except Exception:
         raise RuntimeError("Unexpected response from Ollama API: " + str(data))
 
 
-# Global instance for local model to avoid reloading
-_local_llm_instance = None
-
-def get_local_llm(model_name="tinyllama"):
-    global _local_llm_instance
-    if _local_llm_instance is not None:
-        return _local_llm_instance
-        
-    if not _HAS_LOCAL:
-        raise RuntimeError("Local model dependencies not installed. Please run: pip install ctransformers")
-        
-    # Default to TinyLlama 1.1B Chat
-    repo_id = "TheBloke/TinyLlama-1.1B-Chat-v1.0-GGUF"
-    model_file = "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
-    model_type = "llama"
-
-    if model_name == "mistral":
-        repo_id = "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"
-        model_file = "mistral-7b-instruct-v0.2.Q4_K_M.gguf"
-        model_type = "mistral"
-
-    # If user provided a path, use it
-    if LOCAL_MODEL_PATH:
-        repo_id = None # local file
-        model_file = LOCAL_MODEL_PATH
-        model_type = LOCAL_MODEL_TYPE
-    
-    try:
-        if sys.version_info >= (3, 12):
-            logger.warning("WARNING: You are running Python 3.12+. 'ctransformers' may hang or fail. Consider using Ollama or Python 3.11.")
-            print("WARNING: You are running Python 3.12+. 'ctransformers' may hang or fail. Consider using Ollama or Python 3.11.")
-
-        print(f"DEBUG: Loading local model (type={model_type}) from {model_file}...")
-        logger.info(f"Loading local model (type={model_type}) from {model_file}...")
-        _local_llm_instance = AutoModelForCausalLM.from_pretrained(
-            repo_id if repo_id else os.path.dirname(model_file),
-            model_file=model_file if repo_id else os.path.basename(model_file),
-            model_type=model_type,
-            context_length=2048,
-            gpu_layers=0,
-            threads=os.cpu_count() or 4
-        )
-        print("DEBUG: Model loaded successfully.")
-        return _local_llm_instance
-    except Exception as e:
-        print(f"DEBUG: Failed to load model: {e}")
-        raise RuntimeError(f"Failed to initialize local model: {str(e)}")
+def call_ollama_api(messages, model="llama2", temperature=0.2, max_tokens=500, schema=None):
+    """Call local Ollama API (completely free, runs locally)"""
+    url, payload, headers = _ollama_request(messages, model, temperature, max_tokens, schema)
+    _throttle("ollama", model, messages, max_tokens)
+    r = requests.post(url, json=payload, headers=headers, timeout=60)
+    r.raise_for_status()
+    return _ollama_text(r.json())
 
 
-def call_local_model(messages, model="tinyllama", temperature=0.2, max_tokens=500):
-    """Call local GGUF model via ctransformers"""
-    llm = get_local_llm(model)
-    
+def _local_prompt(messages, model="tinyllama") -> str:
+    """Flatten chat messages into the prompt format of the local GGUF model."""
     prompt = ""
     
     if model == "mistral":
@@ -494,36 +555,389 @@ def call_local_model(messages, model="tinyllama", temperature=0.2, max_tokens=50
                 
         # Prompt for generation
         prompt += "<|assistant|>\n"
-    
-    try:
-        # ctransformers generate returns a generator or string
-        stop_tokens = ["</s>"]
-        if model != "mistral":
-            stop_tokens.append("<|user|>")
-            
-        response = llm(
-            prompt, 
-            max_new_tokens=max_tokens, 
-            temperature=temperature,
-            stop=stop_tokens
+    return prompt
+
+
+def local_prompt_prefix(model="tinyllama", target_lang="en") -> str:
+    """The start every local draft prompt shares (system message, and the example if any)."""
+    messages, _ = build_draft_messages("ask for a day off", target_lang=target_lang)
+    prompt = _local_prompt(messages, model)
+    return prompt[:prompt.rindex(messages[-1]["content"])]
+
+
+def _local_stop_tokens(model: str) -> List[str]:
+    stop_tokens = ["</s>"]
+    if model != "mistral":
+        stop_tokens.append("<|user|>")
+    return stop_tokens
+
+
+# ctransformers has no grammar-constrained sampling; with a schema the reply is primed
+# with the start of the object so the model can only continue it
+_LOCAL_JSON_PRIMER = '{"subject": "'
+
+
+def call_local_model(messages, model="tinyllama", temperature=0.2, max_tokens=500, schema=None):
+    """Call the local GGUF model (ctransformers) on a worker of the local model pool"""
+    primer = _LOCAL_JSON_PRIMER if schema else ""
+    prompt = _local_prompt(messages, model) + primer
+    response = local_pool.pool.generate(model, prompt, max_new_tokens=max_tokens, temperature=temperature,
+                                        stop=_local_stop_tokens(model))
+    return primer + response
+
+
+def stream_local_model(messages, model="tinyllama", temperature=0.2, max_tokens=500, schema=None):
+    """Like call_local_model, but yields text pieces as the worker produces them."""
+    primer = _LOCAL_JSON_PRIMER if schema else ""
+    prompt = _local_prompt(messages, model) + primer
+    if primer:
+        yield primer
+    yield from local_pool.pool.stream(model, prompt, max_new_tokens=max_tokens, temperature=temperature,
+                                      stop=_local_stop_tokens(model))
+
+
+def _flight_key(messages, model, temperature, max_tokens, schema=None) -> str:
+    return draft_cache.cache_key(messages, PROVIDER, model, temperature, max_tokens, schema)
+
+
+def llm_chat(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    """Unified LLM chat interface; concurrent identical calls share one upstream request."""
+    if not LLM_SINGLEFLIGHT:
+        return _llm_chat(messages, model, temperature, max_tokens, schema)
+    return _flights.do(_flight_key(messages, model, temperature, max_tokens, schema),
+                       lambda: _llm_chat(messages, model, temperature, max_tokens, schema), LLM_SINGLEFLIGHT_TIMEOUT)
+
+
+class LLMReply(str):
+    """Reply text tagged with the pool provider that produced it."""
+
+    def __new__(cls, text: str, provider: str):
+        reply = super().__new__(cls, text or "")
+        reply.provider = provider
+        return reply
+
+
+def from_primary(reply) -> bool:
+    """Did LLM_PROVIDER answer? Draft cache keys name it, so only its replies are cached."""
+    return getattr(reply, "provider", PROVIDER) == PROVIDER
+
+
+def provider_pool() -> List[str]:
+    """Providers in routing order: LLM_PROVIDER, then LLM_FALLBACK_PROVIDERS."""
+    return [PROVIDER] + [p for p in LLM_FALLBACK_PROVIDERS if p != PROVIDER]
+
+
+def _provider_args(provider: str, model, max_tokens: int) -> Tuple[str, int]:
+    """
+    The caller's model is meant for the primary; a fallback uses its own default.
+    `max_tokens` is the reply's own budget; Gemini 2.5 also spends it on
+    thinking, so that attempt alone gets the thinking allowance on top.
+    """
+    if provider != PROVIDER or not model:
+        model = PROVIDER_MODELS.get(provider, MODEL)
+    return model, token_budget.provider_max_tokens(max_tokens, provider, model)
+
+
+def _call_provider(provider, messages, model, temperature, max_tokens, schema=None):
+    model, max_tokens = _provider_args(provider, model, max_tokens)
+    if provider == "gemini":
+        return call_gemini_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "ollama":
+        return call_ollama_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "local":
+        return call_local_model(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "openai" and _HAS_OPENAI:
+        return call_openai_sdk(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    else:
+        return call_openai_http(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+
+
+def _llm_chat(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    """Unified LLM chat interface supporting multiple providers, with failover across the pool"""
+    return llm_router.router.call(
+        provider_pool(), lambda provider: LLMReply(_call_provider(provider, messages, model, temperature, max_tokens, schema), provider))
+
+
+# ---------------- async client layer ----------------
+# One pooled keep-alive client and one concurrency gate per event loop: httpx
+# and asyncio primitives are bound to the loop they were first used on.
+_aclients: Dict[int, Tuple[httpx.AsyncClient, asyncio.Semaphore]] = {}
+
+
+def _aclient() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    entry = _aclients.get(id(loop))
+    if entry is None or entry[0].is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
         )
-        return response
-    except Exception as e:
-        raise RuntimeError(f"Local model generation failed: {str(e)}")
-
-
-def llm_chat(messages, model=MODEL, temperature=0.2, max_tokens=500):
-    """Unified LLM chat interface supporting multiple providers"""
-    if PROVIDER == "gemini":
-        return call_gemini_api(messages, model=model or "gemini-2.5-flash", temperature=temperature, max_tokens=max_tokens)
-    elif PROVIDER == "ollama":
-        return call_ollama_api(messages, model=model or "llama2", temperature=temperature, max_tokens=max_tokens)
-    elif PROVIDER == "local":
-        return call_local_model(messages, model=model or "tinyllama", temperature=temperature, max_tokens=max_tokens)
-    elif PROVIDER == "openai" and _HAS_OPENAI:
-        return call_openai_sdk(messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        entry = _aclients[id(loop)] = (client, asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY)))
+    return entry
+
+
+async def aclose_llm_client():
+    """Close the running loop's pooled client (app shutdown)."""
+    entry = _aclients.pop(id(asyncio.get_running_loop()), None)
+    if entry is not None:
+        await entry[0].aclose()
+
+
+def _retry_delay(r, attempt: int) -> float:
+    """Seconds before retrying after response `r` (httpx or requests; None for a transport error)."""
+    if r is not None:
+        retry_after = r.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_HTTP_TIMEOUT)
+            except ValueError:
+                pass
+        if r.status_code == 429:
+            return (attempt + 1) * 5  # same schedule as the sync Gemini path
+    return 2 ** attempt
+
+
+def _quota(provider: str, model: str, messages, max_tokens: int) -> Tuple[str, str, int]:
+    return provider, model, rate_limit.estimate_tokens(messages, max_tokens)
+
+
+async def _apost_json(url: str, payload: Dict, headers: Dict, label: str, quota: Optional[Tuple] = None) -> Dict:
+    """
+    POST with retries on connection errors and 429/5xx; backoff sleeps yield to the loop.
+    `quota` is (provider, model, tokens) for the shared rate limiter; every attempt counts.
+    """
+    client, gate = _aclient()
+    last_error = None
+    for attempt in range(LLM_MAX_RETRIES):
+        r = None
+        try:
+            if quota:
+                await rate_limit.limiter.aacquire(*quota)  # outside the gate: waiting holds no slot
+            async with gate:
+                r = await client.post(url, json=payload, headers=headers)
+            if r.status_code not in RETRYABLE_STATUS:
+                if r.status_code >= 400:
+                    logger.error(f"{label} API error {r.status_code}: {r.text[:500]}")
+                r.raise_for_status()
+                return r.json()
+            last_error = RuntimeError(f"{label} API returned {r.status_code}: {r.text[:200]}")
+        except httpx.TransportError as e:
+            last_error = e
+        if attempt < LLM_MAX_RETRIES - 1:
+            delay = _retry_delay(r, attempt)
+            if quota and r is not None and r.status_code == 429:
+                await rate_limit.limiter.apenalize(quota[0], quota[1], delay)
+            logger.warning(f"{label} request failed ({last_error!r}); retry {attempt + 1}/{LLM_MAX_RETRIES - 1} in {delay}s")
+            await asyncio.sleep(delay)
+    raise RuntimeError(f"{label} request failed after {LLM_MAX_RETRIES} attempts: {last_error}")
+
+
+async def acall_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _gemini_request(messages, model, temperature, max_tokens, schema)
+    return _gemini_text(await _apost_json(url, payload, headers, "Gemini", _quota("gemini", model, messages, max_tokens)))
+
+
+async def acall_openai_http(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _openai_request(messages, model, temperature, max_tokens, schema)
+    return _openai_text(await _apost_json(url, payload, headers, "OpenAI", _quota("openai", model, messages, max_tokens)))
+
+
+async def acall_ollama_api(messages, model="llama2", temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _ollama_request(messages, model, temperature, max_tokens, schema)
+    return _ollama_text(await _apost_json(url, payload, headers, "Ollama", _quota("ollama", model, messages, max_tokens)))
+
+
+async def allm_chat(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    """Async llm_chat, with the same coalescing of concurrent identical calls."""
+    if not LLM_SINGLEFLIGHT:
+        return await _allm_chat(messages, model, temperature, max_tokens, schema)
+    return await _aflights.do(_flight_key(messages, model, temperature, max_tokens, schema),
+                              lambda: _allm_chat(messages, model, temperature, max_tokens, schema), LLM_SINGLEFLIGHT_TIMEOUT)
+
+
+def llm_flight_stats() -> Dict:
+    return {"enabled": LLM_SINGLEFLIGHT, "timeout_seconds": LLM_SINGLEFLIGHT_TIMEOUT,
+            "sync": _flights.stats(), "async": _aflights.stats()}
+
+
+async def _acall_provider(provider, messages, model, temperature, max_tokens, schema=None):
+    """
+    HTTP providers share the pooled client; OpenAI goes over
+    HTTP here rather than through the (blocking) SDK, and the local model
+    is waited on from a worker thread (it runs in services/local_pool).
+    """
+    model, max_tokens = _provider_args(provider, model, max_tokens)
+    if provider == "gemini":
+        return await acall_gemini_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "ollama":
+        return await acall_ollama_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "local":
+        # the pool queues for its own workers; the thread only waits on the pipe
+        return await asyncio.to_thread(call_local_model, messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    else:
+        return await acall_openai_http(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+
+
+async def _allm_chat(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    """Failover (and optional hedging) across the provider pool."""
+    async def attempt(provider):
+        return LLMReply(await _acall_provider(provider, messages, model, temperature, max_tokens, schema), provider)
+    return await llm_router.router.acall(provider_pool(), attempt)
+
+
+# ---------------- async streaming ----------------
+async def _astream_lines(url: str, payload: Dict, headers: Dict, label: str, quota: Optional[Tuple] = None):
+    """
+    POST and yield the response body line by line as it arrives. Failures
+    before the first line are retried like _apost_json; once text has been
+    handed out the stream cannot be replayed, so later errors propagate.
+    """
+    client, gate = _aclient()
+    last_error = None
+    started = False
+    for attempt in range(LLM_MAX_RETRIES):
+        r = None
+        try:
+            if quota:
+                await rate_limit.limiter.aacquire(*quota)
+            async with gate:
+                async with client.stream("POST", url, json=payload, headers=headers) as r:
+                    if r.status_code not in RETRYABLE_STATUS:
+                        if r.status_code >= 400:
+                            body = (await r.aread()).decode(errors="replace")
+                            logger.error(f"{label} API error {r.status_code}: {body[:500]}")
+                        r.raise_for_status()
+                        async for line in r.aiter_lines():
+                            started = True
+                            yield line
+                        return
+                    last_error = RuntimeError(f"{label} API returned {r.status_code}")
+        except httpx.TransportError as e:
+            if started:
+                raise RuntimeError(f"{label} stream interrupted: {e!r}")
+            last_error = e
+        if attempt < LLM_MAX_RETRIES - 1:
+            delay = _retry_delay(r, attempt)
+            if quota and r is not None and r.status_code == 429:
+                await rate_limit.limiter.apenalize(quota[0], quota[1], delay)
+            logger.warning(f"{label} stream failed ({last_error!r}); retry {attempt + 1}/{LLM_MAX_RETRIES - 1} in {delay}s")
+            await asyncio.sleep(delay)
+    raise RuntimeError(f"{label} stream failed after {LLM_MAX_RETRIES} attempts: {last_error}")
+
+
+def _sse_json(line: str) -> Optional[Dict]:
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    return json.loads(data)
+
+
+async def astream_gemini_api(messages, model="gemini-1.5-flash", temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _gemini_request(messages, model, temperature, max_tokens, schema)
+    url = url.replace(":generateContent?", ":streamGenerateContent?alt=sse&", 1)
+    async for line in _astream_lines(url, payload, headers, "Gemini", _quota("gemini", model, messages, max_tokens)):
+        data = _sse_json(line)
+        for cand in (data or {}).get("candidates") or []:
+            for part in (cand.get("content") or {}).get("parts") or []:
+                if part.get("text") and not part.get("thought"):
+                    yield part["text"]
+
+
+async def astream_openai_http(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _openai_request(messages, model, temperature, max_tokens, schema)
+    payload["stream"] = True
+    async for line in _astream_lines(url, payload, headers, "OpenAI", _quota("openai", model, messages, max_tokens)):
+        data = _sse_json(line)
+        for choice in (data or {}).get("choices") or []:
+            text = (choice.get("delta") or {}).get("content")
+            if text:
+                yield text
+
+
+async def astream_ollama_api(messages, model="llama2", temperature=0.2, max_tokens=500, schema=None):
+    url, payload, headers = _ollama_request(messages, model, temperature, max_tokens, schema)
+    payload["stream"] = True
+    async for line in _astream_lines(url, payload, headers, "Ollama", _quota("ollama", model, messages, max_tokens)):
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if data.get("error"):
+            raise RuntimeError(f"Ollama stream error: {data['error']}")
+        text = (data.get("message") or {}).get("content")
+        if text:
+            yield text
+
+
+async def _astream_local(messages, model="tinyllama", temperature=0.2, max_tokens=500, schema=None):
+    """Relay the local model pool's blocking stream from a worker thread."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    cancelled = False
+
+    def produce():
+        pieces = stream_local_model(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+        try:
+            for piece in pieces:
+                if cancelled:
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, piece)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            pieces.close()  # stops the worker's generation if the reader went away
+
+    worker = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled = True
+        await asyncio.shield(worker)
+
+
+def _astream_provider(provider, messages, model, temperature, max_tokens, schema=None):
+    model, max_tokens = _provider_args(provider, model, max_tokens)
+    if provider == "gemini":
+        return astream_gemini_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "ollama":
+        return astream_ollama_api(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+    elif provider == "local":
+        return _astream_local(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
     else:
-        return call_openai_http(messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        return astream_openai_http(messages, model=model, temperature=temperature, max_tokens=max_tokens, schema=schema)
+
+
+def allm_stream(messages, model=MODEL, temperature=0.2, max_tokens=500, schema=None, served: Optional[List[str]] = None):
+    """
+    Streaming counterpart of allm_chat: an async iterator of reply text pieces.
+    Fails over to the next provider only until the first piece arrives.
+    Each provider tried is appended to `served`; the last one streamed the reply.
+    """
+    def attempt(provider):
+        if served is not None:
+            served.append(provider)
+        return _astream_provider(provider, messages, model, temperature, max_tokens, schema)
+    return llm_router.router.astream(provider_pool(), attempt)
+
+
+def llm_provider_stats() -> Dict:
+    return {**llm_router.router.stats(provider_pool()), "rate_limits": rate_limit.limiter.stats()}
+
+
+def start_local_pool():
+    """Warm the local model workers when "local" is in the provider pool (app startup)."""
+    if "local" in provider_pool():
+        model = MODEL if PROVIDER == "local" else PROVIDER_MODELS["local"]
+        local_pool.pool.start(model, prefix=local_prompt_prefix(model))
 
 
 # ---------------- parse helpers ----------------
@@ -549,18 +963,14 @@ def fallback_parse(raw: str):
 
 
 # ---------------- main: generate email forcing JSON ----------------
-def generate_email_json_forced(
+def build_draft_messages(
     user_prompt: str,
     tone: str = "formal",
     length: str = "medium",
     target_lang: str = "en",
     intent: Optional[str] = None,
-    model: Optional[str] = None,
-    sender_name: str = "",
-) -> Dict[str, str]:
-    model = model or MODEL
-    logger.info("generate_email_json_forced model=%s provider=%s", model, PROVIDER)
-
+) -> Tuple[List[Dict[str, str]], str]:
+    """Chat messages asking for a JSON draft, plus the (possibly auto-detected) intent."""
     # Map language codes to full names for better AI understanding
     LANG_MAP = {
         "hi": "Hindi",
@@ -590,20 +1000,17 @@ def generate_email_json_forced(
     system_msg = {
         "role": "system",
         "content": (
-            "You are a professional email assistant. "
-            "When asked to produce an email, you MUST return ONLY valid JSON and nothing else. "
-            "The JSON object MUST contain exactly two keys: subject (a short subject line) and body (the full email body with \\n\\n between paragraphs). "
-            "Do NOT provide commentary, do not wrap JSON in markdown or code fences. Use placeholders like [Manager's Name] or [Your Name] if no names are provided. "
-            f"IMPORTANT: The entire content (both subject and body) MUST be written in {lang_name}. "
-            "Professionalism and helpfulness are key. If a longer length is requested, provide more context, professional details, and appropriate elaboration while staying true to the user's intent."
+            "You are a professional email assistant. Reply with only a JSON object with two string keys: "
+            "subject (a short subject line) and body (the full email, paragraphs separated by \\n\\n). "
+            "No markdown, code fences or commentary. Use placeholders like [Manager's Name] or [Your Name] for names not given. "
+            f"Write the subject and body in {lang_name} only."
         ),
     }
-
-    # Only include example if it's relevant to the user's request AND target language is English
     messages = [system_msg]
-    
-    # Include example only for English requests to avoid language bias in the output
-    if lang_name == "English" and intent in ["request_info", "request_action"]:
+
+    # The worked example only helps when JSON is requested in prose; native JSON output
+    # carries the format itself. English only, to avoid language bias in the output.
+    if not LLM_STRUCTURED_OUTPUT and lang_name == "English" and intent in ["request_info", "request_action"]:
         example = {
             "role": "user",
             "content": """Example:
@@ -616,73 +1023,90 @@ Return JSON only:
         }
         messages.append(example)
 
-    # Map length to specific word count instructions
-    LENGTH_MAP = {
-        "short": "approx 50-100 words (very concise)",
-        "medium": "approx 150-250 words (balanced detail)",
-        "detailed": "approx 300-500 words (thorough and comprehensive)"
-    }
-    length_instruction = LENGTH_MAP.get(length, "approx 150-250 words")
-
+    low, high = token_budget.length_words(length)
     user_msg = {
         "role": "user",
         "content": (
-            f"MANDATORY: YOU MUST WRITE THE ENTIRE SUBJECT AND BODY IN {lang_name.upper()}.\n"
-            f"DO NOT USE ENGLISH. DO NOT USE PORTUGUESE. ONLY USE {lang_name.upper()}.\n\n"
-            f"Compose an email based on the user's request.\n"
-            f"User's request: {enhanced}\n"
+            f"Request: {enhanced}\n"
             f"Tone: {tone}\n"
-            f"Target length: {length_instruction}\n"
-            f"Target language: {lang_name}\n\n"
-            "Return ONLY a single valid JSON object with keys: subject (string), body (string).\n"
-            f"Both 'subject' and 'body' MUST be in {lang_name}.\n"
-            "Example format: {\"subject\":\"...\",\"body\":\"...\"}\n"
-            "Do not include any other text or explanation. Ensure the body is detailed enough to meet the target length.\n"
+            f"Length: about {low}-{high} words; reach it with relevant detail, not filler\n"
+            f"Language: {lang_name}" + ("" if lang_name == "English" else " (not English)")
         ),
     }
 
     messages.append(user_msg)
+    return messages, intent
 
-    # attempt up to 2 times if we do not get parseable JSON
-    raw = None
-    parsed = None
-    for attempt in range(2):
-        try:
-            # Increase max_tokens for Gemini to account for thinking tokens
-            # Gemini 2.5 models use thinking tokens which count toward the limit
-            gemini_max_tokens = 2000 if PROVIDER == "gemini" else 1000
-            raw = llm_chat(messages, model=model, temperature=0.2, max_tokens=gemini_max_tokens)
-        except Exception as e:
-            logger.exception("LLM call failed")
-            raise
 
-        if isinstance(raw, dict):
-            # some SDKs may already parse; convert to string
-            raw = json.dumps(raw)
+RETRY_INSTRUCTION = {"role": "user", "content": "You must return ONLY valid JSON with subject and body, nothing else. Return it now."}
 
-        raw_str = str(raw).strip()
-        logger.info("LLM raw reply (attempt %s): %s", attempt + 1, raw_str[:400])
+# How draft replies parsed (json / repaired / unparsed) and how often the retry round trip still ran
+_draft_counts = {"json": 0, "repaired": 0, "unparsed": 0, "retries": 0}
 
-        # try to extract JSON substring
-        data = None
-        try:
-            data = json.loads(raw_str)
-        except Exception:
-            m = re.search(r"(\{[\s\S]*\})", raw_str)
-            if m:
-                candidate = m.group(1)
-                try:
-                    data = json.loads(candidate)
-                except Exception:
-                    data = None
-
-        if data and isinstance(data, dict) and "subject" in data and "body" in data:
-            parsed = data
-            break
 
-        # if not parsed, on second iteration we will add a strict followup instruction
-        messages.append({"role": "user", "content": "You must return ONLY valid JSON with subject and body, nothing else. Return it now."})
+def draft_schema() -> Optional[Dict]:
+    return DRAFT_SCHEMA if LLM_STRUCTURED_OUTPUT else None
 
+
+def add_retry_instruction(messages: List[Dict[str, str]]):
+    """The reply had no usable JSON: ask again, strictly (a second full LLM call)."""
+    _draft_counts["retries"] += 1
+    messages.append(RETRY_INSTRUCTION)
+
+
+def draft_parse_stats() -> Dict:
+    replies = _draft_counts["json"] + _draft_counts["repaired"] + _draft_counts["unparsed"]
+    drafts = replies - _draft_counts["retries"]
+    return {"structured_output": LLM_STRUCTURED_OUTPUT, "drafts": drafts, **_draft_counts,
+            "retry_rate": round(_draft_counts["retries"] / drafts, 4) if drafts else None}
+
+
+def draft_max_tokens(length: str = "medium", target_lang: str = "en") -> int:
+    """Output budget for one draft of `length`; _provider_args adds Gemini's thinking allowance per attempt."""
+    return token_budget.output_budget(length, target_lang)
+
+
+def parse_draft_reply(raw) -> Tuple[str, Optional[Dict]]:
+    """Normalize a model reply to text and pull the {subject, body} object out of it, if any."""
+    if isinstance(raw, dict):
+        # some SDKs may already parse; convert to string
+        raw = json.dumps(raw)
+
+    raw_str = str(raw).strip()
+
+    # try to extract JSON substring
+    data = None
+    try:
+        data = json.loads(raw_str)
+    except Exception:
+        m = re.search(r"(\{[\s\S]*\})", raw_str)
+        if m:
+            candidate = m.group(1)
+            try:
+                data = json.loads(candidate, strict=False)  # tolerate raw newlines inside strings
+            except Exception:
+                data = None
+
+    if data and isinstance(data, dict) and "subject" in data and "body" in data:
+        _draft_counts["json"] += 1
+        return raw_str, data
+
+    # trailing commas, a body cut off at the token limit, unterminated fences...
+    data = repair_draft_json(raw_str)
+    if data is not None:
+        _draft_counts["repaired"] += 1
+        logger.info("Recovered draft from malformed JSON reply")
+        return raw_str, data
+    _draft_counts["unparsed"] += 1
+    return raw_str, None
+
+
+def draft_cache_key(messages: List[Dict[str, str]], model: str, max_tokens: int) -> str:
+    return draft_cache.cache_key(messages, PROVIDER, model, 0.2, max_tokens)
+
+
+def finalize_draft(raw_str: str, parsed: Optional[Dict], user_prompt: str, intent: str, target_lang: str,
+                   sender_name: str = "", cached: bool = False) -> Dict[str, str]:
     if parsed is None:
         # fallback parsing from raw text
         subj, body = fallback_parse(raw_str if raw_str else "")
@@ -709,10 +1133,97 @@ Return JSON only:
         "intent": intent,
         "raw": raw_str,
         "language": target_lang,
+        "cached": cached,
     }
     return result
 
 
+def generate_email_json_forced(
+    user_prompt: str,
+    tone: str = "formal",
+    length: str = "medium",
+    target_lang: str = "en",
+    intent: Optional[str] = None,
+    model: Optional[str] = None,
+    sender_name: str = "",
+    cache: str = "use",
+) -> Dict[str, str]:
+    model = model or MODEL
+    logger.info("generate_email_json_forced model=%s provider=%s", model, PROVIDER)
+    messages, intent = build_draft_messages(user_prompt, tone, length, target_lang, intent)
+    max_tokens = draft_max_tokens(length, target_lang)
+    logger.info("draft prompt_tokens=%d max_tokens=%d", token_budget.count_message_tokens(messages), max_tokens)
+    key = draft_cache_key(messages, model, max_tokens)
+    hit = draft_cache.cache.get(key, cache)
+    if hit is not None:
+        return finalize_draft(hit["raw"], hit["parsed"], user_prompt, intent, target_lang, sender_name, cached=True)
+
+    # attempt up to 2 times if we do not get parseable JSON
+    parsed = None
+    raw_str = ""
+    for attempt in range(2):
+        try:
+            raw = llm_chat(messages, model=model, temperature=0.2, max_tokens=max_tokens, schema=draft_schema())
+        except Exception as e:
+            logger.exception("LLM call failed")
+            raise
+
+        raw_str, parsed = parse_draft_reply(raw)
+        logger.info("LLM raw reply (attempt %s): %s", attempt + 1, raw_str[:400])
+        if parsed is not None:
+            break
+
+        # if not parsed, on second iteration we will add a strict followup instruction
+        if attempt == 0:
+            add_retry_instruction(messages)
+
+    if parsed is not None and from_primary(raw):
+        draft_cache.cache.put(key, {"raw": raw_str, "parsed": parsed}, cache)
+    return finalize_draft(raw_str, parsed, user_prompt, intent, target_lang, sender_name)
+
+
+async def agenerate_email_json_forced(
+    user_prompt: str,
+    tone: str = "formal",
+    length: str = "medium",
+    target_lang: str = "en",
+    intent: Optional[str] = None,
+    model: Optional[str] = None,
+    sender_name: str = "",
+    cache: str = "use",
+) -> Dict[str, str]:
+    """Async twin of generate_email_json_forced: same prompt, parsing, retry and cache, without blocking the event loop."""
+    model = model or MODEL
+    logger.info("agenerate_email_json_forced model=%s provider=%s", model, PROVIDER)
+    messages, intent = build_draft_messages(user_prompt, tone, length, target_lang, intent)
+    max_tokens = draft_max_tokens(length, target_lang)
+    logger.info("draft prompt_tokens=%d max_tokens=%d", token_budget.count_message_tokens(messages), max_tokens)
+    key = draft_cache_key(messages, model, max_tokens)
+    hit = await draft_cache.cache.aget(key, cache)
+    if hit is not None:
+        return finalize_draft(hit["raw"], hit["parsed"], user_prompt, intent, target_lang, sender_name, cached=True)
+
+    parsed = None
+    raw_str = ""
+    for attempt in range(2):
+        try:
+            raw = await allm_chat(messages, model=model, temperature=0.2, max_tokens=max_tokens, schema=draft_schema())
+        except Exception:
+            logger.exception("LLM call failed")
+            raise
+
+        raw_str, parsed = parse_draft_reply(raw)
+        logger.info("LLM raw reply (attempt %s): %s", attempt + 1, raw_str[:400])
+        if parsed is not None:
+            break
+        if attempt == 0:
+            add_retry_instruction(messages)
+
+    if parsed is not None and from_primary(raw):
+        await draft_cache.cache.aput(key, {"raw": raw_str, "parsed": parsed}, cache)
+    return finalize_draft(raw_str, parsed, user_prompt, intent, target_lang, sender_name)
+
+
 # convenience alias - keep compatibility with older code
 def generate_email(user_prompt: str, tone="formal", length="medium", target_lang="en", intent="request_info"):
     return generate_email_json_forced(user_prompt, tone=tone, length=length, target_lang=target_lang, intent=intent)
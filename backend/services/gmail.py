@@ -1,8 +1,148 @@
+import os
+import json
+import time
 import base64
+import logging
+import threading
 from bs4 import BeautifulSoup
-from typing import List, Dict
-from googleapiclient.discovery import build
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import build_http
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+
+# Gmail accepts up to 100 calls per batch, but recommends staying at or below 50
+# to avoid per-user concurrency 429s inside a single batch.
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+GMAIL_BATCH_RETRIES = int(os.getenv("GMAIL_BATCH_RETRIES", "2"))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger("gmail")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+class HistoryExpired(Exception):
+    """The stored startHistoryId is too old for users.history.list (HTTP 404)."""
+
+def _tokens_base_dir() -> str:
+    # Use persistent disk on Render if available
+    return "/data/tokens" if os.path.exists("/data") else os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "models"))
+
+def token_path_for(email_addr: str) -> str:
+    return os.path.join(_tokens_base_dir(), f"token_{email_addr}.json")
+
+def known_accounts() -> List[str]:
+    """Every signed-in account, i.e. every token_<email>.json on disk."""
+    d = _tokens_base_dir()
+    if not os.path.isdir(d):
+        return []
+    return sorted(f[len("token_"):-len(".json")] for f in os.listdir(d) if f.startswith("token_") and f.endswith(".json"))
+
+def _save_creds(creds: Credentials, token_path: str):
+    with open(token_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "token": creds.token,
+            "refresh_token": creds.refresh_token,
+            "token_uri": creds.token_uri,
+            "client_id": creds.client_id,
+            "client_secret": creds.client_secret,
+            "scopes": creds.scopes,
+        }, f)
+
+# email -> (Credentials, token file mtime_ns); the mtime check picks up re-auth
+_creds_cache: Dict[str, Tuple[Credentials, int]] = {}
+_creds_locks: Dict[str, threading.RLock] = {}
+_creds_locks_guard = threading.Lock()
+
+def _creds_lock(email_addr: str) -> threading.RLock:
+    with _creds_locks_guard:
+        return _creds_locks.setdefault(email_addr, threading.RLock())
+
+def _serialize_refresh(creds: Credentials, email_addr: str, token_path: str):
+    """
+    Route every refresh of this shared Credentials object (ours, or the
+    transport's on expiry/401) through the user's lock, so concurrent
+    requests trigger a single token refresh and the new token is persisted.
+    """
+    lock = _creds_lock(email_addr)
+    unlocked_refresh = creds.refresh
+    def refresh(request):
+        stale = creds.token
+        with lock:
+            if creds.token != stale and creds.valid:
+                return  # another thread refreshed while we waited
+            unlocked_refresh(request)
+            _save_creds(creds, token_path)
+            entry = _creds_cache.get(email_addr)
+            if entry and entry[0] is creds:
+                _creds_cache[email_addr] = (creds, os.stat(token_path).st_mtime_ns)
+    creds.refresh = refresh
+
+def load_creds(email_addr: str) -> Credentials:
+    """
+    The user's OAuth credentials, cached per user. The token file is only
+    re-read when it changes on disk (e.g. after signing in again), and an
+    expired token is refreshed once under a per-user lock.
+    """
+    token_path = token_path_for(email_addr)
+    with _creds_lock(email_addr):
+        try:
+            mtime = os.stat(token_path).st_mtime_ns
+        except FileNotFoundError:
+            _creds_cache.pop(email_addr, None)
+            raise FileNotFoundError("Token file not found. Sign in via /auth/google first.")
+        entry = _creds_cache.get(email_addr)
+        if entry is None or entry[1] != mtime:
+            with open(token_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            creds = Credentials(**data)
+            _serialize_refresh(creds, email_addr, token_path)
+            _creds_cache[email_addr] = (creds, mtime)
+        creds = _creds_cache[email_addr][0]
+
+        # Refresh if needed (uses stored refresh_token)
+        if creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        return creds
+
+_discovery_doc: Optional[Dict] = None
+_discovery_lock = threading.Lock()
+
+def _gmail_discovery() -> Dict:
+    """The bundled Gmail v1 discovery document, parsed once per process."""
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            _discovery_doc = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+        return _discovery_doc
+
+# httplib2.Http is not thread-safe, so clients are cached per thread: each
+# thread keeps one keep-alive transport shared by all of its users' clients.
+_local = threading.local()
+
+def user_service(email_addr: str):
+    """
+    Gmail API client for a signed-in user (raises FileNotFoundError without a
+    token). Reused across calls on the same thread until the user's
+    credentials change, so requests skip discovery parsing and reuse
+    connections.
+    """
+    creds = load_creds(email_addr)
+    if not hasattr(_local, "services"):
+        _local.services = {}
+        _local.http = build_http()
+    cached = _local.services.get(email_addr)
+    if cached is not None and cached[0] is creds:
+        return cached[1]
+    svc = build_from_document(_gmail_discovery(), http=AuthorizedHttp(creds, http=_local.http))
+    _local.services[email_addr] = (creds, svc)
+    return svc
 
 def gmail_service(creds_dict):
     creds = Credentials(**creds_dict)
@@ -26,20 +166,140 @@ def extract_text_from_payload(payload):
     walk(payload.get("parts", []))
     return txt.strip()
 
-def fetch_messages(svc, max_results=50) -> List[Dict]:
+def parse_message(full: Dict) -> Dict:
+    """Reduce a `format=full` Gmail message to the minimal fields we store."""
+    headers = {h["name"].lower(): h["value"] for h in full["payload"]["headers"]}
+    body_text = extract_text_from_payload(full["payload"]) or full.get("snippet","")
+    return {
+        "gmail_id": full["id"],
+        "from_addr": headers.get("from",""),
+        "to_addr": headers.get("to",""),
+        "subject": headers.get("subject",""),
+        "received_at": headers.get("date",""),
+        "snippet": full.get("snippet",""),
+        "body_text": body_text
+    }
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, HttpError):
+        return exc.resp.status in RETRYABLE_STATUS
+    # transport-level errors (connection reset, timeouts) are worth another try
+    return True
+
+def get_messages(svc, ids: Iterable[str], batch_size: int = None, retries: int = None) -> Tuple[List[Dict], List[str]]:
+    """
+    Fetch `format=full` messages for `ids` using Gmail batch requests.
+
+    Calls are grouped `batch_size` at a time into one HTTP round trip each.
+    Items that fail with a retryable status (429/5xx) are re-batched with
+    backoff up to `retries` times; permanent failures (e.g. 404 for a message
+    deleted since listing) are dropped. Returns (messages in input order,
+    ids that could not be fetched).
+    """
+    ids = list(ids)
+    batch_size = max(1, min(batch_size or GMAIL_BATCH_SIZE, 100))
+    retries = GMAIL_BATCH_RETRIES if retries is None else retries
+
+    results: Dict[str, Dict] = {}
+    failed: List[str] = []
+    pending = ids
+    for attempt in range(retries + 1):
+        retry_ids: List[str] = []
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif _is_retryable(exception):
+                retry_ids.append(request_id)
+            else:
+                logger.warning("Gmail get %s failed: %s", request_id, exception)
+                failed.append(request_id)
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = svc.new_batch_http_request(callback=on_response)
+            for mid in chunk:
+                batch.add(svc.users().messages().get(userId="me", id=mid, format="full"), request_id=mid)
+            try:
+                batch.execute()
+            except Exception as e:
+                # the whole batch round trip failed; retry every unanswered item
+                logger.warning("Gmail batch of %s failed: %s", len(chunk), e)
+                retry_ids.extend(mid for mid in chunk if mid not in results and mid not in retry_ids and mid not in failed)
+
+        if not retry_ids:
+            break
+        if attempt == retries:
+            failed.extend(retry_ids)
+            break
+        pending = retry_ids
+        time.sleep(0.5 * (2 ** attempt))
+
+    if failed:
+        logger.warning("Gmail batch fetch: %s of %s messages failed", len(failed), len(ids))
+    return [results[i] for i in ids if i in results], failed
+
+def fetch_messages(svc, max_results=50, batch_size=None) -> List[Dict]:
     lst = svc.users().messages().list(userId="me", maxResults=max_results).execute().get("messages", [])
-    out = []
-    for m in lst:
-        full = svc.users().messages().get(userId="me", id=m["id"], format="full").execute()
-        headers = {h["name"].lower(): h["value"] for h in full["payload"]["headers"]}
-        body_text = extract_text_from_payload(full["payload"]) or full.get("snippet","")
-        out.append({
-            "gmail_id": m["id"],
-            "from_addr": headers.get("from",""),
-            "to_addr": headers.get("to",""),
-            "subject": headers.get("subject",""),
-            "received_at": headers.get("date",""),
-            "snippet": full.get("snippet",""),
-            "body_text": body_text
-        })
-    return out
+    fulls, _failed = get_messages(svc, [m["id"] for m in lst], batch_size=batch_size)
+    return [parse_message(full) for full in fulls]
+
+def iter_message_pages(svc, page_token: Optional[str] = None, page_size: int = 500) -> Iterator[Tuple[List[str], Optional[str], int]]:
+    """
+    Walk the whole mailbox via messages.list `nextPageToken`, one page at a time.
+
+    Yields (message_ids, next_page_token, result_size_estimate). Only one page
+    of ids is held at a time, so callers can stream arbitrarily large
+    mailboxes. Start from `page_token` to resume an interrupted walk.
+    """
+    while True:
+        resp = svc.users().messages().list(userId="me", maxResults=page_size, pageToken=page_token).execute()
+        ids = [m["id"] for m in resp.get("messages", [])]
+        page_token = resp.get("nextPageToken")
+        yield ids, page_token, int(resp.get("resultSizeEstimate", 0))
+        if not page_token:
+            break
+
+def get_history_id(svc) -> str:
+    """Current mailbox historyId, used as the checkpoint for the next incremental sync."""
+    return str(svc.users().getProfile(userId="me").execute()["historyId"])
+
+def list_history(svc, start_history_id: str) -> Tuple[List[str], List[str], str]:
+    """
+    Collect message changes since `start_history_id`.
+
+    Returns (added_ids, deleted_ids, latest_history_id). A message added and
+    deleted inside the window is reported only as deleted. Raises
+    HistoryExpired when Gmail no longer has history that far back, in which
+    case the caller must fall back to a full resync.
+    """
+    added: Dict[str, None] = {}
+    deleted: Dict[str, None] = {}
+    latest = str(start_history_id)
+    page_token = None
+    while True:
+        try:
+            resp = svc.users().history().list(
+                userId="me",
+                startHistoryId=start_history_id,
+                historyTypes=["messageAdded", "messageDeleted"],
+                pageToken=page_token,
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpired(str(start_history_id)) from e
+            raise
+        for h in resp.get("history", []):
+            for item in h.get("messagesAdded", []):
+                mid = item["message"]["id"]
+                if mid not in deleted:
+                    added[mid] = None
+            for item in h.get("messagesDeleted", []):
+                mid = item["message"]["id"]
+                added.pop(mid, None)
+                deleted[mid] = None
+        latest = str(resp.get("historyId", latest))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+    return list(added), list(deleted), latest
@@ -0,0 +1,345 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+from backend.models.db import Email
+from backend.services import nlp
+from backend.services.gmail import get_messages, parse_message
+from backend.services.translation import detect_lang
+
+# batches buffered between two stages; peak memory ~ stages * depth * batch size
+PIPELINE_QUEUE_DEPTH = int(os.getenv("PIPELINE_QUEUE_DEPTH", "2"))
+# workers for MIME decode / HTML strip / language detection
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# "process" parallelizes parsing across cores; "thread" avoids process start-up on small hosts
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "process" if (os.cpu_count() or 1) > 1 else "thread")
+# characters of subject + body handed to langdetect (its cost grows with input length)
+LANG_SAMPLE_CHARS = int(os.getenv("LANG_SAMPLE_CHARS", "500"))
+# ids per dedup IN (...) query, below SQLite's bound-parameter limit
+DEDUP_CHUNK = 500
+
+STAGES = ("fetch", "parse", "lang", "spam", "write")
+
+logger = logging.getLogger("ingest_pipeline")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+class StageStats:
+    def __init__(self):
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0  # seconds spent working, excluding queue waits
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.busy += seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_s": round(self.busy, 3),
+            "items_per_s": round(self.items / self.busy, 1) if self.busy else None,
+        }
+
+class PipelineStats:
+    """Per-stage counters for one pipeline run (or, merged, for the process lifetime)."""
+
+    def __init__(self):
+        self.stages = {name: StageStats() for name in STAGES}
+        self.skipped = 0  # ids already stored, never fetched
+        self.failed = 0  # ids Gmail would not return
+        self.malformed = 0  # fetched but unparseable, dropped
+        self.runs = 0
+        self.wall = 0.0
+
+    def merge(self, other: "PipelineStats"):
+        for name, st in other.stages.items():
+            mine = self.stages[name]
+            mine.items += st.items
+            mine.batches += st.batches
+            mine.busy += st.busy
+        self.skipped += other.skipped
+        self.failed += other.failed
+        self.malformed += other.malformed
+        self.runs += other.runs
+        self.wall += other.wall
+
+    def as_dict(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "wall_s": round(self.wall, 3),
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "malformed": self.malformed,
+            "stages": {name: st.as_dict() for name, st in self.stages.items()},
+        }
+
+# cumulative counters since process start, and the most recent run
+_totals = PipelineStats()
+_last_run: Optional[Dict] = None
+_stats_lock = threading.Lock()
+
+def pipeline_stats() -> Dict:
+    with _stats_lock:
+        return {"totals": _totals.as_dict(), "last_run": _last_run}
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> Executor:
+    """Shared parse pool, created on first use and reused across syncs."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PIPELINE_EXECUTOR == "process":
+                # forkserver: never fork a process that is running sync/web threads
+                _executor = ProcessPoolExecutor(PIPELINE_WORKERS, mp_context=get_context("forkserver"))
+            else:
+                _executor = ThreadPoolExecutor(PIPELINE_WORKERS, thread_name_prefix="ingest-parse")
+        return _executor
+
+def _parse_or_none(full: Dict) -> Optional[Dict]:
+    """parse_message, or None for a message too malformed to store."""
+    try:
+        return parse_message(full)
+    except Exception as e:
+        logger.warning("Skipping malformed message %s: %r", full.get("id"), e)
+        return None
+
+def _lang_of(m: Dict) -> str:
+    return detect_lang(f"{m.get('subject','')}\n{m.get('body_text','')}"[:LANG_SAMPLE_CHARS])
+
+def existing_ids(session: Session, user_email: str, ids: List[str]) -> set:
+    """The subset of `ids` already stored for `user_email` (one IN query per DEDUP_CHUNK)."""
+    found = set()
+    for start in range(0, len(ids), DEDUP_CHUNK):
+        found.update(session.scalars(
+            select(Email.gmail_id).where(Email.user_email == user_email, Email.gmail_id.in_(ids[start:start + DEDUP_CHUNK]))
+        ))
+    return found
+
+class Batch:
+    """One chunk of messages moving through the stages, plus the caller's tag for it."""
+    __slots__ = ("tag", "ids", "items", "failed", "malformed", "skipped", "inserted")
+
+    def __init__(self, tag, ids: List[str], skipped: int = 0):
+        self.tag = tag
+        self.ids = ids
+        self.items: List = []
+        self.failed = 0
+        self.malformed = 0
+        self.skipped = skipped
+        self.inserted = 0
+
+_DONE = object()
+
+class _Failed:
+    """End-of-stream marker carrying an upstream stage's exception."""
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+class _Aborted(Exception):
+    pass
+
+def run_pipeline(
+    svc,
+    session: Session,
+    user_email: str,
+    feed: Iterable[Tuple[object, List[str]]],
+    store: Callable[[Session, str, List[Dict]], int],
+    on_batch: Optional[Callable[[Batch], None]] = None,
+    executor: Optional[Executor] = None,
+    depth: int = None,
+) -> PipelineStats:
+    """
+    Fetch, decode, language-tag, spam-score and store messages as a stream.
+
+    `feed` yields (tag, gmail_ids) chunks and may be lazy (e.g. walking
+    messages.list pages). Each stage runs in its own thread and hands
+    batches to the next over a queue holding at most `depth` batches, so
+    network fetches, CPU-heavy parsing (on the shared worker pool) and DB
+    writes overlap, and memory is bounded by the queue depths rather than
+    by the number of messages. Ids already stored are dropped before they
+    are fetched.
+
+    `store(session, user_email, msgs)` runs on the calling thread, which is
+    the only one using `session`; `on_batch(batch)` is called right after
+    each store, in feed order, so callers can commit progress. Messages
+    that cannot be parsed are dropped and counted in `batch.malformed`. If a
+    stage fails, the stages before it stop, batches ahead of the failure
+    are still stored and the error is raised afterwards; if `store` fails,
+    everything stops at once.
+
+    The pre-fetch dedup opens its own connection; on engines where every
+    session shares one connection (in-memory SQLite) it is skipped and
+    `store` alone must drop duplicates.
+    """
+    depth = depth or PIPELINE_QUEUE_DEPTH
+    executor = executor or _get_executor()
+    stats = PipelineStats()
+    stats.runs = 1
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    started = time.perf_counter()
+
+    closed = set()  # queues whose reader has exited
+
+    def put(q: queue.Queue, item):
+        while True:
+            if stop.is_set() or q in closed:
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(q: queue.Queue):
+        while True:
+            if stop.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def fail(e: BaseException):
+        errors.append(e)
+        stop.set()
+
+    q_raw, q_parsed, q_tagged, q_scored = (queue.Queue(depth) for _ in range(4))
+    bind = session.get_bind()
+    prefilter = not isinstance(getattr(bind, "pool", None), (StaticPool, SingletonThreadPool))
+
+    # fetch: the only stage that reads the feed. Its dedup lookups use a
+    # session of their own so they never share the caller's connection.
+    def fetch_stage():
+        dedup = Session(bind=bind) if prefilter else None
+        try:
+            for tag, ids in feed:
+                t = time.perf_counter()
+                ids = list(dict.fromkeys(ids))
+                have = set()
+                if dedup is not None and ids:
+                    have = existing_ids(dedup, user_email, ids)
+                    dedup.rollback()  # end the read transaction so writers are not held back
+                batch = Batch(tag, [i for i in ids if i not in have], skipped=len(have))
+                if batch.ids:
+                    batch.items, failed = get_messages(svc, batch.ids)
+                    batch.failed = len(failed)
+                stats.stages["fetch"].add(len(batch.items), time.perf_counter() - t)
+                stats.skipped += batch.skipped
+                stats.failed += batch.failed
+                put(q_raw, batch)
+            put(q_raw, _DONE)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            # let the batches already queued be stored before the error surfaces
+            try:
+                put(q_raw, _Failed(e))
+            except _Aborted:
+                pass
+        finally:
+            if dedup is not None:
+                dedup.close()
+
+    def parse(batch: Batch):
+        parsed = list(executor.map(_parse_or_none, batch.items, chunksize=8))
+        items = [m for m in parsed if m is not None]
+        batch.malformed = len(parsed) - len(items)
+        stats.malformed += batch.malformed
+        return items
+
+    def lang(batch: Batch):
+        items = batch.items
+        for m, code in zip(items, executor.map(_lang_of, items, chunksize=8)):
+            m["lang"] = code
+        return items
+
+    def spam(batch: Batch):
+        items = batch.items
+        try:
+            labels, _scores = nlp.predict_spam_batch([f"{m.get('subject','')} {m.get('body_text','')}" for m in items])
+        except Exception:
+            labels = [False] * len(items)  # fallback
+        for m, label in zip(items, labels):
+            m["is_spam"] = bool(label)
+        return items
+
+    def stage(name, inq, outq, work):
+        def run():
+            try:
+                while True:
+                    batch = get(inq)
+                    if batch is _DONE or isinstance(batch, _Failed):
+                        put(outq, batch)
+                        return
+                    try:
+                        if batch.items:
+                            t = time.perf_counter()
+                            batch.items = work(batch)
+                            stats.stages[name].add(len(batch.items), time.perf_counter() - t)
+                    except BaseException as e:
+                        # end the stream here: what is queued downstream is still stored
+                        put(outq, _Failed(e))
+                        return
+                    put(outq, batch)
+            except _Aborted:
+                pass
+            finally:
+                closed.add(inq)  # upstream stops instead of filling a queue nobody reads
+        return threading.Thread(target=run, name=f"ingest-{name}", daemon=True)
+
+    threads = [
+        threading.Thread(target=fetch_stage, name="ingest-fetch", daemon=True),
+        stage("parse", q_raw, q_parsed, parse),
+        stage("lang", q_parsed, q_tagged, lang),
+        stage("spam", q_tagged, q_scored, spam),
+    ]
+    for t in threads:
+        t.start()
+
+    # write: on the caller's thread, the only user of `session`
+    try:
+        while True:
+            try:
+                batch = get(q_scored)
+            except _Aborted:
+                break
+            if batch is _DONE:
+                break
+            if isinstance(batch, _Failed):
+                fail(batch.exc)
+                break
+            t = time.perf_counter()
+            batch.inserted = store(session, user_email, batch.items) if batch.items else 0
+            if on_batch:
+                on_batch(batch)
+            stats.stages["write"].add(len(batch.items), time.perf_counter() - t)
+    except BaseException as e:
+        fail(e)
+    finally:
+        for t in threads:
+            t.join()
+
+    stats.wall = time.perf_counter() - started
+    global _last_run
+    with _stats_lock:
+        _totals.merge(stats)
+        _last_run = {"user_email": user_email, **stats.as_dict()}
+    if errors:
+        raise errors[0]
+    return stats
@@ -0,0 +1,160 @@
+# backend/services/json_repair.py
+"""
+Tolerant parsing of {"subject": ..., "body": ...} draft replies.
+
+DraftJSONStream decodes the two string values incrementally, so the stream
+endpoint can forward them while the reply is still arriving. The same state
+machine also recovers replies that json.loads rejects: wrapped in code fences
+or chatter, raw newlines inside strings, trailing commas, or cut off in the
+middle of the body (MAX_TOKENS). repair_draft_json is that recovery.
+"""
+from typing import Dict, List, Optional, Tuple
+
+FIELDS = ("subject", "body")
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class DraftJSONStream:
+    """
+    Incremental parser for the top-level JSON object of a draft reply.
+
+    feed() takes arbitrary text pieces (a token may split an escape sequence
+    or a key) and returns the newly decoded text of the subject/body string
+    values as [(field, text), ...]. Text before the opening brace (code
+    fences, chatter) and values of other keys are skipped.
+    """
+
+    def __init__(self):
+        self.state = "pre"
+        self.key: List[str] = []
+        self.field: Optional[str] = None
+        self.escape: Optional[str] = None  # None, "" right after a backslash, or \\u hex digits so far
+        self.high_surrogate: Optional[int] = None
+        self.skip_depth = 0
+        self.skip_in_string = False
+        self.skip_escape = False
+
+    @property
+    def finished(self) -> bool:
+        return self.state == "end"
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        out: List[Tuple[str, str]] = []
+        for ch in text:
+            piece = self._step(ch)
+            if piece and self.field:
+                if out and out[-1][0] == self.field:
+                    out[-1] = (self.field, out[-1][1] + piece)
+                else:
+                    out.append((self.field, piece))
+        return out
+
+    def _step(self, ch: str) -> Optional[str]:
+        st = self.state
+        if st == "pre":
+            if ch == "{":
+                self.state = "key_start"
+        elif st == "key_start":
+            if ch == '"':
+                self.key, self.state = [], "key"
+            elif ch == "}":
+                self.state = "end"
+        elif st == "key":
+            if self.escape is not None:
+                self.key.append(ch)
+                self.escape = None
+            elif ch == "\\":
+                self.escape = ""
+            elif ch == '"':
+                self.state = "colon"
+            else:
+                self.key.append(ch)
+        elif st == "colon":
+            if ch == ":":
+                self.state = "value_start"
+        elif st == "value_start":
+            if ch.isspace():
+                return None
+            key = "".join(self.key)
+            if ch == '"':
+                self.field = key if key in FIELDS else None
+                self.state = "string"
+            else:
+                self.state, self.skip_depth = "skip", 0
+                self.skip_in_string = self.skip_escape = False
+                return self._step(ch)
+        elif st == "string":
+            return self._string_char(ch)
+        elif st == "skip":
+            self._skip_char(ch)
+        return None
+
+    def _string_char(self, ch: str) -> Optional[str]:
+        if self.escape is None:
+            if ch == "\\":
+                self.escape = ""
+                return None
+            if ch == '"':
+                self.field, self.state = None, "key_start"
+                return None
+            return self._flush_surrogate() + ch
+        if self.escape == "":
+            if ch == "u":
+                self.escape = "u"
+                return None
+            self.escape = None
+            return self._flush_surrogate() + _ESCAPES.get(ch, ch)
+        # collecting \\uXXXX
+        self.escape += ch
+        if len(self.escape) < 5:
+            return None
+        hex_digits, self.escape = self.escape[1:], None
+        try:
+            code = int(hex_digits, 16)
+        except ValueError:
+            return self._flush_surrogate() + "�"
+        if 0xD800 <= code < 0xDC00:
+            pending = self._flush_surrogate()
+            self.high_surrogate = code
+            return pending or None
+        if 0xDC00 <= code < 0xE000 and self.high_surrogate is not None:
+            high, self.high_surrogate = self.high_surrogate, None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        return self._flush_surrogate() + chr(code)
+
+    def _flush_surrogate(self) -> str:
+        if self.high_surrogate is None:
+            return ""
+        self.high_surrogate = None
+        return "�"
+
+    def _skip_char(self, ch: str):
+        """Step over a non-subject/body value (number, literal, nested object or array)."""
+        if self.skip_in_string:
+            if self.skip_escape:
+                self.skip_escape = False
+            elif ch == "\\":
+                self.skip_escape = True
+            elif ch == '"':
+                self.skip_in_string = False
+        elif ch == '"':
+            self.skip_in_string = True
+        elif ch in "{[":
+            self.skip_depth += 1
+        elif ch in "}]" and self.skip_depth:
+            self.skip_depth -= 1
+        elif self.skip_depth == 0 and ch == ",":
+            self.state = "key_start"
+        elif self.skip_depth == 0 and ch == "}":
+            self.state = "end"
+
+
+def repair_draft_json(text: str) -> Optional[Dict[str, str]]:
+    """Best-effort {subject, body} from a reply that is not valid JSON; None if there is no usable body."""
+    parser = DraftJSONStream()
+    values: Dict[str, str] = {}
+    for field, piece in parser.feed(text):
+        values[field] = values.get(field, "") + piece
+    if not values.get("body", "").strip():
+        return None
+    return {"subject": values.get("subject", ""), "body": values["body"]}
@@ -0,0 +1,393 @@
+# backend/services/llm_router.py
+"""
+Provider routing for LLM calls: ordered failover, optional hedging and a
+circuit breaker per provider.
+
+The pool is tried in order (LLM_PROVIDER first, then LLM_FALLBACK_PROVIDERS).
+An attempt that raises or exceeds LLM_PROVIDER_TIMEOUT moves on to the next
+provider. With LLM_HEDGE=1, if the running attempt is slower than its
+provider's recent p95 latency, the next provider is started alongside it and
+whichever answers first wins (at most one hedge per call).
+
+After LLM_BREAKER_FAILURES consecutive failures a provider's breaker opens
+and it is skipped for LLM_BREAKER_COOLDOWN seconds; then one trial request
+is let through (half-open) and its outcome closes or re-opens the breaker.
+Errors that say nothing about the provider's health (a missing API key, a
+4xx for a request it will never accept) still fail over but are counted as
+client_errors, not failures.
+
+Rolling latency/error figures, latency histograms and recent routing
+decisions are available from stats() (GET /generate/providers).
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# seconds one provider attempt may take before failing over
+LLM_PROVIDER_TIMEOUT = float(os.getenv("LLM_PROVIDER_TIMEOUT", "45"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+# hedge once the attempt has run longer than this quantile of the provider's recent latencies
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+# no hedging until a provider has this many recent successes to estimate from
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# calls per provider kept for the rolling latency/error figures
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "200"))
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)  # seconds, upper bounds
+
+logger = logging.getLogger("llm_router")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+class AllProvidersFailed(RuntimeError):
+    pass
+
+
+class ProviderConfigError(RuntimeError):
+    """The provider cannot be called as configured (e.g. no API key)."""
+
+
+def _is_outage(e: BaseException) -> bool:
+    """Should `e` count against the provider's breaker? Not for our own config or request errors."""
+    if isinstance(e, ProviderConfigError):
+        return False
+    response = getattr(e, "response", None)
+    status = getattr(response, "status_code", None) or getattr(e, "status_code", None)
+    return not isinstance(status, int) or not 400 <= status < 500 or status in (408, 429)
+
+
+def _call_with_timeout(call: Callable[[str], str], provider: str, timeout: float) -> str:
+    """Run `call(provider)` on a daemon thread and stop waiting after `timeout` seconds."""
+    box: Dict = {}
+    done = threading.Event()
+
+    def run():
+        try:
+            box["result"] = call(provider)
+        except BaseException as e:
+            box["error"] = e
+        finally:
+            done.set()
+
+    # a hung call cannot be interrupted; its thread finishes (or not) on its own and the answer is dropped
+    threading.Thread(target=run, name=f"llm-{provider}", daemon=True).start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"{provider} did not answer within {timeout}s")
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+def _give_up(pool: List[str], errors: Dict[str, str], last: Optional[BaseException]):
+    # a pool of one behaves like a direct call: the provider's own error surfaces
+    if len(pool) == 1 and last is not None:
+        raise last
+    raise AllProvidersFailed(f"All LLM providers failed: {errors}") from last
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class ProviderState:
+    def __init__(self, window: int):
+        self.recent = deque(maxlen=window)  # (latency seconds, ok)
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.counts = dict.fromkeys(
+            ("attempts", "successes", "failures", "client_errors", "timeouts", "cancelled", "skipped_open",
+             "hedges_started", "hedges_won"), 0)
+        self.consecutive_failures = 0
+        self.state = "closed"  # closed | open | half_open
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def latencies(self) -> List[float]:
+        return [lat for lat, ok in self.recent if ok]
+
+    def as_dict(self) -> Dict:
+        lat = self.latencies()
+        n = len(self.recent)
+        errors = sum(1 for _, ok in self.recent if not ok)
+        p50, p95 = _quantile(lat, 0.5), _quantile(lat, 0.95)
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS] + ["le_inf"]
+        return {
+            "breaker": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            **self.counts,
+            "window": n,
+            "error_rate": round(errors / n, 3) if n else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "latency_histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        timeout: float = LLM_PROVIDER_TIMEOUT,
+        hedge: bool = LLM_HEDGE,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        breaker_failures: int = LLM_BREAKER_FAILURES,
+        breaker_cooldown: float = LLM_BREAKER_COOLDOWN,
+        window: int = LLM_STATS_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._providers: Dict[str, ProviderState] = {}
+        self.decisions = deque(maxlen=50)
+
+    def _state(self, provider: str) -> ProviderState:
+        st = self._providers.get(provider)
+        if st is None:
+            st = self._providers[provider] = ProviderState(self.window)
+        return st
+
+    # ---- breaker ----
+    def _admit(self, provider: str) -> bool:
+        """May `provider` take a request now? Reserves the half-open trial slot."""
+        with self._lock:
+            st = self._state(provider)
+            if st.state == "closed":
+                return True
+            if st.state == "open" and self.clock() - st.opened_at >= self.breaker_cooldown:
+                st.state = "half_open"
+            if st.state == "half_open" and not st.trial_in_flight:
+                st.trial_in_flight = True
+                return True
+            st.counts["skipped_open"] += 1
+            return False
+
+    def _record(self, provider: str, latency: float, ok: bool, timed_out: bool = False,
+                error: Optional[BaseException] = None):
+        if error is not None and not _is_outage(error):
+            with self._lock:
+                st = self._state(provider)
+                st.counts["client_errors"] += 1
+                st.trial_in_flight = False  # no verdict on the provider's health
+            return
+        with self._lock:
+            st = self._state(provider)
+            st.counts["attempts"] += 1
+            st.recent.append((latency, ok))
+            st.trial_in_flight = False
+            if ok:
+                st.counts["successes"] += 1
+                st.histogram[next((i for i, b in enumerate(LATENCY_BUCKETS) if latency <= b), len(LATENCY_BUCKETS))] += 1
+                st.consecutive_failures = 0
+                if st.state != "closed":
+                    logger.info("LLM provider %s recovered; circuit closed", provider)
+                st.state = "closed"
+                return
+            st.counts["failures"] += 1
+            if timed_out:
+                st.counts["timeouts"] += 1
+            st.consecutive_failures += 1
+            if st.state == "half_open" or st.consecutive_failures >= self.breaker_failures:
+                if st.state != "open":
+                    logger.warning("LLM provider %s failing (%d in a row); circuit open for %ss",
+                                   provider, st.consecutive_failures, self.breaker_cooldown)
+                st.state, st.opened_at = "open", self.clock()
+
+    def _release(self, provider: str):
+        """An attempt was cancelled or abandoned by its reader: no verdict, free the trial slot."""
+        with self._lock:
+            st = self._state(provider)
+            st.counts["cancelled"] += 1
+            st.trial_in_flight = False
+
+    def _hedge_delay(self, provider: str) -> Optional[float]:
+        with self._lock:
+            lat = self._state(provider).latencies()
+        if len(lat) < self.hedge_min_samples:
+            return None
+        return _quantile(lat, self.hedge_quantile)
+
+    def _decide(self, pool: List[str], **outcome):
+        self.decisions.append({"at": time.time(), "pool": list(pool), **outcome})
+
+    # ---- calls ----
+    async def _attempt(self, provider: str, call: Callable[[str], Awaitable[str]]) -> str:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(provider), self.timeout)
+        except asyncio.CancelledError:
+            self._release(provider)
+            raise
+        except asyncio.TimeoutError:
+            self._record(provider, time.perf_counter() - start, ok=False, timed_out=True)
+            raise TimeoutError(f"{provider} did not answer within {self.timeout}s")
+        except Exception as e:
+            self._record(provider, time.perf_counter() - start, ok=False, error=e)
+            raise
+        self._record(provider, time.perf_counter() - start, ok=True)
+        return result
+
+    async def acall(self, pool: List[str], call: Callable[[str], Awaitable[str]]) -> str:
+        """Run `call(provider)` against the pool with failover and (optionally) one hedge."""
+        errors: Dict[str, str] = {}
+        remaining = list(pool)
+        running: Dict[asyncio.Task, str] = {}
+        hedge: Optional[str] = None  # provider started as the hedge, if any
+        last: Optional[BaseException] = None
+
+        def launch() -> Optional[str]:
+            while remaining:
+                provider = remaining.pop(0)
+                if self._admit(provider):
+                    running[asyncio.ensure_future(self._attempt(provider, call))] = provider
+                    return provider
+                errors[provider] = "circuit open"
+            return None
+
+        try:
+            launch()
+            while running:
+                delay = None
+                if self.hedge and hedge is None and len(running) == 1 and remaining:
+                    delay = self._hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    slow = next(iter(running.values()))
+                    hedge = launch() or ""
+                    if hedge:
+                        with self._lock:
+                            self._state(hedge).counts["hedges_started"] += 1
+                        logger.info("LLM provider %s slower than its p%d (%.2fs); hedging with %s",
+                                    slow, round(self.hedge_quantile * 100), delay, hedge)
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if provider == hedge and running:  # beat the slow attempt, which is cancelled below
+                            with self._lock:
+                                self._state(provider).counts["hedges_won"] += 1
+                        self._decide(pool, provider=provider, failed=dict(errors), hedged=bool(hedge))
+                        if errors:
+                            logger.warning("LLM call served by %s after: %s", provider, errors)
+                        return task.result()
+                    last = task.exception()
+                    errors[provider] = repr(last)
+                if not running:
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+
+        self._decide(pool, provider=None, failed=dict(errors), hedged=bool(hedge))
+        _give_up(pool, errors, last)
+
+    def call(self, pool: List[str], call: Callable[[str], str]) -> str:
+        """Blocking counterpart: sequential failover with the same breakers and timeout (no hedging)."""
+        errors: Dict[str, str] = {}
+        last: Optional[BaseException] = None
+        for provider in pool:
+            if not self._admit(provider):
+                errors[provider] = "circuit open"
+                continue
+            start = time.perf_counter()
+            try:
+                result = _call_with_timeout(call, provider, self.timeout)
+            except Exception as e:
+                self._record(provider, time.perf_counter() - start, ok=False, timed_out=isinstance(e, TimeoutError), error=e)
+                errors[provider], last = repr(e), e
+                continue
+            self._record(provider, time.perf_counter() - start, ok=True)
+            self._decide(pool, provider=provider, failed=dict(errors), hedged=False)
+            if errors:
+                logger.warning("LLM call served by %s after: %s", provider, errors)
+            return result
+        self._decide(pool, provider=None, failed=dict(errors), hedged=False)
+        _give_up(pool, errors, last)
+
+    async def astream(self, pool: List[str], stream: Callable[[str], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Stream from the first provider that produces a first piece within the
+        timeout. Once text has been yielded there is no failover.
+        """
+        errors: Dict[str, str] = {}
+        last: Optional[BaseException] = None
+        for provider in pool:
+            if not self._admit(provider):
+                errors[provider] = "circuit open"
+                continue
+            start = time.perf_counter()
+            it = stream(provider).__aiter__()
+            try:
+                first = await asyncio.wait_for(it.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                first = None
+            except asyncio.CancelledError:
+                self._release(provider)
+                raise
+            except Exception as e:
+                self._record(provider, time.perf_counter() - start, ok=False,
+                             timed_out=isinstance(e, asyncio.TimeoutError), error=e)
+                errors[provider], last = repr(e), e
+                await _aclose(it)
+                continue
+            self._decide(pool, provider=provider, failed=dict(errors), hedged=False, stream=True)
+            try:
+                if first is not None:
+                    yield first
+                    async for piece in it:
+                        yield piece
+            except (asyncio.CancelledError, GeneratorExit):
+                # cancelled, or the reader closed the stream early: no verdict, free the trial slot
+                self._release(provider)
+                raise
+            except Exception as e:
+                self._record(provider, time.perf_counter() - start, ok=False, error=e)
+                raise
+            finally:
+                await _aclose(it)
+            self._record(provider, time.perf_counter() - start, ok=True)
+            return
+        self._decide(pool, provider=None, failed=dict(errors), hedged=False, stream=True)
+        _give_up(pool, errors, last)
+
+    def stats(self, pool: Optional[List[str]] = None) -> Dict:
+        with self._lock:
+            providers = {name: st.as_dict() for name, st in self._providers.items()}
+            decisions = list(self.decisions)
+        for name in pool or []:
+            providers.setdefault(name, ProviderState(self.window).as_dict())
+        return {
+            "pool": pool,
+            "timeout_seconds": self.timeout,
+            "hedge": {"enabled": self.hedge, "quantile": self.hedge_quantile, "min_samples": self.hedge_min_samples},
+            "breaker": {"failures": self.breaker_failures, "cooldown_seconds": self.breaker_cooldown},
+            "providers": providers,
+            "recent_decisions": decisions[-20:],
+        }
+
+
+async def _aclose(it):
+    aclose = getattr(it, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+router = LLMRouter()
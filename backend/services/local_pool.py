@@ -0,0 +1,414 @@
+# backend/services/local_pool.py
+"""
+Local GGUF model inference in dedicated worker processes.
+
+ctransformers models are not thread-safe, generation holds a CPU thread for
+seconds, and a model that hangs (as on Python 3.12, see README_LOCAL_SETUP.md)
+must not take the API process with it. Each of LOCAL_WORKERS processes loads
+the model once at start and serves one request at a time; callers queue for an
+idle worker (at most LOCAL_QUEUE_MAX waiting, the rest are refused so the
+router can fail over). A request that has not finished within LOCAL_TIMEOUT
+seconds gets its worker killed and a fresh one started in its place.
+
+LOCAL_THREADS sets the inference threads per worker (default: the cores
+divided between the workers).
+
+Every draft prompt starts with the same system message (and example), so
+with the llama_cpp backend (llama-cpp-python) a worker evaluates that prefix
+once at start and afterwards only the per-request rest: llama.cpp keeps the
+evaluated tokens in its KV cache and reuses the longest common prefix, and
+saved states (LOCAL_PREFIX_CACHE_MB) cover prompts that alternate between
+prefixes. ctransformers re-evaluates the whole prompt on every call.
+"""
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+LOCAL_WORKERS = max(1, int(os.getenv("LOCAL_WORKERS", "1")))
+LOCAL_THREADS = int(os.getenv("LOCAL_THREADS", "0")) or max(1, (os.cpu_count() or 1) // LOCAL_WORKERS)
+# seconds one generation may run before its worker is killed and replaced
+LOCAL_TIMEOUT = float(os.getenv("LOCAL_TIMEOUT", "120"))
+# seconds a worker may take to load the model (first run downloads it)
+LOCAL_LOAD_TIMEOUT = float(os.getenv("LOCAL_LOAD_TIMEOUT", "600"))
+# requests waiting for an idle worker; beyond this they are refused
+LOCAL_QUEUE_MAX = int(os.getenv("LOCAL_QUEUE_MAX", "16"))
+# "llama_cpp" (reuses the evaluated prompt prefix), "ctransformers", or "auto": llama_cpp when installed
+LOCAL_BACKEND = os.getenv("LOCAL_BACKEND", "auto").lower()
+LOCAL_PREFIX_CACHE = os.getenv("LOCAL_PREFIX_CACHE", "1") != "0"
+# memory for saved prompt states per worker (llama_cpp); 0 = only the state of the previous request
+LOCAL_PREFIX_CACHE_MB = int(os.getenv("LOCAL_PREFIX_CACHE_MB", "256"))
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH")
+LOCAL_MODEL_TYPE = os.getenv("LOCAL_MODEL_TYPE", "llama")  # "llama", "mistral", etc.
+
+logger = logging.getLogger("local_pool")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+class LocalModelTimeout(RuntimeError):
+    pass
+
+
+class LocalPoolBusy(RuntimeError):
+    pass
+
+
+def _model_source(model_name: str) -> Tuple[Optional[str], str, str]:
+    """(Hugging Face repo or None for a local file, GGUF file, model type) for `model_name`."""
+    if LOCAL_MODEL_PATH:
+        return None, LOCAL_MODEL_PATH, LOCAL_MODEL_TYPE
+    if model_name == "mistral":
+        return "TheBloke/Mistral-7B-Instruct-v0.2-GGUF", "mistral-7b-instruct-v0.2.Q4_K_M.gguf", "mistral"
+    # Default to TinyLlama 1.1B Chat
+    return "TheBloke/TinyLlama-1.1B-Chat-v1.0-GGUF", "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf", "llama"
+
+
+def load_ctransformers(model_name: str = "tinyllama", threads: int = LOCAL_THREADS):
+    """Load the GGUF model with ctransformers (runs in the worker process)."""
+    try:
+        from ctransformers import AutoModelForCausalLM
+    except ImportError:
+        raise RuntimeError("Local model dependencies not installed. Please run: pip install ctransformers")
+
+    repo_id, model_file, model_type = _model_source(model_name)
+    if sys.version_info >= (3, 12):
+        logger.warning("WARNING: You are running Python 3.12+. 'ctransformers' may hang or fail. Consider using Ollama or Python 3.11.")
+    logger.info(f"Loading local model (type={model_type}) from {model_file} with {threads} threads...")
+    try:
+        return AutoModelForCausalLM.from_pretrained(
+            repo_id if repo_id else os.path.dirname(model_file),
+            model_file=model_file if repo_id else os.path.basename(model_file),
+            model_type=model_type,
+            context_length=2048,
+            gpu_layers=0,
+            threads=threads,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize local model: {str(e)}")
+
+
+class LlamaCppModel:
+    """A llama_cpp.Llama behind the ctransformers call signature the workers use."""
+
+    def __init__(self, llm, prefix_cache: bool = LOCAL_PREFIX_CACHE, cache_mb: int = LOCAL_PREFIX_CACHE_MB):
+        self.llm = llm
+        self.prefix_cache = prefix_cache
+        if prefix_cache and cache_mb:
+            from llama_cpp import LlamaRAMCache
+            llm.set_cache(LlamaRAMCache(capacity_bytes=cache_mb << 20))
+
+    def __call__(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.8,
+                 stop: Optional[List[str]] = None, stream: bool = False):
+        if not self.prefix_cache:
+            self.llm.reset()  # evaluate the whole prompt, as ctransformers does
+        out = self.llm(prompt, max_tokens=max_new_tokens, temperature=temperature, stop=stop or [], stream=stream)
+        if not stream:
+            return out["choices"][0]["text"]
+        return (chunk["choices"][0]["text"] for chunk in out)
+
+    def warm(self, prefix: str):
+        """Evaluate the shared prompt prefix now, so the first request only pays for its own part."""
+        if self.prefix_cache:
+            self.llm(prefix, max_tokens=1)
+
+
+def load_llama_cpp(model_name: str = "tinyllama", threads: int = LOCAL_THREADS, prefix_cache: bool = LOCAL_PREFIX_CACHE):
+    """Load the GGUF model with llama-cpp-python (runs in the worker process)."""
+    try:
+        from llama_cpp import Llama
+    except ImportError:
+        raise RuntimeError("llama_cpp backend not installed. Please run: pip install llama-cpp-python")
+
+    repo_id, model_file, _ = _model_source(model_name)
+    logger.info(f"Loading local model (llama_cpp) from {model_file} with {threads} threads...")
+    try:
+        kwargs = dict(n_ctx=2048, n_threads=threads, n_gpu_layers=0, verbose=False)
+        llm = Llama.from_pretrained(repo_id, model_file, **kwargs) if repo_id else Llama(model_path=model_file, **kwargs)
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize local model: {str(e)}")
+    return LlamaCppModel(llm, prefix_cache)
+
+
+def load_model(model_name: str = "tinyllama", threads: int = LOCAL_THREADS):
+    """Load with LOCAL_BACKEND; "auto" prefers llama_cpp for its prompt-prefix reuse."""
+    backend = LOCAL_BACKEND
+    if backend == "auto":
+        try:
+            import llama_cpp  # noqa: F401
+            backend = "llama_cpp"
+        except ImportError:
+            backend = "ctransformers"
+    if backend == "llama_cpp":
+        return load_llama_cpp(model_name, threads)
+    return load_ctransformers(model_name, threads)
+
+
+def _worker_main(conn, cancel, loader: Callable, model_name: str, threads: int, prefix: Optional[str] = None):
+    """
+    Worker process: load the model (and evaluate `prefix`, where the backend
+    can keep it), then serve requests from the pipe one at a time.
+    A request is (model, prompt, kwargs, stream); the replies are ("piece", text)*
+    then ("done", text or None), or ("error", message).
+    """
+    llm, loaded = None, None
+
+    def load(name):
+        nonlocal llm, loaded
+        if loaded != name:
+            llm, loaded = None, None
+            llm, loaded = loader(name, threads), name
+
+    try:
+        load(model_name)
+        if prefix and hasattr(llm, "warm"):
+            llm.warm(prefix)
+        conn.send(("ready", None))
+    except Exception as e:  # reported; the next request tries to load again
+        conn.send(("ready", str(e)))
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if request is None:
+            return
+        name, prompt, kwargs, stream = request
+        try:
+            load(name)
+            if not stream:
+                conn.send(("done", llm(prompt, **kwargs)))
+                continue
+            for piece in llm(prompt, stream=True, **kwargs):
+                if cancel.is_set():
+                    break
+                conn.send(("piece", piece))
+            conn.send(("done", None))
+        except Exception as e:
+            conn.send(("error", f"Local model generation failed: {str(e)}"))
+
+
+class _Worker:
+    def __init__(self, ctx, loader: Callable, model: str, threads: int, prefix: Optional[str] = None):
+        self.conn, child = ctx.Pipe()
+        self.cancel = ctx.Event()
+        self.process = ctx.Process(target=_worker_main, args=(child, self.cancel, loader, model, threads, prefix),
+                                   name="local-llm", daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def recv(self, timeout: float):
+        if not self.conn.poll(max(0.0, timeout)):
+            raise LocalModelTimeout(f"Local model did not answer within {timeout:.0f}s")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise RuntimeError(f"Local model worker exited (code {self.process.exitcode})")
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+def _summary(values: List[float]) -> Dict:
+    if not values:
+        return {"avg_ms": None, "p95_ms": None}
+    ordered = sorted(values)
+    return {"avg_ms": round(sum(values) / len(values) * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 1)}
+
+
+class LocalModelPool:
+    def __init__(self, workers: int = LOCAL_WORKERS, threads: int = LOCAL_THREADS, timeout: float = LOCAL_TIMEOUT,
+                 load_timeout: float = LOCAL_LOAD_TIMEOUT, max_queue: int = LOCAL_QUEUE_MAX,
+                 loader: Callable = load_model, window: int = 200):
+        self.workers = workers
+        self.threads = threads
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self.max_queue = max_queue
+        self.loader = loader  # top-level function: it is pickled into the workers
+        self.model: Optional[str] = None
+        self.prefix: Optional[str] = None
+        # forkserver: never fork a process that is running web threads (spawn where there is none)
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: List[_Worker] = []
+        self._waiting = 0
+        self.recent = deque(maxlen=window)  # (queue wait s, run s) of completed requests
+        self.counts = dict.fromkeys(
+            ("requests", "completed", "errors", "timeouts", "respawns", "rejected", "max_queued"), 0)
+
+    def start(self, model: str = "tinyllama", prefix: Optional[str] = None):
+        """
+        Start the workers (each loads `model` right away, and evaluates `prefix`,
+        the start shared by every prompt); a no-op once running.
+        """
+        with self._lock:
+            if self._all:
+                return
+            self.model, self.prefix = model, prefix
+            self._all = [_Worker(self._ctx, self.loader, model, self.threads, prefix) for _ in range(self.workers)]
+            for w in self._all:
+                self._idle.put(w)
+        logger.info("Started %d local model worker(s) for %s, %d threads each", self.workers, model, self.threads)
+
+    def stop(self):
+        with self._lock:
+            workers, self._all = self._all, []
+            self._idle = queue.Queue()
+        for w in workers:
+            try:
+                w.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            w.process.join(2)
+            if w.process.is_alive():
+                w.kill()
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self.counts["rejected"] += 1
+                raise LocalPoolBusy(f"Local model queue is full ({self.max_queue} waiting)")
+            self._waiting += 1
+            self.counts["requests"] += 1
+            self.counts["max_queued"] = max(self.counts["max_queued"], self._waiting)
+            idle = self._idle
+        try:
+            return idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.counts["rejected"] += 1
+            raise LocalPoolBusy(f"No local model worker became free within {self.timeout:.0f}s")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _checkin(self, w: _Worker, healthy: bool):
+        if not healthy:
+            w.kill()
+            with self._lock:
+                if w not in self._all:  # the pool was stopped meanwhile
+                    return
+                self.counts["respawns"] += 1
+                fresh = _Worker(self._ctx, self.loader, self.model, self.threads, self.prefix)
+                self._all[self._all.index(w)] = fresh
+            logger.warning("Killed local model worker %s and started a replacement", w.process.pid)
+            w = fresh
+        with self._lock:
+            if w in self._all:
+                self._idle.put(w)
+
+    def _send(self, w: _Worker, model: str, prompt: str, kwargs: Dict, stream: bool):
+        if not w.ready:
+            _, error = w.recv(self.load_timeout)
+            w.ready = True
+            if error:
+                logger.error("Local model worker failed to load the model: %s", error)
+        w.cancel.clear()
+        w.conn.send((model, prompt, kwargs, stream))
+
+    def _finish(self, waited: float, started: float, kind: str):
+        with self._lock:
+            if kind == "error":
+                self.counts["errors"] += 1
+            elif kind == "timeout":
+                self.counts["timeouts"] += 1
+            else:
+                self.counts["completed"] += 1
+                self.recent.append((waited, time.perf_counter() - started))
+
+    def generate(self, model: str, prompt: str, **kwargs) -> str:
+        """Run one generation on an idle worker and return its text."""
+        if not self._all:
+            self.start(model)
+        queued = time.perf_counter()
+        w = self._checkout()
+        started = time.perf_counter()
+        healthy = False
+        try:
+            self._send(w, model, prompt, kwargs, False)
+            kind, payload = w.recv(self.timeout)
+            healthy = True
+        except LocalModelTimeout:
+            self._finish(0, 0, "timeout")
+            raise
+        except Exception:
+            self._finish(0, 0, "error")
+            raise
+        finally:
+            self._checkin(w, healthy)
+        self._finish(started - queued, started, kind)
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def stream(self, model: str, prompt: str, **kwargs) -> Iterator[str]:
+        """Like generate(), yielding pieces as the worker produces them; closing it stops the generation."""
+        if not self._all:
+            self.start(model)
+        queued = time.perf_counter()
+        w = self._checkout()
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        healthy, kind, failure = False, None, "timeout"
+        try:
+            self._send(w, model, prompt, kwargs, True)
+            while True:
+                kind, payload = w.recv(deadline - time.perf_counter())
+                if kind != "piece":
+                    break
+                yield payload
+            healthy = True
+        except Exception as e:
+            failure = "timeout" if isinstance(e, LocalModelTimeout) else "error"
+            raise
+        finally:
+            if kind is None or kind == "piece":
+                # abandoned mid-generation (or timed out): stop it and wait for the worker to be free again
+                w.cancel.set()
+                try:
+                    while kind == "piece":
+                        kind, _ = w.recv(deadline - time.perf_counter())
+                    healthy = kind is not None
+                except Exception:
+                    healthy = False
+            self._checkin(w, healthy)
+            self._finish(started - queued, started, kind if healthy else failure)
+        if kind == "error":
+            raise RuntimeError(payload)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = [q for q, _ in self.recent]
+            runs = [r for _, r in self.recent]
+            return {
+                "workers": len(self._all),
+                "alive": sum(1 for w in self._all if w.process.is_alive()),
+                "busy": len(self._all) - self._idle.qsize(),
+                "queued": self._waiting,
+                "backend": LOCAL_BACKEND,
+                "prefix_cache": LOCAL_PREFIX_CACHE,
+                "threads_per_worker": self.threads,
+                "timeout_seconds": self.timeout,
+                "max_queue": self.max_queue,
+                **self.counts,
+                "queue_wait": _summary(waits),
+                "generation": _summary(runs),
+            }
+
+
+pool = LocalModelPool()
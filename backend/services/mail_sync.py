@@ -0,0 +1,250 @@
+import os
+import logging
+from itertools import chain
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+from googleapiclient.errors import HttpError
+from sqlalchemy.orm import Session
+from backend.models.db import BackfillState, Email, SyncState, insert_ignore_emails, is_sent_by
+from backend.services import nlp
+from backend.services.gmail import HistoryExpired, get_history_id, iter_message_pages, list_history
+from backend.services.ingest_pipeline import Batch, existing_ids, run_pipeline
+
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "500"))
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "100"))
+# message ids per pipeline batch for incremental/full syncs
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "50"))
+
+logger = logging.getLogger("mail_sync")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+def _parse_date(value: Optional[str]) -> datetime:
+    """RFC 2822 Date header -> naive UTC datetime (what the `received_at` column stores)."""
+    try:
+        dt = parsedate_to_datetime(value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+    except Exception:
+        return datetime.utcnow()
+
+def store_messages(session: Session, user_email: str, msgs: List[Dict]) -> int:
+    """
+    Insert decoded messages that are not stored yet; returns the number inserted.
+
+    Existing ids are found with one IN query per chunk instead of a lookup per
+    message, and new rows go through a single INSERT ... ON CONFLICT DO
+    NOTHING so a concurrent sync of the same account cannot duplicate them.
+    Messages that arrive with `is_spam`/`lang` already set (the ingest
+    pipeline scores them upstream) are not classified again.
+    """
+    # last occurrence wins if a chunk repeats an id
+    by_id = {m["gmail_id"]: m for m in msgs if m.get("gmail_id")}
+    if not by_id:
+        return 0
+    existing = existing_ids(session, user_email, list(by_id))
+    new = [m for gid, m in by_id.items() if gid not in existing]
+
+    unscored = [m for m in new if "is_spam" not in m]
+    if unscored:
+        # classify the whole chunk in one vectorized call
+        try:
+            labels, _scores = nlp.predict_spam_batch([f"{m.get('subject','')} {m.get('body_text','')}" for m in unscored])
+        except Exception:
+            labels = [False] * len(unscored)  # fallback
+        for m, is_spam in zip(unscored, labels):
+            m["is_spam"] = bool(is_spam)
+
+    rows = []
+    for m in new:
+        rows.append(dict(
+            user_email=user_email,
+            gmail_id=m.get("gmail_id",""),
+            from_addr=m.get("from_addr",""),
+            to_addr=m.get("to_addr",""),
+            subject=m.get("subject",""),
+            snippet=m.get("snippet",""),
+            body_text=m.get("body_text",""),
+            received_at=_parse_date(m.get("received_at")),
+            is_spam=m["is_spam"],
+            is_sent=is_sent_by(user_email, m.get("from_addr","")),
+            lang=m.get("lang") or "en",
+        ))
+    return insert_ignore_emails(session, rows)
+
+def _ingest_ids(svc, session: Session, user_email: str, ids: List[str]) -> Dict:
+    """Run `ids` through the ingest pipeline, committing after every batch."""
+    totals = {"fetched": 0, "skipped": 0, "inserted": 0, "failed": 0, "malformed": 0}
+
+    def on_batch(batch: Batch):
+        totals["fetched"] += len(batch.items)
+        totals["skipped"] += batch.skipped
+        totals["inserted"] += batch.inserted
+        totals["failed"] += batch.failed
+        totals["malformed"] += batch.malformed
+        session.commit()
+
+    feed = ((None, ids[i:i + SYNC_CHUNK_SIZE]) for i in range(0, len(ids), SYNC_CHUNK_SIZE))
+    stats = run_pipeline(svc, session, user_email, feed, store_messages, on_batch)
+    totals["pipeline"] = stats.as_dict()
+    return totals
+
+def sync_mailbox(svc, session: Session, user_email: str, max_results: int = 50, full: bool = False) -> Dict:
+    """
+    Bring the local copy of `user_email`'s mailbox up to date.
+
+    With a stored checkpoint this is an incremental sync: one history.list
+    call, plus a batched fetch of only the messages added since then, and
+    local deletion of messages removed in Gmail. Without a checkpoint, when
+    `full` is requested, or when Gmail reports the checkpoint as expired, the
+    newest `max_results` messages are re-listed instead. Either way the
+    messages stream through the ingest pipeline (see ingest_pipeline.py).
+    """
+    state = session.get(SyncState, user_email)
+    if state is None:
+        state = SyncState(user_email=user_email)
+        session.add(state)
+
+    if state.history_id and not full:
+        try:
+            added, deleted, latest = list_history(svc, state.history_id)
+        except HistoryExpired:
+            logger.info("historyId %s expired for %s; running full resync", state.history_id, user_email)
+        else:
+            res = _ingest_ids(svc, session, user_email, added)
+            removed = 0
+            if deleted:
+                removed = (
+                    session.query(Email)
+                    .filter(Email.user_email == user_email, Email.gmail_id.in_(deleted))
+                    .delete(synchronize_session=False)
+                )
+            # keep the old checkpoint if some additions could not be fetched,
+            # so the next sync sees them again
+            if not res["failed"]:
+                state.history_id = latest
+            state.last_sync_at = datetime.utcnow()
+            session.commit()
+            return {"ok": True, "mode": "incremental", "deleted": removed, **res}
+
+    # Snapshot the checkpoint before listing so nothing that arrives while
+    # we fetch falls between this sync and the next incremental one.
+    history_id = get_history_id(svc)
+    listed = svc.users().messages().list(userId="me", maxResults=max_results).execute().get("messages", [])
+    res = _ingest_ids(svc, session, user_email, [m["id"] for m in listed])
+    state.history_id = history_id
+    state.last_sync_at = datetime.utcnow()
+    session.commit()
+    return {"ok": True, "mode": "full", "deleted": 0, **res}
+
+def get_backfill_state(session: Session, user_email: str) -> BackfillState:
+    state = session.get(BackfillState, user_email)
+    if state is None:
+        state = BackfillState(user_email=user_email, status="idle", pages=0, fetched=0, skipped=0, inserted=0, failed=0)
+        session.add(state)
+        session.flush()
+    return state
+
+def run_backfill(
+    svc,
+    session: Session,
+    user_email: str,
+    restart: bool = False,
+    page_size: int = None,
+    chunk_size: int = None,
+    on_page: Optional[Callable[[BackfillState], None]] = None,
+) -> BackfillState:
+    """
+    Ingest every message in the mailbox, oldest pages included.
+
+    Pages are walked with `nextPageToken` and streamed through the ingest
+    pipeline `chunk_size` messages at a time, so memory stays bounded by a
+    few pages of ids plus the pipeline's queued chunks. Counters are
+    committed after every chunk and the cursor once a page is fully stored;
+    a restarted backfill resumes from the last committed page (re-listing at
+    most a page or two, whose already stored ids are skipped). `on_page` is
+    called with the state after each committed page.
+    """
+    page_size = page_size or BACKFILL_PAGE_SIZE
+    chunk_size = chunk_size or BACKFILL_CHUNK_SIZE
+    state = get_backfill_state(session, user_email)
+    if restart or state.status == "done":
+        state.page_token = None
+        state.pages = state.fetched = state.skipped = state.inserted = state.failed = 0
+        state.total_estimate = None
+    if not state.pages:
+        state.started_at = datetime.utcnow()
+    state.status = "running"
+    state.error = None
+    state.updated_at = datetime.utcnow()
+    session.commit()
+
+    try:
+        try:
+            pages = iter_message_pages(svc, page_token=state.page_token, page_size=page_size)
+            first = next(pages)
+        except HttpError as e:
+            if not state.page_token or e.resp.status != 400:
+                raise
+            # stale page token: start over, already stored messages are skipped
+            logger.warning("Backfill page token rejected for %s; restarting from the newest page", user_email)
+            state.page_token = None
+            pages = iter_message_pages(svc, page_size=page_size)
+            first = next(pages)
+
+        def feed():
+            # tag the last chunk of each page with the page's cursor so it is
+            # only committed once every message on the page is stored
+            for ids, next_token, estimate in chain([first], pages):
+                chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)] or [[]]
+                for n, chunk in enumerate(chunks):
+                    yield ((next_token, estimate) if n == len(chunks) - 1 else None), chunk
+
+        def on_batch(batch: Batch):
+            state.fetched += len(batch.items)
+            state.skipped = (state.skipped or 0) + batch.skipped
+            state.inserted += batch.inserted
+            state.failed += batch.failed + batch.malformed  # both are left out of the mailbox copy
+            if batch.tag is not None:
+                next_token, estimate = batch.tag
+                if state.total_estimate is None and estimate:
+                    state.total_estimate = estimate
+                state.pages += 1
+                state.page_token = next_token
+                state.updated_at = datetime.utcnow()
+            session.commit()
+            if batch.tag is not None and on_page:
+                on_page(state)
+
+        run_pipeline(svc, session, user_email, feed(), store_messages, on_batch)
+        state.status = "done"
+    except Exception as e:
+        logger.exception("Backfill failed for %s", user_email)
+        session.rollback()
+        state = get_backfill_state(session, user_email)
+        state.status = "failed"
+        state.error = str(e)
+    state.updated_at = datetime.utcnow()
+    session.commit()
+    return state
+
+def backfill_progress(state: BackfillState) -> Dict:
+    return {
+        "user_email": state.user_email,
+        "status": state.status,
+        "pages": state.pages or 0,
+        "fetched": state.fetched or 0,
+        "skipped": state.skipped or 0,
+        "inserted": state.inserted or 0,
+        "failed": state.failed or 0,
+        "total_estimate": state.total_estimate,
+        "resumable": bool(state.page_token) and state.status != "done",
+        "error": state.error,
+        "started_at": state.started_at,
+        "updated_at": state.updated_at,
+    }
@@ -22,6 +22,32 @@ def predict_spam(text: str) -> bool:
         return bool(model.predict([text])[0])
     return simple_is_spam(text)  # fallback
 
+def predict_spam_batch(texts: List[str]) -> Tuple[List[bool], List[float]]:
+    """
+    Classify many texts with one vectorizer/model call.
+
+    Returns (labels, scores). With the trained model the score is the SVM
+    decision value (> 0 means spam); with the rule fallback it is the number
+    of spam phrases found.
+    """
+    texts = list(texts)
+    if not texts:
+        return [], []
+    model = load_spam_model()
+    if model is None:
+        return simple_is_spam_batch(texts)  # fallback
+    if hasattr(model, "decision_function"):
+        scores = model.decision_function(texts)
+        # binary decision_function: positive side is classes_[1] (spam=1)
+        labels = model.classes_[(scores > 0).astype(int)]
+    elif hasattr(model, "predict_proba"):
+        scores = model.predict_proba(texts)[:, 1]
+        labels = model.classes_[(scores > 0.5).astype(int)]
+    else:
+        labels = model.predict(texts)
+        scores = labels
+    return [bool(l) for l in labels], [float(sc) for sc in scores]
+
 # --- TextRank summary ---
 def textrank_summary(text: str, k: int = 3) -> str:
     sents = _split_sentences(text)
@@ -64,6 +90,13 @@ def simple_is_spam(text: str) -> bool:
     t = text.lower()
     return any(w in t for w in SPAM_WORDS)
 
+def simple_is_spam_batch(texts: List[str]) -> Tuple[List[bool], List[float]]:
+    """Rule fallback for predict_spam_batch: (labels, number of spam phrases matched)."""
+    # str.count runs in C; cheaper than a regex alternation over long bodies
+    words = tuple(SPAM_WORDS)
+    scores = [float(sum(t.count(w) for w in words)) for t in (x.lower() for x in texts)]
+    return [sc > 0 for sc in scores], scores
+
 def simple_intent(text: str) -> str:
     t = text.lower()
     for intent, kws in INTENT_KEYWORDS.items():
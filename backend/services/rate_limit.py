@@ -0,0 +1,204 @@
+# backend/services/rate_limit.py
+"""
+Proactive rate limiting for LLM provider quotas.
+
+Each scope ("gemini", or "gemini:gemini-2.5-pro" for one model) gets two
+token buckets: requests per minute and tokens per minute. A call takes one
+request and its estimated tokens before it is sent, and waits for capacity
+when the budget is spent, instead of finding out from a 429.
+
+Bucket state lives in a small SQLite file (LLM_RATE_LIMIT_DB) updated in
+BEGIN IMMEDIATE transactions, so every thread and every worker process on
+the host draws from the same budget. When a 429 does happen its Retry-After
+is written there too, and all callers hold off until it has passed.
+
+Configure with LLM_RATE_LIMITS, e.g. "gemini=10/250000,openai=500/200000,
+gemini:gemini-2.5-pro=5" (requests/min, optional tokens/min). Scopes without
+a limit are not throttled and the database is never opened.
+"""
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from backend.services import token_budget
+
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+LLM_RATE_LIMIT_DB = os.getenv("LLM_RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "emailapp-llm-ratelimit.db"))
+# a call that would have to wait longer than this fails instead (and the router can fail over)
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "60"))
+
+logger = logging.getLogger("rate_limit")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+class RateLimitExceeded(RuntimeError):
+    pass
+
+
+class Limit:
+    """`requests` and `tokens` per `period` seconds; 0 means no limit on that dimension."""
+
+    def __init__(self, requests: float = 0, tokens: float = 0, period: float = 60.0):
+        self.requests = requests
+        self.tokens = tokens
+        self.period = period
+
+    def __repr__(self):
+        return f"Limit(requests={self.requests}, tokens={self.tokens}, period={self.period})"
+
+
+def parse_limits(spec: str) -> Dict[str, Limit]:
+    """"gemini=10/250000,openai=500" -> {"gemini": Limit(10, 250000), "openai": Limit(500)}"""
+    limits = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        scope, budget = item.split("=", 1)
+        rpm, _, tpm = budget.strip().partition("/")
+        limits[scope.strip().lower()] = Limit(float(rpm or 0), float(tpm or 0))
+    return limits
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Prompt tokens (counted locally) plus the full output allowance."""
+    return token_budget.count_message_tokens(messages) + max_tokens
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Limit], path: str = LLM_RATE_LIMIT_DB,
+                 max_wait: float = LLM_RATE_LIMIT_MAX_WAIT, clock=time.time):
+        self.limits = {k.lower(): v for k, v in limits.items()}
+        self.path = path
+        self.max_wait = max_wait
+        self.clock = clock  # wall clock: the buckets are shared between processes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.counts = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "penalties": 0, "rejected": 0}
+
+    def limit_for(self, provider: str, model: Optional[str]) -> Tuple[Optional[str], Optional[Limit]]:
+        for scope in (f"{provider}:{model}".lower(), provider.lower()):
+            if scope in self.limits:
+                return scope, self.limits[scope]
+        return None, None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (scope TEXT PRIMARY KEY, requests REAL NOT NULL, "
+                         "tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _take(self, scope: str, limit: Limit, tokens: int) -> float:
+        """Take one request and `tokens` if available; otherwise the seconds until they will be."""
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                row = db.execute("SELECT requests, tokens, updated, blocked_until FROM buckets WHERE scope = ?",
+                                 (scope,)).fetchone()
+                req, tok, updated, blocked = row or (limit.requests, limit.tokens, now, 0.0)
+                elapsed = max(0.0, now - updated)
+                req = min(limit.requests, req + elapsed * limit.requests / limit.period)
+                tok = min(limit.tokens, tok + elapsed * limit.tokens / limit.period)
+                need = min(tokens, limit.tokens)  # a call bigger than the whole budget waits for a full bucket
+                if now < blocked:
+                    wait = blocked - now
+                else:
+                    wait = 0.0
+                    if limit.requests and req < 1:
+                        wait = (1 - req) * limit.period / limit.requests
+                    if limit.tokens and tok < need:
+                        wait = max(wait, (need - tok) * limit.period / limit.tokens)
+                    if not wait:
+                        req -= 1 if limit.requests else 0
+                        tok -= need if limit.tokens else 0
+                db.execute("INSERT OR REPLACE INTO buckets (scope, requests, tokens, updated, blocked_until) "
+                           "VALUES (?, ?, ?, ?, ?)", (scope, req, tok, now, blocked))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return wait
+
+    def _waited(self, scope: str, waited: float, wait: float):
+        if wait > 0 and waited + wait > self.max_wait:
+            self.counts["rejected"] += 1
+            raise RateLimitExceeded(f"{scope} rate limit: no capacity within {self.max_wait}s")
+        if wait == 0:
+            self.counts["acquired"] += 1
+            if waited:
+                self.counts["waited"] += 1
+                self.counts["wait_seconds"] += waited
+
+    def acquire(self, provider: str, model: Optional[str] = None, tokens: int = 0) -> float:
+        """Block until the scope has capacity for one call of `tokens`; returns seconds waited."""
+        scope, limit = self.limit_for(provider, model)
+        if limit is None:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = self._take(scope, limit, tokens)
+            self._waited(scope, waited, wait)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def aacquire(self, provider: str, model: Optional[str] = None, tokens: int = 0) -> float:
+        """acquire() for coroutines: the SQLite step runs in a thread, waiting yields to the loop."""
+        scope, limit = self.limit_for(provider, model)
+        if limit is None:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._take, scope, limit, tokens)
+            self._waited(scope, waited, wait)
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def penalize(self, provider: str, model: Optional[str], seconds: float):
+        """The provider said 429 / Retry-After: hold every caller of this scope off for `seconds`."""
+        scope, limit = self.limit_for(provider, model)
+        if limit is None or seconds <= 0:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                db.execute(
+                    "INSERT INTO buckets (scope, requests, tokens, updated, blocked_until) VALUES (?, 0, 0, ?, ?) "
+                    "ON CONFLICT(scope) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                    (scope, now, now + seconds))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self.counts["penalties"] += 1
+        logger.warning("%s rate limited by the provider; holding calls for %.1fs", scope, seconds)
+
+    async def apenalize(self, provider: str, model: Optional[str], seconds: float):
+        """penalize() for coroutines: the SQLite write runs in a thread, off the event loop."""
+        await asyncio.to_thread(self.penalize, provider, model, seconds)
+
+    def stats(self) -> Dict:
+        return {"limits": {scope: {"requests_per_min": l.requests * 60 / l.period, "tokens_per_min": l.tokens * 60 / l.period}
+                           for scope, l in self.limits.items()},
+                **self.counts, "wait_seconds": round(self.counts["wait_seconds"], 3)}
+
+
+limiter = RateLimiter(parse_limits(LLM_RATE_LIMITS))
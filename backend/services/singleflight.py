@@ -0,0 +1,109 @@
+# backend/services/singleflight.py
+"""
+In-flight call coalescing ("singleflight").
+
+Concurrent calls with the same key share one execution: the first caller
+(the leader) runs the function, later callers wait for it and receive the
+same result or the same exception. Nothing is kept once the call finishes,
+so this complements a cache rather than replacing it: it covers the window
+between the first miss and the reply being stored.
+
+Waiters give up after `timeout` seconds with TimeoutError; the shared call
+itself carries on for whoever is still waiting.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+def _timeout_error(timeout: float) -> TimeoutError:
+    return TimeoutError(f"Timed out after {timeout}s waiting for an identical in-flight request")
+
+
+class SingleFlight:
+    """Coalescing for blocking callers on threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.counts = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counts, "in_flight": len(self._calls)}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counts["leaders"] += 1
+            else:
+                self.counts["coalesced"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            with self._lock:
+                self.counts["timeouts"] += 1
+            raise _timeout_error(timeout)
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Coalescing for coroutines. The shared call runs as its own task, so a
+    caller being cancelled (client disconnect) does not cancel it for the
+    others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.counts = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counts, "in_flight": len(self._tasks)}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)  # tasks belong to one loop
+        task = self._tasks.get(slot)
+        if task is None:
+            task = loop.create_task(fn())
+            self._tasks[slot] = task
+            task.add_done_callback(lambda t: self._finished(slot, t))
+            self.counts["leaders"] += 1
+        else:
+            self.counts["coalesced"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # the call itself timed out
+            self.counts["timeouts"] += 1
+            raise _timeout_error(timeout)
+
+    def _finished(self, slot, task: asyncio.Task):
+        if self._tasks.get(slot) is task:
+            del self._tasks[slot]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter already gave up
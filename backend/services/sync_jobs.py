@@ -0,0 +1,298 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+from backend.models.db import SessionLocal, SyncJob
+from backend.services.gmail import user_service
+from backend.services.mail_sync import run_backfill, sync_mailbox
+
+# worker threads executing sync/backfill jobs; 0 = only enqueue (another process runs them)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "2"))
+# seconds an idle worker sleeps before re-checking the queue (new jobs wake it immediately)
+SYNC_JOB_POLL = float(os.getenv("SYNC_JOB_POLL", "5"))
+# finished jobs older than this are deleted when the workers start
+SYNC_JOB_RETENTION_DAYS = int(os.getenv("SYNC_JOB_RETENTION_DAYS", "7"))
+# seconds a running job may go without a heartbeat from its worker before it is requeued;
+# workers renew their jobs every quarter of this
+SYNC_JOB_LEASE = float(os.getenv("SYNC_JOB_LEASE", "120"))
+
+JOB_KINDS = ("sync", "backfill")
+ACTIVE_STATUSES = ("queued", "running")
+
+logger = logging.getLogger("sync_jobs")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+def active_job(session: Session, user_email: str, kind: str) -> Optional[SyncJob]:
+    """The user's oldest queued or running job of `kind`, if any."""
+    return session.scalars(
+        select(SyncJob)
+        .where(SyncJob.user_email == user_email, SyncJob.kind == kind, SyncJob.status.in_(ACTIVE_STATUSES))
+        .order_by(SyncJob.id)
+        .limit(1)
+    ).first()
+
+def enqueue_job(session: Session, user_email: str, kind: str = "sync", **params) -> SyncJob:
+    """
+    Queue a job and wake a worker. A request identical to one that is still
+    queued for the same user is coalesced into it rather than queued twice.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    encoded = json.dumps(params, sort_keys=True)
+    job = session.scalars(
+        select(SyncJob)
+        .where(SyncJob.user_email == user_email, SyncJob.kind == kind,
+               SyncJob.status == "queued", SyncJob.params == encoded)
+        .limit(1)
+    ).first()
+    if job is None:
+        job = SyncJob(user_email=user_email, kind=kind, params=encoded, status="queued",
+                      fetched=0, skipped=0, inserted=0, deleted=0, failed=0, attempts=0, created_at=datetime.utcnow())
+        session.add(job)
+        session.commit()
+        pool.notify()
+    return job
+
+def job_progress(job: SyncJob) -> Dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "user_email": job.user_email,
+        "status": job.status,
+        "fetched": job.fetched or 0,
+        "skipped": job.skipped or 0,
+        "inserted": job.inserted or 0,
+        "deleted": job.deleted or 0,
+        "failed": job.failed or 0,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+def recover_jobs(session: Session, lease: float = SYNC_JOB_LEASE) -> int:
+    """
+    Requeue jobs left `running` by a process that died mid-job: those whose
+    worker has not renewed them for `lease` seconds. Jobs of live workers,
+    in this process or another (uvicorn --workers N), keep running. Both
+    kinds are safe to re-run: syncs dedup on insert and backfills resume
+    from their committed page cursor.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=lease)
+    last_seen = func.coalesce(SyncJob.heartbeat_at, SyncJob.started_at)
+    n = session.execute(
+        update(SyncJob)
+        .where(SyncJob.status == "running", or_(last_seen.is_(None), last_seen < cutoff))
+        .values(status="queued", started_at=None, heartbeat_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    if n:
+        logger.info("Requeued %d interrupted sync job(s)", n)
+    return n
+
+def prune_jobs(session: Session) -> int:
+    """Delete finished jobs older than SYNC_JOB_RETENTION_DAYS."""
+    if SYNC_JOB_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_JOB_RETENTION_DAYS)
+    n = session.execute(delete(SyncJob).where(SyncJob.status.in_(("done", "failed")), SyncJob.finished_at < cutoff)).rowcount
+    session.commit()
+    return n
+
+class SyncWorkerPool:
+    """
+    Fixed set of threads draining the sync_jobs table in id order.
+
+    A job is only claimed when no other job for the same user is running
+    (checked in the claiming UPDATE itself), so one account never has two
+    syncs or a sync and a backfill writing at once, while different accounts
+    proceed in parallel.
+
+    While a job runs, a heartbeat thread renews its lease; the same thread
+    requeues jobs whose lease has run out, i.e. whose process died.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        service_factory: Callable[[str], object] = user_service,
+        workers: int = SYNC_WORKERS,
+        poll: float = SYNC_JOB_POLL,
+        lease: float = SYNC_JOB_LEASE,
+    ):
+        self.session_factory = session_factory
+        self.service_factory = service_factory
+        self.workers = workers
+        self.poll = poll
+        self.lease = lease
+        self._wake = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._running_lock = threading.Lock()
+        self._running = set()  # ids of the jobs this process is running
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        session = self.session_factory()
+        try:
+            recover_jobs(session, self.lease)
+            prune_jobs(session)
+        finally:
+            session.close()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"sync-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat_loop, name="sync-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self.notify(all_workers=True)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def notify(self, all_workers: bool = False):
+        with self._wake:
+            if all_workers:
+                self._wake.notify_all()
+            else:
+                self._wake.notify()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self.claim_next()
+            except Exception:
+                logger.exception("Claiming a sync job failed")
+                job_id = None
+            if job_id is None:
+                with self._wake:
+                    self._wake.wait(self.poll)
+                continue
+            self.run_job(job_id)
+            # the finished job may have been blocking another job for the same user
+            self.notify()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease / 4):
+            try:
+                self.heartbeat()
+            except Exception:
+                logger.exception("Sync job heartbeat failed")
+
+    def heartbeat(self):
+        """Renew the lease of this process's running jobs and requeue jobs whose lease ran out."""
+        with self._running_lock:
+            job_ids = list(self._running)
+        session = self.session_factory()
+        try:
+            if job_ids:
+                session.execute(
+                    update(SyncJob)
+                    .where(SyncJob.id.in_(job_ids), SyncJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                session.commit()
+            if recover_jobs(session, self.lease):
+                self.notify(all_workers=True)
+        finally:
+            session.close()
+
+    def claim_next(self) -> Optional[int]:
+        """Mark the oldest runnable queued job as running and return its id."""
+        other = aliased(SyncJob)
+        user_busy = exists().where(other.user_email == SyncJob.user_email, other.status == "running")
+        session = self.session_factory()
+        try:
+            with self._claim_lock:
+                candidates = session.execute(
+                    select(SyncJob.id)
+                    .where(SyncJob.status == "queued", ~user_busy)
+                    .order_by(SyncJob.id)
+                    .limit(20)
+                ).scalars().all()
+                for job_id in candidates:
+                    now = datetime.utcnow()
+                    claimed = session.execute(
+                        update(SyncJob)
+                        .where(SyncJob.id == job_id, SyncJob.status == "queued", ~user_busy)
+                        .values(status="running", started_at=now, heartbeat_at=now, attempts=SyncJob.attempts + 1)
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+                    session.commit()
+                    if claimed:
+                        return job_id
+            return None
+        finally:
+            session.close()
+
+    def run_job(self, job_id: int):
+        with self._running_lock:
+            self._running.add(job_id)
+        session = self.session_factory()
+        try:
+            job = session.get(SyncJob, job_id)
+            if job is None:
+                # deleted between claim and run (e.g. the table was cleared)
+                logger.warning("Sync job %s no longer exists; skipping", job_id)
+                return
+            user_email = job.user_email
+            params = json.loads(job.params or "{}")
+            try:
+                svc = self.service_factory(user_email)
+                if job.kind == "backfill":
+                    self._run_backfill(svc, session, job, params)
+                else:
+                    res = sync_mailbox(svc, session, user_email, **params)
+                    job.fetched = res.get("fetched", 0)
+                    job.skipped = res.get("skipped", 0)
+                    job.inserted = res.get("inserted", 0)
+                    job.deleted = res.get("deleted", 0)
+                    job.failed = res.get("failed", 0)
+                    job.result = json.dumps(res, default=str)
+                    job.status = "done"
+            except Exception as e:
+                logger.exception("Sync job %s (%s) failed for %s", job_id, job.kind, user_email)
+                session.rollback()
+                job = session.get(SyncJob, job_id)
+                if job is None:
+                    logger.warning("Sync job %s no longer exists; not recording its failure", job_id)
+                    return
+                job.status = "failed"
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            session.commit()
+        finally:
+            session.close()
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def _run_backfill(self, svc, session: Session, job: SyncJob, params: Dict):
+        def on_page(state):
+            job.fetched, job.skipped, job.inserted, job.failed = state.fetched, state.skipped, state.inserted, state.failed
+            session.commit()
+
+        state = run_backfill(svc, session, job.user_email, on_page=on_page, **params)
+        job.fetched, job.skipped, job.inserted, job.failed = state.fetched, state.skipped, state.inserted, state.failed
+        job.result = json.dumps({"pages": state.pages, "total_estimate": state.total_estimate})
+        job.status = "done" if state.status == "done" else "failed"
+        job.error = state.error
+
+pool = SyncWorkerPool()
@@ -0,0 +1,217 @@
+import os
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from backend.models.db import SessionLocal, SyncJob
+from backend.services.gmail import known_accounts
+from backend.services.sync_jobs import SYNC_WORKERS, active_job, enqueue_job
+
+SYNC_SCHEDULER_ENABLED = os.getenv("SYNC_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+# per-account interval bounds (seconds); busy mailboxes drift to MIN, idle ones to MAX
+SYNC_INTERVAL_MIN = float(os.getenv("SYNC_INTERVAL_MIN", "60"))
+SYNC_INTERVAL_MAX = float(os.getenv("SYNC_INTERVAL_MAX", "1800"))
+SYNC_INTERVAL_START = float(os.getenv("SYNC_INTERVAL_START", "300"))
+# +/- fraction applied to every interval so accounts do not line up against the Gmail quota
+SYNC_JITTER = float(os.getenv("SYNC_JITTER", "0.2"))
+# scheduled jobs queued or running at once; leaves workers free for manual syncs when below SYNC_WORKERS
+SYNC_SCHEDULER_MAX_IN_FLIGHT = int(os.getenv("SYNC_SCHEDULER_MAX_IN_FLIGHT", str(max(1, SYNC_WORKERS))))
+SYNC_SCHEDULER_TICK = float(os.getenv("SYNC_SCHEDULER_TICK", "5"))
+SYNC_SCHEDULER_RESCAN = float(os.getenv("SYNC_SCHEDULER_RESCAN", "60"))  # seconds between token dir scans
+# messages listed when a scheduled sync has no checkpoint (first sync / expired history)
+SYNC_SCHEDULER_MAX_RESULTS = int(os.getenv("SYNC_SCHEDULER_MAX_RESULTS", "50"))
+
+logger = logging.getLogger("sync_scheduler")
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+class AccountSchedule:
+    """Scheduling state for one account (in memory; rebuilt from the token dir at startup)."""
+
+    def __init__(self, user_email: str, interval: float, next_due: float):
+        self.user_email = user_email
+        self.interval = interval
+        self.next_due = next_due  # time.monotonic() deadline
+        self.job_id: Optional[int] = None
+        self.enqueued_at: Optional[float] = None
+        self.runs = 0
+        self.failures = 0
+        self.last_status: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_changes = 0
+        self.last_latency: Optional[float] = None  # enqueue -> finished, seconds
+        self.last_run_time: Optional[float] = None  # started -> finished, seconds
+        self.last_sync_at: Optional[datetime] = None
+
+class SyncScheduler:
+    """
+    Periodically queues incremental syncs for every signed-in account.
+
+    Each account has its own interval: halved after a sync that found
+    changes, stretched by half after an idle one and doubled after a
+    failure, clamped to [SYNC_INTERVAL_MIN, SYNC_INTERVAL_MAX] and jittered.
+    Work goes through the sync job queue, so the worker pool bounds
+    concurrency and per-user serialization still applies. Fairness: an
+    account never has more than one scheduled job outstanding, at most
+    SYNC_SCHEDULER_MAX_IN_FLIGHT scheduled jobs exist at once, and due
+    accounts are queued most-overdue first, so a slow mailbox delays only
+    its own next turn.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        accounts: Callable[[], List[str]] = known_accounts,
+        max_in_flight: int = SYNC_SCHEDULER_MAX_IN_FLIGHT,
+        interval_min: float = SYNC_INTERVAL_MIN,
+        interval_max: float = SYNC_INTERVAL_MAX,
+        interval_start: float = SYNC_INTERVAL_START,
+        jitter: float = SYNC_JITTER,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.accounts = accounts
+        self.max_in_flight = max_in_flight
+        self.interval_min = interval_min
+        self.interval_max = interval_max
+        self.interval_start = min(max(interval_start, interval_min), interval_max)
+        self.jitter = jitter
+        self.clock = clock
+        self.schedules: Dict[str, AccountSchedule] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_scan: Optional[float] = None
+        self.ticks = 0
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Sync scheduler tick failed")
+            self._stop.wait(SYNC_SCHEDULER_TICK)
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _rescan(self, now: float):
+        found = set(self.accounts())
+        for user in found - set(self.schedules):
+            # spread first syncs over one start interval instead of all at once
+            self.schedules[user] = AccountSchedule(user, self.interval_start, now + random.uniform(0, self.interval_start))
+        for user in set(self.schedules) - found:
+            if self.schedules[user].job_id is None:
+                del self.schedules[user]
+        self._last_scan = now
+
+    def _finish(self, sched: AccountSchedule, job: SyncJob, now: float):
+        sched.job_id = None
+        sched.runs += 1
+        sched.last_status = job.status
+        sched.last_error = job.error
+        sched.last_sync_at = job.finished_at
+        if sched.enqueued_at is not None:
+            sched.last_latency = round(now - sched.enqueued_at, 3)
+        if job.started_at and job.finished_at:
+            sched.last_run_time = round((job.finished_at - job.started_at).total_seconds(), 3)
+        if job.status == "failed":
+            sched.failures += 1
+            sched.interval = min(self.interval_max, sched.interval * 2)
+        else:
+            sched.last_changes = (job.inserted or 0) + (job.deleted or 0)
+            if sched.last_changes:
+                sched.interval = max(self.interval_min, sched.interval / 2)
+            else:
+                sched.interval = min(self.interval_max, sched.interval * 1.5)
+        sched.next_due = now + self._jittered(sched.interval)
+
+    def tick(self):
+        """One scheduling pass: collect finished jobs, then queue due accounts."""
+        now = self.clock()
+        session = self.session_factory()
+        try:
+            with self._lock:
+                self.ticks += 1
+                if self._last_scan is None or now - self._last_scan >= SYNC_SCHEDULER_RESCAN:
+                    self._rescan(now)
+
+                waiting = {s.job_id: s for s in self.schedules.values() if s.job_id is not None}
+                if waiting:
+                    for job in session.scalars(select(SyncJob).where(SyncJob.id.in_(list(waiting)))):
+                        if job.status in ("done", "failed"):
+                            self._finish(waiting.pop(job.id), job, now)
+                    for job_id in list(waiting):  # pruned or deleted out from under us
+                        if session.get(SyncJob, job_id) is None:
+                            waiting.pop(job_id).job_id = None
+
+                slots = self.max_in_flight - len(waiting)
+                due = sorted(
+                    (s for s in self.schedules.values() if s.job_id is None and s.next_due <= now),
+                    key=lambda s: s.next_due,
+                )
+                for sched in due[:max(0, slots)]:
+                    # a manual sync already queued/running counts as this turn
+                    job = active_job(session, sched.user_email, "sync") or enqueue_job(
+                        session, sched.user_email, "sync", max_results=SYNC_SCHEDULER_MAX_RESULTS
+                    )
+                    sched.job_id = job.id
+                    sched.enqueued_at = now
+        finally:
+            session.close()
+
+    def state(self) -> Dict:
+        now = self.clock()
+        with self._lock:
+            accounts = [
+                {
+                    "user_email": s.user_email,
+                    "interval_s": round(s.interval, 1),
+                    "next_sync_in_s": None if s.job_id is not None else round(max(0.0, s.next_due - now), 1),
+                    "job_id": s.job_id,
+                    "runs": s.runs,
+                    "failures": s.failures,
+                    "last_status": s.last_status,
+                    "last_error": s.last_error,
+                    "last_changes": s.last_changes,
+                    "last_latency_s": s.last_latency,
+                    "last_run_time_s": s.last_run_time,
+                    "last_sync_at": s.last_sync_at,
+                }
+                for s in sorted(self.schedules.values(), key=lambda s: s.user_email)
+            ]
+        return {
+            "enabled": SYNC_SCHEDULER_ENABLED,
+            "running": self.running,
+            "ticks": self.ticks,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": sum(1 for a in accounts if a["job_id"] is not None),
+            "interval_bounds_s": [self.interval_min, self.interval_max],
+            "accounts": accounts,
+        }
+
+scheduler = SyncScheduler()
@@ -0,0 +1,111 @@
+# backend/services/token_budget.py
+"""
+Token budgets for draft generation.
+
+max_tokens follows the requested length instead of a flat 1000/2000: the
+upper word count of the length target, converted to tokens for the target
+language, with headroom for the JSON wrapper and models that overshoot.
+Gemini 2.5 models also spend output tokens on thinking, so their budget
+adds a thinking allowance, per attempt, only when the attempt goes to
+Gemini, and the thinking itself is capped at that allowance (sent as
+thinkingConfig.thinkingBudget) so it cannot eat the reply.
+GEMINI_THINKING_BUDGET sets the cap explicitly (0 turns thinking off on
+Flash, Pro cannot turn it off and gets its minimum instead; -1 leaves it to
+the model); unset, the cap is GEMINI_THINKING_HEADROOM.
+
+Prompt tokens are counted locally, with tiktoken when it is installed and
+a close approximation otherwise; that is good enough for budgets, rate
+limits and the benchmark, not for billing.
+"""
+import os
+import re
+import math
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or no encoding files offline
+    _ENCODING = None
+
+# words per length setting (shown to the model as the target, and used for the budget)
+LENGTH_WORDS = {"short": (50, 100), "medium": (150, 250), "detailed": (300, 500)}
+# output budget = max words * tokens per word * headroom + the JSON wrapper and subject
+DRAFT_TOKEN_HEADROOM = float(os.getenv("DRAFT_TOKEN_HEADROOM", "1.5"))
+DRAFT_TOKEN_OVERHEAD = 48
+# Latin-script languages are ~1.4 tokens per word; Indic scripts take several per word
+TOKENS_PER_WORD = {"en": 1.4, "es": 1.6, "fr": 1.6, "de": 1.7, "pt": 1.6, "hi": 3.0, "te": 3.5, "ta": 3.5}
+DEFAULT_TOKENS_PER_WORD = 2.0
+# unset = thinking is capped at GEMINI_THINKING_HEADROOM, the allowance the budget reserves for it
+_budget = os.getenv("GEMINI_THINKING_BUDGET", "").strip()
+GEMINI_THINKING_BUDGET: Optional[int] = int(_budget) if _budget else None
+GEMINI_THINKING_HEADROOM = int(os.getenv("GEMINI_THINKING_HEADROOM", "1024"))
+# smallest non-zero thinkingBudget each 2.5 variant accepts; Pro has no 0 (thinking always on)
+GEMINI_MIN_THINKING = {"pro": 128, "flash-lite": 512}
+
+_WORD_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def length_words(length: str) -> tuple:
+    return LENGTH_WORDS.get(length, LENGTH_WORDS["medium"])
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    # common English words are one token, long ones about one per 5 letters;
+    # digits go in groups of three, every other symbol (and non-Latin letter) is about one
+    return sum(max(1, len(w) // 5) if w.isalpha() and w.isascii() else 1 for w in _WORD_RE.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens of a chat request, including the few tokens of framing per message."""
+    return sum(count_tokens(m.get("content") or "") + 4 for m in messages) + 2
+
+
+def output_budget(length: str = "medium", target_lang: str = "en") -> int:
+    """Tokens the draft itself may need: subject and body of the longest draft for `length`."""
+    per_word = TOKENS_PER_WORD.get(target_lang, DEFAULT_TOKENS_PER_WORD)
+    return math.ceil(length_words(length)[1] * per_word * DRAFT_TOKEN_HEADROOM) + DRAFT_TOKEN_OVERHEAD
+
+
+def _thinks(model: Optional[str]) -> bool:
+    # unknown model: assume the default, a 2.5 model
+    return model is None or "2.5" in model
+
+
+def thinking_budget(model: Optional[str] = None) -> int:
+    """Thinking cap for `model`: GEMINI_THINKING_BUDGET, else the reserved headroom, as the model accepts it."""
+    budget = GEMINI_THINKING_BUDGET if GEMINI_THINKING_BUDGET is not None else GEMINI_THINKING_HEADROOM
+    if budget < 0:  # -1 asks for dynamic thinking explicitly
+        return budget
+    name = (model or "").lower()
+    if "pro" in name:
+        return max(budget, GEMINI_MIN_THINKING["pro"])
+    if "flash-lite" in name and budget:
+        return max(budget, GEMINI_MIN_THINKING["flash-lite"])
+    return budget
+
+
+def thinking_headroom(model: Optional[str] = None) -> int:
+    budget = thinking_budget(model)
+    return budget if budget >= 0 else GEMINI_THINKING_HEADROOM
+
+
+def provider_max_tokens(out: int, provider: str, model: Optional[str] = None) -> int:
+    """max_tokens for one attempt at `provider` from an output budget: Gemini 2.5 counts thinking against it."""
+    return out + thinking_headroom(model) if provider == "gemini" and _thinks(model) else out
+
+
+def draft_max_tokens(length: str = "medium", target_lang: str = "en", provider: str = "gemini",
+                     model: Optional[str] = None) -> int:
+    return provider_max_tokens(output_budget(length, target_lang), provider, model)
+
+
+def gemini_thinking_config(model: str) -> Optional[Dict[str, int]]:
+    """thinkingConfig for generationConfig (thinking models only)."""
+    if "2.5" not in (model or ""):
+        return None
+    return {"thinkingBudget": thinking_budget(model)}
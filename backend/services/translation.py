@@ -1,4 +1,7 @@
-from langdetect import detect
+from langdetect import DetectorFactory, detect
+
+# langdetect is randomized; pin it so a message always gets the same language
+DetectorFactory.seed = 0
 
 # Stubs: replace with googletrans / Azure / MarianMT as needed.
 def detect_lang(text: str) -> str:
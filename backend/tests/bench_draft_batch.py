@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+from fastapi import FastAPI
+
+from backend.routers import generate
+from backend.services import draft_batch, draft_cache, email_gen
+from backend.tests.bench_draft_stream import REPLY, serve
+from backend.tests.fake_llm import FakeLLM, start_server, use_fake
+
+# Mail-merge throughput against the fake provider: N personalized drafts one
+# POST /generate/draft at a time (what the UI does today) versus one
+# /generate/drafts/batch request at several concurrency limits.
+N_DRAFTS = int(os.getenv("BENCH_DRAFTS", "40"))
+FIRST_TOKEN = float(os.getenv("BENCH_FIRST_TOKEN", "0.8"))
+PER_CHUNK = float(os.getenv("BENCH_PER_CHUNK", "0.002"))
+CONCURRENCY = [1, 4, 8, 16, 32]
+TEMPLATE = "thank {name} from {team} for their help with the {project} launch"
+RECIPIENTS = [{"name": f"Recipient {i}", "team": f"team {i % 7}", "project": f"project {i % 5}"} for i in range(N_DRAFTS)]
+
+
+def sequential(client):
+    start = time.perf_counter()
+    first = None
+    for r in RECIPIENTS:
+        assert client.post("/generate/draft", json={"prompt": draft_batch.render_template(TEMPLATE, r)}).status_code == 200
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start, N_DRAFTS
+
+
+def batched(client, concurrency):
+    start = time.perf_counter()
+    first, ok = None, 0
+    payload = {"template": TEMPLATE, "items": [{"variables": r} for r in RECIPIENTS], "concurrency": concurrency}
+    with client.stream("POST", "/generate/drafts/batch", json=payload) as resp:
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if "index" in item:
+                first = first or time.perf_counter() - start
+                ok += item["ok"]
+    return first, time.perf_counter() - start, ok
+
+
+def report(label, first, total, ok):
+    print(f"{label:<26} {ok:>3}/{N_DRAFTS} ok   first result {first * 1000:7.0f} ms   "
+          f"all {total:6.2f} s   {N_DRAFTS / total:6.2f} drafts/s")
+
+
+if __name__ == "__main__":
+    fake = FakeLLM(reply=REPLY, latency=FIRST_TOKEN, token_latency=PER_CHUNK)
+    use_fake(start_server(fake))
+    for module in (email_gen, draft_batch, generate):
+        module.logger.setLevel("WARNING")
+    draft_cache.cache = draft_cache.DraftCache(enabled=False)
+    # lift the process-wide LLM call cap so the batch limit is what is measured
+    email_gen.LLM_MAX_CONCURRENCY = draft_batch.DRAFT_BATCH_CONCURRENCY = max(CONCURRENCY)
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    print(f"{N_DRAFTS} drafts of {len(REPLY)} chars, {FIRST_TOKEN * 1000:.0f} ms to first token, "
+          f"{PER_CHUNK * 1000:.0f} ms per {fake.chunk_size} chars")
+    with httpx.Client(base_url=serve(app), timeout=600) as client:
+        report("sequential /draft", *sequential(client))
+        for concurrency in CONCURRENCY:
+            fake.max_in_flight = 0
+            report(f"batch, concurrency {concurrency}", *batched(client, concurrency))
+            assert fake.max_in_flight <= concurrency
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, make_engine
+from backend.routers import generate
+from backend.services import draft_cache, email_gen
+from backend.services.draft_cache import DraftCache
+from backend.tests.fake_llm import FakeLLM, start_server, use_fake
+
+N_REQUESTS = int(os.getenv("BENCH_REQUESTS", "50"))
+# a hosted model's full JSON draft
+LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "2"))
+TEMPLATES = ["reply to a customer asking for a refund on order {}", "confirm the support ticket {} is resolved"]
+
+
+def timed(client, prompts, **extra):
+    ms = []
+    for p in prompts:
+        t = time.perf_counter()
+        assert client.post("/generate/draft", json={"prompt": p, **extra}).status_code == 200
+        ms.append((time.perf_counter() - t) * 1000)
+    return ms
+
+
+def report(label, ms):
+    print(f"{label:<28} p50 {statistics.median(ms):8.2f} ms  max {max(ms):8.2f} ms")
+
+
+if __name__ == "__main__":
+    fake = FakeLLM(latency=LATENCY)
+    use_fake(start_server(fake))
+    for log in (email_gen.logger, generate.logger, draft_cache.logger):
+        log.setLevel("WARNING")
+    engine = make_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    Shared = sessionmaker(bind=engine)
+
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    client = TestClient(app)
+    prompts = [TEMPLATES[i % 2].format(1000 + i % 5) for i in range(N_REQUESTS)]  # 10 distinct requests
+    print(f"{N_REQUESTS} /generate/draft requests over {len(set(prompts))} distinct prompts, "
+          f"{LATENCY * 1000:.0f} ms per LLM call")
+
+    draft_cache.cache = DraftCache(session_factory=Shared)
+    report("miss (LLM call)", timed(client, sorted(set(prompts))))
+    report("memory hit", timed(client, prompts))
+    # another worker: empty memory, same database
+    draft_cache.cache = DraftCache(session_factory=Shared)
+    report("shared hit (other worker)", timed(client, sorted(set(prompts))))
+    report("cache=off", timed(client, prompts[:3], cache="off"))
+    print("LLM calls:", fake.calls)
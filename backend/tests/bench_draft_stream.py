@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import statistics
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from backend.routers import generate
+from backend.services import draft_stream, email_gen
+from backend.tests.fake_llm import FakeLLM, start_server, use_fake
+
+N_REQUESTS = int(os.getenv("BENCH_REQUESTS", "10"))
+# time to first token (prompt processing, thinking) and per-token generation time, 8 chars per chunk
+FIRST_TOKEN = float(os.getenv("BENCH_FIRST_TOKEN", "0.8"))
+PER_CHUNK = float(os.getenv("BENCH_PER_CHUNK", "0.02"))
+BODY = ("Dear [Manager's Name],\n\nI am writing to request leave on Monday to finish the release checklist "
+        "with the platform team. All open reviews are assigned and the on-call handover is documented.\n\n") * 4
+REPLY = json.dumps({"subject": "Leave request for Monday", "body": BODY + "Regards,\n[Your Name]"})
+
+
+def serve(app):
+    # a real server: TestClient buffers the whole response, which would hide the streaming
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def blocking(client):
+    t = time.perf_counter()
+    assert client.post("/generate/draft", json={"prompt": "ask for leave on monday"}).status_code == 200
+    elapsed = time.perf_counter() - t
+    return elapsed, elapsed
+
+
+def streamed(client):
+    t = time.perf_counter()
+    first = None
+    with client.stream("POST", "/generate/draft/stream", json={"prompt": "ask for leave on monday"}) as r:
+        for line in r.iter_lines():
+            if first is None and line in ("event: subject", "event: body"):
+                first = time.perf_counter() - t
+            if line == "event: done":
+                break
+    return first, time.perf_counter() - t
+
+
+def run(label, fn, client):
+    fn(client)  # warm-up
+    results = [fn(client) for _ in range(N_REQUESTS)]
+    first = statistics.median(r[0] for r in results)
+    total = statistics.median(r[1] for r in results)
+    print(f"{label:<9} first text on screen {first * 1000:6.0f} ms   complete draft {total * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    fake = FakeLLM(reply=REPLY, latency=FIRST_TOKEN, token_latency=PER_CHUNK)
+    use_fake(start_server(fake))
+    email_gen.logger.setLevel("WARNING")
+    draft_stream.logger.setLevel("WARNING")
+    generate.logger.setLevel("WARNING")
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    print(f"{N_REQUESTS} drafts of {len(REPLY)} chars, {FIRST_TOKEN * 1000:.0f} ms to first token, "
+          f"{PER_CHUNK * 1000:.0f} ms per {fake.chunk_size} chars")
+    with httpx.Client(base_url=serve(app), timeout=60) as client:
+        run("/draft", blocking, client)
+        run("/stream", streamed, client)
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import statistics
+import multiprocessing as mp
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+
+N_REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "100"))
+# a JSON draft from a hosted model (Gemini 2.5 with thinking) takes a few seconds
+LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "2"))
+CONCURRENCY = int(os.getenv("BENCH_LLM_CONCURRENCY", "64"))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait(url):
+    for _ in range(500):
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.02)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def run_fake(port):
+    from backend.tests.fake_llm import FakeLLM, _make_handler, _Server
+
+    _Server(("127.0.0.1", port), _make_handler(FakeLLM(latency=LATENCY))).serve_forever()
+
+
+def run_app(mode, port, llm_base):
+    """The app's /generate/draft in its own process, like a uvicorn worker."""
+    import uvicorn
+    from fastapi import FastAPI, HTTPException
+    from backend.routers import generate
+    from backend.routers.generate import DraftReq
+    from backend.services import email_gen
+
+    email_gen.PROVIDER, email_gen.GEMINI_API_KEY, email_gen.GEMINI_API_BASE = "gemini", "fake", llm_base
+    # the connection pool has to be at least as wide as the concurrency gate
+    email_gen.LLM_MAX_CONCURRENCY = email_gen.LLM_MAX_CONNECTIONS = CONCURRENCY
+    email_gen.logger.setLevel("WARNING")
+    generate.logger.setLevel("WARNING")
+
+    app = FastAPI()
+    if mode == "sync":
+        # what /generate/draft was before: a sync handler on Starlette's thread pool, blocking inside
+        @app.post("/generate/draft")
+        def create_draft(req: DraftReq):
+            try:
+                return email_gen.generate_email_json_forced(req.prompt, tone=req.tone, length=req.length,
+                                                            target_lang=req.target_lang, sender_name=req.sender_name)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+    else:
+        app.include_router(generate.router, prefix="/generate")
+
+    # stands in for the app's other sync endpoints, which share Starlette's thread pool with the old handler
+    @app.get("/health")
+    def health():
+        return {}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+async def load(base):
+    gate = asyncio.Semaphore(CLIENTS)
+    latencies, health = [], []
+    done = asyncio.Event()
+
+    async def one(client, i):
+        async with gate:
+            t = time.perf_counter()
+            r = await client.post(f"{base}/generate/draft", json={"prompt": f"ask for leave on monday {i}"})
+            assert r.status_code == 200, r.text
+            latencies.append(time.perf_counter() - t)
+
+    async def probe():
+        async with httpx.AsyncClient(timeout=120) as client:
+            while not done.is_set():
+                t = time.perf_counter()
+                await client.get(f"{base}/health")
+                health.append(time.perf_counter() - t)
+                await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=CLIENTS)) as client:
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*[one(client, i) for i in range(N_REQUESTS)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+        return elapsed, latencies, health
+
+
+def run(mode, llm_base):
+    port = _free_port()
+    proc = mp.Process(target=run_app, args=(mode, port, llm_base), daemon=True)
+    proc.start()
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait(f"{base}/health")
+        httpx.get(f"{llm_base}/stats?reset")
+        elapsed, lat, health = asyncio.run(load(base))
+        stats = httpx.get(f"{llm_base}/stats").json()
+    finally:
+        proc.terminate()
+        proc.join()
+    print(f"{mode:<6} {elapsed:6.2f} s  {N_REQUESTS / elapsed:6.1f} req/s  "
+          f"p50 {statistics.median(lat) * 1000:6.0f} ms  p95 {statistics.quantiles(lat, n=20)[-1] * 1000:6.0f} ms  "
+          f"max LLM calls in flight {stats['max_in_flight']:3d}  "
+          f"/health during load p50 {statistics.median(health) * 1000:5.0f} ms  max {max(health) * 1000:5.0f} ms")
+
+
+if __name__ == "__main__":
+    llm_port = _free_port()
+    fake = mp.Process(target=run_fake, args=(llm_port,), daemon=True)
+    fake.start()
+    llm_base = f"http://127.0.0.1:{llm_port}"
+    _wait(f"{llm_base}/stats")
+    print(f"{N_REQUESTS} POST /generate/draft from {CLIENTS} concurrent clients, {LATENCY * 1000:.0f} ms per LLM call, "
+          f"LLM_MAX_CONCURRENCY={CONCURRENCY}, {os.cpu_count()} CPU(s)")
+    try:
+        run("sync", llm_base)
+        run("async", llm_base)
+    finally:
+        fake.terminate()
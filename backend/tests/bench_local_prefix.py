@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import functools
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import email_gen, local_pool
+from backend.services.local_pool import LocalModelPool
+
+# Prompt evaluation time per local draft request on CPU, with the whole prompt
+# evaluated every time (as ctransformers does) and with the shared prefix
+# reused (llama_cpp backend). Each request generates one token, so its time is
+# the prompt evaluation. Languages alternate, so consecutive prompts differ
+# inside the system message as well.
+#
+# Needs llama-cpp-python and a GGUF file: LOCAL_MODEL_PATH=/path/model.gguf
+THREADS = int(os.getenv("LOCAL_THREADS", "0")) or (os.cpu_count() or 1)
+MODEL = os.getenv("BENCH_LOCAL_MODEL", "tinyllama")  # prompt format: "tinyllama" or "mistral"
+REQUESTS = [
+    ("ask my manager for leave on monday for a medical appointment", "en"),
+    ("thank the team for shipping the release on time", "hi"),
+    ("apologize to a customer for the delayed order and offer a discount", "en"),
+    ("request the updated budget figures from finance before friday", "en"),
+    ("invite the design team to a review meeting next tuesday", "hi"),
+    ("follow up with a candidate about their interview feedback", "en"),
+    ("remind the landlord that the kitchen tap is still leaking", "en"),
+    ("congratulate a colleague on their promotion", "te"),
+    ("ask IT to reset my VPN access after the laptop replacement", "en"),
+]
+
+
+def prompt_for(request, lang):
+    messages, _ = email_gen.build_draft_messages(request, target_lang=lang)
+    return email_gen._local_prompt(messages, MODEL) + email_gen._LOCAL_JSON_PRIMER
+
+
+def run(reuse: bool):
+    loader = functools.partial(local_pool.load_llama_cpp, prefix_cache=reuse)
+    pool = LocalModelPool(workers=1, threads=THREADS, timeout=600, loader=loader)
+    pool.start(MODEL, prefix=email_gen.local_prompt_prefix(MODEL) if reuse else None)
+    try:
+        times = []
+        for request, lang in REQUESTS:
+            start = time.perf_counter()
+            pool.generate(MODEL, prompt_for(request, lang), max_new_tokens=1, temperature=0.2)
+            times.append(time.perf_counter() - start)
+        return times[1:]  # the first request also waits for the model load
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    if not local_pool.LOCAL_MODEL_PATH:
+        sys.exit("Set LOCAL_MODEL_PATH to a GGUF file")
+    from llama_cpp import Llama
+
+    email_gen.logger.setLevel("WARNING")
+    local_pool.logger.setLevel("WARNING")
+    vocab = Llama(model_path=local_pool.LOCAL_MODEL_PATH, vocab_only=True, verbose=False)
+
+    def tokens(text):
+        return len(vocab.tokenize(text.encode(), add_bos=True, special=True))
+
+    print(f"{os.path.basename(local_pool.LOCAL_MODEL_PATH)}, {THREADS} threads, {len(REQUESTS) - 1} requests")
+    for structured in (True, False):
+        email_gen.LLM_STRUCTURED_OUTPUT = structured  # without native JSON the prompt carries a worked example
+        prefix = tokens(email_gen.local_prompt_prefix(MODEL))
+        sizes = [tokens(prompt_for(r, lang)) for r, lang in REQUESTS[1:]]
+        print(f"\nstructured output {'on' if structured else 'off'}: prompts of {min(sizes)}-{max(sizes)} tokens, "
+              f"{prefix} of them the shared prefix")
+        print(f"{'':<22} {'mean ms':>8} {'p50 ms':>8} {'max ms':>8} {'prompt tok/s':>13}")
+        for label, reuse in (("full prompt each time", False), ("prefix reused", True)):
+            times = run(reuse)
+            ordered = sorted(times)
+            mean = sum(times) / len(times)
+            print(f"{label:<22} {mean * 1000:>8.1f} {ordered[len(ordered) // 2] * 1000:>8.1f} "
+                  f"{ordered[-1] * 1000:>8.1f} {sum(sizes) / sum(times):>13.0f}")
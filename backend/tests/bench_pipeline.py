@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, make_engine
+from backend.services.gmail import fetch_messages
+from backend.services.ingest_pipeline import PIPELINE_EXECUTOR, PIPELINE_WORKERS, _lang_of
+from backend.services.mail_sync import store_messages, sync_mailbox
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+N_MESSAGES = int(os.getenv("BENCH_MESSAGES", "2000"))
+# per batch request of 50 messages; real Gmail batches take a few hundred ms
+LATENCY = float(os.getenv("BENCH_BATCH_LATENCY", "0.15"))
+# tracemalloc slows langdetect several-fold, so memory is measured in a separate pass
+TRACE_MEMORY = os.getenv("BENCH_MEMORY", "1") == "1"
+BODY = "Hello team, the quarterly numbers are attached. Please review them before Friday's meeting. " * 40
+
+
+def _session():
+    engine = make_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def sequential(svc, session):
+    """The pre-pipeline sync: fetch and decode everything, then tag, score and store."""
+    msgs = fetch_messages(svc, max_results=N_MESSAGES)
+    for m in msgs:
+        m["lang"] = _lang_of(m)
+    inserted = store_messages(session, "me@example.com", msgs)
+    session.commit()
+    return inserted
+
+
+def pipelined(svc, session):
+    return sync_mailbox(svc, session, "me@example.com", max_results=N_MESSAGES)["inserted"]
+
+
+def run(label, fn, server):
+    session = _session()
+    svc = fake_service(server)
+    start = time.perf_counter()
+    inserted = fn(svc, session)
+    elapsed = time.perf_counter() - start
+    assert inserted == N_MESSAGES
+    line = f"{label:<11} {elapsed:6.2f} s  {N_MESSAGES / elapsed:7.0f} msg/s"
+    if TRACE_MEMORY:
+        session = _session()
+        tracemalloc.start()
+        fn(fake_service(server), session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"  peak traced memory {peak / 1e6:6.1f} MB"
+    print(line)
+
+
+if __name__ == "__main__":
+    fake = FakeGmail()
+    for i in range(N_MESSAGES, 0, -1):
+        fake.add_message(f"m{i:05d}", subject=f"Quarterly report {i}", body=BODY)
+    fake.batch_latency = LATENCY
+    server = start_server(fake)
+    print(f"{N_MESSAGES} messages, {LATENCY * 1000:.0f} ms per batch request, "
+          f"{PIPELINE_WORKERS} {PIPELINE_EXECUTOR} workers, {os.cpu_count()} CPU(s)")
+    run("sequential", sequential, server)
+    run("pipeline", pipelined, server)
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+from statistics import median, quantiles
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, _migrate, insert_ignore_emails, make_engine, setup_fts
+from backend.routers.emails import fts_query, search_emails
+
+USER = "me@example.com"
+N_MESSAGES = int(os.getenv("BENCH_MESSAGES", "100000"))
+VOCAB_SIZE = 30000
+
+# A real mailbox has a long-tailed vocabulary: a few words everywhere, most
+# words rare. Draw body words from a Zipf distribution over VOCAB_SIZE
+# pseudo-words so match-set sizes (and therefore bm25 cost) are realistic.
+COMMON = (
+    "the to and of a in for is on that this with you it be are as at have from we will your please "
+    "project update meeting schedule invoice payment budget approval review draft report quarterly "
+    "team client contract deadline proposal travel expense lunch friday monday release deploy server"
+).split()
+
+
+def vocabulary(n):
+    rnd = random.Random(1)
+    syll = ["ka", "lo", "mi", "ra", "ten", "vo", "sel", "dar", "pin", "qu", "bex", "tor", "ny", "ze"]
+    words, seen = list(COMMON), set(COMMON)
+    while len(words) < n:
+        w = "".join(rnd.choices(syll, k=rnd.randint(2, 4)))
+        if w not in seen:
+            seen.add(w)
+            words.append(w)
+    return words
+
+
+def synthetic_rows(n):
+    rnd = random.Random(7)
+    vocab = vocabulary(VOCAB_SIZE)
+    weights = [1 / (r + 1) ** 1.05 for r in range(len(vocab))]
+    base = datetime(2020, 1, 1)
+    people = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"] + [f"user{i}" for i in range(200)]
+    for i in range(n):
+        sender = rnd.choice(people)
+        words = rnd.choices(vocab, weights=weights, k=rnd.randint(60, 200))
+        yield dict(
+            user_email=USER, gmail_id=f"g{i}", from_addr=f"{sender.title()} <{sender}@corp.example>", to_addr=USER,
+            subject=" ".join(words[:6]).capitalize(),
+            snippet="", body_text=" ".join(words),
+            received_at=base + timedelta(minutes=i), is_spam=False, lang="en",
+        )
+
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _migrate(conn)
+        setup_fts(conn)
+    Session = sessionmaker(bind=engine)
+
+    start = time.perf_counter()
+    with Session() as s:
+        batch = []
+        for row in synthetic_rows(N_MESSAGES):
+            batch.append(row)
+            if len(batch) == 1000:
+                insert_ignore_emails(s, batch)
+                batch = []
+        insert_ignore_emails(s, batch)
+        s.commit()
+    print(f"Indexed {N_MESSAGES} messages in {time.perf_counter() - start:.1f}s (insert + FTS triggers)")
+
+    vocab = vocabulary(VOCAB_SIZE)
+    # common, mid-frequency and rare words, two-word queries, a sender, a prefix and a miss
+    queries = ["invoice", vocab[300], vocab[3000], "quarterly report", f"{vocab[120]} {vocab[900]}", "alice", vocab[500][:3], "zebra"]
+    with Session() as s:
+        for q in queries:
+            times = []
+            for _ in range(30):
+                t = time.perf_counter()
+                page = search_emails(q=q, user_email=USER, folder="all", limit=20, offset=0, session=s)
+                times.append((time.perf_counter() - t) * 1000)
+            p95 = quantiles(times, n=20)[18]
+            total = s.execute(text("SELECT count(*) FROM emails_fts WHERE emails_fts MATCH :m"), {"m": fts_query(q)}).scalar()
+            print(f"{q!r:<20} matches={total:>6}  hits/page={len(page['items']):>3}  p50={median(times):7.2f}ms  p95={p95:7.2f}ms")
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import statistics
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httplib2
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google_auth_httplib2 import AuthorizedHttp
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, get_session, make_engine
+from backend.routers import send
+from backend.services import gmail
+from backend.tests.fake_gmail import FakeGmail, start_server
+
+N_REQUESTS = int(os.getenv("BENCH_REQUESTS", "300"))
+USER = "me@example.com"
+
+
+def legacy_service(root_url):
+    """What /send did per request before: read the token file, then build() (static doc read + parse)."""
+    def service(email_addr):
+        with open(gmail.token_path_for(email_addr), encoding="utf-8") as f:
+            creds = Credentials(**json.load(f))
+        doc = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+        doc["rootUrl"] = root_url
+        return build_from_document(doc, http=AuthorizedHttp(creds, http=httplib2.Http(timeout=60)))
+    return service
+
+
+def timed(label, client, setup=None):
+    payload = {"user_email": USER, "to": "bob@example.com", "subject": "Hi", "body": "Hello Bob"}
+    client.post("/send", json=payload)  # warm-up
+    send_ms, setup_ms = [], []
+    for _ in range(N_REQUESTS):
+        t = time.perf_counter()
+        assert client.post("/send", json=payload).status_code == 200
+        send_ms.append((time.perf_counter() - t) * 1000)
+    if setup:
+        for _ in range(N_REQUESTS):
+            t = time.perf_counter()
+            setup(USER)
+            setup_ms.append((time.perf_counter() - t) * 1000)
+    print(f"{label:<8} /send p50 {statistics.median(send_ms):6.2f} ms  p95 {statistics.quantiles(send_ms, n=20)[-1]:6.2f} ms"
+          f"  client setup p50 {statistics.median(setup_ms):6.3f} ms")
+
+
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp()
+    gmail._tokens_base_dir = lambda: tmp
+    with open(gmail.token_path_for(USER), "w") as f:
+        json.dump({"token": "t", "refresh_token": "r", "token_uri": "https://oauth2.example/token",
+                   "client_id": "c", "client_secret": "s", "scopes": ["https://mail.google.com/"]}, f)
+
+    server = start_server(FakeGmail())
+    root_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    doc = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+    doc["rootUrl"] = root_url
+    gmail._gmail_discovery = lambda: doc
+
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def session_dep():
+        s = Session()
+        try:
+            yield s
+        finally:
+            s.close()
+
+    app = FastAPI()
+    app.include_router(send.router)
+    app.dependency_overrides[get_session] = session_dep
+    client = TestClient(app)
+
+    print(f"{N_REQUESTS} POST /send requests against a local fake Gmail")
+    cached = send.user_service
+    send.user_service = legacy_service(root_url)
+    timed("before", client, send.user_service)
+    send.user_service = cached
+    timed("after", client, cached)
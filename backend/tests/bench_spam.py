@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import LinearSVC
+
+from backend.services import nlp
+
+N_TEXTS = int(os.getenv("BENCH_TEXTS", "10000"))
+
+
+def synthetic_texts(n):
+    ham = "Please find the quarterly report attached and share your available slots for Friday. "
+    spam = "You WIN money! Claim your urgent reward now, 100% free casino bonus. "
+    return [(spam if i % 5 == 0 else ham) * 8 + str(i) for i in range(n)]
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:>9.1f} ms   {N_TEXTS / elapsed:>11,.0f} texts/s")
+    return out
+
+
+if __name__ == "__main__":
+    texts = synthetic_texts(N_TEXTS)
+    print(f"Classifying {N_TEXTS} synthetic emails")
+
+    # same pipeline shape as scripts/train_spam.py
+    clf = Pipeline([
+        ("tfidf", TfidfVectorizer(max_features=20000, ngram_range=(1, 2), stop_words="english")),
+        ("svm", LinearSVC()),
+    ])
+    clf.fit(synthetic_texts(200), [1 if i % 5 == 0 else 0 for i in range(200)])
+
+    nlp._spam_model = clf
+    per_item = timed("model, per-item predict_spam", lambda: [nlp.predict_spam(t) for t in texts])
+    labels, scores = timed("model, predict_spam_batch", lambda: nlp.predict_spam_batch(texts))
+    assert per_item == labels
+
+    nlp._spam_model = None
+    nlp.load_spam_model = lambda: None
+    per_item = timed("rules, per-item predict_spam", lambda: [nlp.predict_spam(t) for t in texts])
+    labels, scores = timed("rules, predict_spam_batch", lambda: nlp.predict_spam_batch(texts))
+    assert per_item == labels
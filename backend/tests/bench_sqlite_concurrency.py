@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from statistics import median, quantiles
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, insert_ignore_emails, make_engine
+from backend.routers.emails import folder_query
+
+USER = "me@example.com"
+SEED_ROWS = int(os.getenv("BENCH_SEED_ROWS", "20000"))
+SYNC_ROWS = int(os.getenv("BENCH_SYNC_ROWS", "20000"))
+# rows per write transaction; a large full sync commits thousands at once
+CHUNK = int(os.getenv("BENCH_CHUNK", "5000"))
+READERS = int(os.getenv("BENCH_READERS", "4"))
+
+
+def rows(start, n):
+    base = datetime(2025, 1, 1)
+    body = "Please find the quarterly report attached. " * 40
+    return [
+        dict(user_email=USER, gmail_id=f"g{i}", from_addr=f"s{i % 50}@example.com", to_addr=USER,
+             subject=f"Report {i}", snippet=body[:150], body_text=body,
+             received_at=base + timedelta(seconds=i), is_spam=i % 9 == 0, lang="en")
+        for i in range(start, start + n)
+    ]
+
+
+def run(profile):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = make_engine(f"sqlite:///{path}", sqlite_profile=profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as s:
+        for i in range(0, SEED_ROWS, CHUNK):
+            insert_ignore_emails(s, rows(i, CHUNK))
+            s.commit()
+
+    done = threading.Event()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def writer():
+        # a bulk sync: one transaction per ingest chunk
+        with Session() as s:
+            for i in range(SEED_ROWS, SEED_ROWS + SYNC_ROWS, CHUNK):
+                insert_ignore_emails(s, rows(i, CHUNK))
+                s.commit()
+        done.set()
+
+    def reader():
+        with Session() as s:
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    folder_query(s, "inbox", USER).limit(51).all()
+                    s.rollback()  # end the read transaction like a request would
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    s.rollback()
+                    with lock:
+                        errors.append(type(e).__name__)
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    w_start = time.perf_counter()
+    writer()
+    w_elapsed = time.perf_counter() - w_start
+    for t in threads:
+        t.join()
+
+    q = quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    print(
+        f"{profile:<8} reads={len(latencies):>6}  p50={median(latencies):7.2f}ms  p95={q[94]:7.2f}ms  "
+        f"p99={q[98]:7.2f}ms  max={max(latencies):8.2f}ms  errors={len(errors)}  sync={SYNC_ROWS / w_elapsed:,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    print(f"{READERS} readers paging the inbox while a sync inserts {SYNC_ROWS} rows into a {SEED_ROWS}-row mailbox")
+    run("default")
+    run("wal")
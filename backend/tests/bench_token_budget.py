@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import asyncio
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import draft_cache, email_gen, json_repair, token_budget
+from backend.tests.fake_llm import FakeLLM, start_server, use_fake
+
+# Output-token latency and cost of one draft per length setting, per provider,
+# replaying the recorded replies in recorded_drafts.json through the fake LLM.
+# The fake cuts replies off at the max_tokens each request carries, so the
+# tokens billed and waited for are the ones the budget actually allows.
+#
+# provider: (model, time to first token s, output tokens/s, $/1M input, $/1M output)
+# Rough public list prices and typical speeds; adjust for your account and hardware.
+PROFILES = {
+    "gemini": ("gemini-2.5-flash", 0.6, 180, 0.30, 2.50),
+    "http": ("gpt-4o-mini", 0.5, 80, 0.15, 0.60),
+    "ollama": ("llama2", 0.3, 12, 0.0, 0.0),
+}
+# thinking tokens a Gemini 2.5 Flash draft spends when left to decide (billed as output)
+THINKING = int(os.getenv("BENCH_GEMINI_THINKING", "600"))
+THINKING_CAP = int(os.getenv("BENCH_GEMINI_THINKING_BUDGET", "256"))
+PROMPT = "ask my manager for leave on monday for a medical appointment"
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_drafts.json")) as f:
+    RECORDED = json.load(f)
+
+
+def flat_max_tokens(length="medium", target_lang="en"):
+    return 1000  # the budget before token_budget: 1000, and 2000 on Gemini (see FLAT_GEMINI_EXTRA)
+
+
+FLAT_GEMINI_EXTRA = 1000  # thinking headroom that makes the flat Gemini budget 2000
+
+
+def run(fake, provider, length, reply):
+    model, ttft, tps, price_in, price_out = PROFILES[provider]
+    fake.reply = json.dumps(reply)
+    asyncio.run(email_gen.agenerate_email_json_forced(PROMPT, length=length, model=model, cache="off"))
+    body = fake.bodies[-1]
+    config = body.get("generationConfig") or {}
+    max_tokens = body.get("max_tokens") or (body.get("options") or {}).get("num_predict") or config.get("maxOutputTokens")
+    thinking = 0
+    if provider == "gemini":
+        cap = (config.get("thinkingConfig") or {}).get("thinkingBudget", -1)
+        thinking = THINKING if cap < 0 else min(THINKING, cap)
+    text = fake.reply_for(body)
+    out = token_budget.count_tokens(text)
+    prompt = token_budget.count_message_tokens(email_gen.build_draft_messages(PROMPT, length=length)[0])
+    latency = ttft + (thinking + out) / tps
+    cost = (prompt * price_in + (out + thinking) * price_out) / 1e6
+    complete = text == fake.reply or json_repair.repair_draft_json(text) == reply
+    return max_tokens, prompt, thinking, out, latency, cost, complete
+
+
+def report(fake, label, scenario):
+    print(f"\n{label}, {scenario}")
+    print(f"{'provider':<8} {'length':<9} {'max_tok':>7} {'prompt':>6} {'think':>5} {'output':>6} {'latency s':>9} {'$ / 1k drafts':>13}  complete")
+    for provider in PROFILES:
+        use_fake(server, provider=provider)
+        for length in ("short", "medium", "detailed"):
+            reply = RECORDED[length] if scenario == "model follows the length" else RECORDED["detailed"]
+            max_tokens, prompt, thinking, out, latency, cost, complete = run(fake, provider, length, reply)
+            print(f"{provider:<8} {length:<9} {max_tokens:>7} {prompt:>6} {thinking:>5} {out:>6} {latency:>9.2f} {cost * 1000:>13.4f}  {'yes' if complete else 'cut off'}")
+
+
+if __name__ == "__main__":
+    fake = FakeLLM()
+    fake.truncate, fake.thinking_tokens = True, THINKING
+    server = start_server(fake)
+    email_gen.logger.setLevel("WARNING")
+    draft_cache.cache = draft_cache.DraftCache(enabled=False)
+    adaptive = email_gen.draft_max_tokens
+
+    for scenario in ("model follows the length", "model ignores the length (writes the detailed reply)"):
+        email_gen.draft_max_tokens, headroom = flat_max_tokens, token_budget.GEMINI_THINKING_HEADROOM
+        # as before: no thinkingConfig, the model thinks as much as it likes
+        token_budget.GEMINI_THINKING_HEADROOM, token_budget.GEMINI_THINKING_BUDGET = FLAT_GEMINI_EXTRA, -1
+        report(fake, "flat budget (2000 Gemini / 1000 others)", scenario)
+        email_gen.draft_max_tokens, token_budget.GEMINI_THINKING_HEADROOM = adaptive, headroom
+        token_budget.GEMINI_THINKING_BUDGET = None
+        report(fake, "adaptive budget", scenario)
+        token_budget.GEMINI_THINKING_BUDGET = THINKING_CAP
+        report(fake, f"adaptive budget + GEMINI_THINKING_BUDGET={THINKING_CAP}", scenario)
+        token_budget.GEMINI_THINKING_BUDGET = None
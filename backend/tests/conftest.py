@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models.db import Base, make_engine
+from backend.services import draft_cache, email_gen, gmail, llm_router
+from backend.tests.fake_llm import FakeLLM, start_server, use_fake
+
+
+class _NoSleepTime:
+    """The `time` module as gmail sees it in tests: no real backoff against the fake."""
+
+    @staticmethod
+    def sleep(seconds):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture(autouse=True)
+def no_gmail_backoff(monkeypatch):
+    # swap gmail's reference only: time.sleep stays real for the tests themselves
+    monkeypatch.setattr(gmail, "time", _NoSleepTime())
+
+
+@pytest.fixture
+def session():
+    """Session on a fresh in-memory database."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessionmaker on a fresh WAL database file, for tests with several connections or threads."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    A FakeLLM on a local port with email_gen pointed at it as the gemini
+    provider (`fake_llm.use(provider)` switches), fresh clients and router,
+    and the draft cache off. The server is shut down after the test.
+    """
+    fake = FakeLLM()
+    server = start_server(fake)
+    use_fake(server, monkeypatch)
+    fake.use = lambda provider: use_fake(server, monkeypatch, provider)
+    monkeypatch.setattr(email_gen, "_aclients", {})
+    monkeypatch.setattr(llm_router, "router", llm_router.LLMRouter())
+    monkeypatch.setattr(draft_cache, "cache", draft_cache.DraftCache(enabled=False))
+    yield fake
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,210 @@
+"""
+Minimal in-process fake of the Gmail REST + batch endpoints.
+
+Used by the sync tests so batching, paging and history behaviour can be
+exercised without a Google account. Build a client against it with
+`fake_service(server)`.
+"""
+import json
+import time
+import base64
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+
+def make_message(mid: str, subject: str = "", body: str = "", sender: str = "a@example.com", to: str = "me@example.com") -> dict:
+    data = base64.urlsafe_b64encode((body or f"body of {mid}").encode()).decode()
+    return {
+        "id": mid,
+        "threadId": mid,
+        "snippet": (body or f"body of {mid}")[:50],
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "From", "value": sender},
+                {"name": "To", "value": to},
+                {"name": "Subject", "value": subject or f"subject {mid}"},
+                {"name": "Date", "value": "Mon, 06 Jan 2025 10:00:00 +0000"},
+            ],
+            "parts": [{"mimeType": "text/plain", "body": {"data": data}}],
+        },
+    }
+
+
+class FakeGmail:
+    def __init__(self, n_messages: int = 0):
+        self.lock = threading.Lock()
+        # newest first, like messages.list
+        self.messages = [make_message(f"m{i:05d}") for i in range(n_messages, 0, -1)]
+        self.missing = set()      # ids answered with 404
+        self.flaky = {}           # id -> number of 503s before succeeding
+        self.fail_pages = set()   # list pageTokens answered once with 500
+        self.page_tokens_seen = []
+        self.batch_latency = 0.0  # seconds slept per batch request, to simulate network round trips
+        self.calls = {"list": 0, "get": 0, "batch": 0, "history": 0, "profile": 0, "send": 0}
+        self.history_id = 1000
+        self.oldest_history_id = 1000  # history before this answers 404
+        self.events = []                # (history_id, "messagesAdded"|"messagesDeleted", id)
+
+    # --- mailbox mutations ---
+    def add_message(self, mid: str, **kw):
+        with self.lock:
+            self.messages.insert(0, make_message(mid, **kw))
+            self.history_id += 1
+            self.events.append((self.history_id, "messagesAdded", mid))
+
+    def delete_message(self, mid: str):
+        with self.lock:
+            self.messages = [m for m in self.messages if m["id"] != mid]
+            self.history_id += 1
+            self.events.append((self.history_id, "messagesDeleted", mid))
+
+    def expire_history(self):
+        self.oldest_history_id = self.history_id + 1
+
+    # --- request handlers ---
+    def list_messages(self, qs):
+        max_results = int(qs.get("maxResults", ["100"])[0])
+        token = qs.get("pageToken", ["0"])[0]
+        self.page_tokens_seen.append(token)
+        if token in self.fail_pages:
+            self.fail_pages.discard(token)
+            return 500, {"error": {"code": 500, "message": "Backend Error"}}
+        offset = int(token)
+        page = self.messages[offset:offset + max_results]
+        out = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page], "resultSizeEstimate": len(self.messages)}
+        if offset + max_results < len(self.messages):
+            out["nextPageToken"] = str(offset + max_results)
+        return 200, out
+
+    def list_history(self, qs):
+        start = int(qs["startHistoryId"][0])
+        if start < self.oldest_history_id:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        max_results = int(qs.get("maxResults", ["100"])[0])
+        offset = int(qs.get("pageToken", ["0"])[0])
+        events = [e for e in self.events if e[0] > start]
+        page = events[offset:offset + max_results]
+        out = {
+            "history": [{"id": str(hid), kind: [{"message": {"id": mid, "threadId": mid}}]} for hid, kind, mid in page],
+            "historyId": str(self.history_id),
+        }
+        if offset + max_results < len(events):
+            out["nextPageToken"] = str(offset + max_results)
+        return 200, out
+
+    def get_message(self, mid):
+        with self.lock:
+            self.calls["get"] += 1
+            if mid in self.missing:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if self.flaky.get(mid):
+                self.flaky[mid] -= 1
+                return 503, {"error": {"code": 503, "message": "Backend Error"}}
+        for m in self.messages:
+            if m["id"] == mid:
+                return 200, m
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+
+    def route(self, method, path, qs):
+        parts = path.strip("/").split("/")
+        # gmail/v1/users/me/<resource>[/<id>]
+        if parts[:3] != ["gmail", "v1", "users"] or len(parts) < 5:
+            return 404, {"error": {"code": 404, "message": path}}
+        resource = parts[4:]
+        if resource == ["profile"]:
+            with self.lock:
+                self.calls["profile"] += 1
+            return 200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+        if resource == ["history"]:
+            with self.lock:
+                self.calls["history"] += 1
+            return self.list_history(qs)
+        if resource == ["messages"]:
+            with self.lock:
+                self.calls["list"] += 1
+            return self.list_messages(qs)
+        if method == "POST" and resource == ["messages", "send"]:
+            with self.lock:
+                self.calls["send"] += 1
+                mid = f"sent{self.calls['send']:05d}"
+            self.add_message(mid)
+            return 200, {"id": mid, "threadId": mid, "labelIds": ["SENT"]}
+        if resource[0] == "messages" and len(resource) == 2:
+            return self.get_message(resource[1])
+        return 404, {"error": {"code": 404, "message": path}}
+
+
+def _make_handler(fake: FakeGmail):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json"):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            u = urlparse(self.path)
+            status, payload = fake.route("GET", u.path, parse_qs(u.query))
+            self._send(status, payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+            u = urlparse(self.path)
+            if u.path.strip("/") != "batch":
+                status, payload = fake.route("POST", u.path, parse_qs(u.query))
+                return self._send(status, payload)
+            with fake.lock:
+                fake.calls["batch"] += 1
+            if fake.batch_latency:
+                time.sleep(fake.batch_latency)
+            envelope = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+            )
+            boundary = "fakebatchboundary"
+            out = []
+            for part in envelope.iter_parts():
+                content = part.get_payload(decode=True) or part.get_payload().encode()
+                request_line = content.decode().splitlines()[0]
+                method, target, _ = request_line.split(" ", 2)
+                u = urlparse(target)
+                status, payload = fake.route(method, u.path, parse_qs(u.query))
+                content_id = part["Content-ID"].strip("<>")
+                out.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n\r\n"
+                    f"{json.dumps(payload)}\r\n"
+                )
+            out.append(f"--{boundary}--\r\n")
+            self._send(200, "".join(out).encode(), content_type=f"multipart/mixed; boundary={boundary}")
+
+    return Handler
+
+
+def start_server(fake: FakeGmail):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_service(server):
+    doc = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+    doc["rootUrl"] = f"http://127.0.0.1:{server.server_address[1]}/"
+    doc["baseUrl"] = doc["rootUrl"] + doc["servicePath"]
+    return build_from_document(doc, http=httplib2.Http())
@@ -0,0 +1,239 @@
+"""
+Minimal in-process fake of the Gemini, OpenAI chat-completions and Ollama
+chat endpoints, including their streaming modes (Gemini SSE, OpenAI SSE,
+Ollama NDJSON).
+
+Used by the generation tests and benchmarks so the async client layer can be
+exercised without API keys. Point email_gen at it with `use_fake(server)`.
+`fake_local_model` stands in for ctransformers in the local model pool.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DRAFT = {"subject": "Leave request for Monday", "body": "Dear [Manager's Name],\n\nI would like to take Monday off.\n\nRegards,\n[Your Name]"}
+
+
+class FakeLLM:
+    """
+    `latency` is the time to the first token, `token_latency` the time per
+    `chunk_size` characters after that; a non-streaming request gets the whole
+    reply after both, a streaming one gets chunks as they are "generated".
+    """
+
+    def __init__(self, reply: str = json.dumps(DRAFT), latency: float = 0.0, token_latency: float = 0.0, chunk_size: int = 8):
+        self.reply = reply
+        self.latency = latency
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+        # statuses returned (in order) before requests start succeeding, e.g. [429, 503]
+        self.failures = deque()
+        self.retry_after = None
+        # simulated provider quota: (requests, period seconds) as a token bucket; excess calls get 429
+        self.quota = None
+        self._quota_state = None
+        self.rejected = 0
+        # honour the request's output limit (~4 characters per token), like a real model cut off at max tokens;
+        # Gemini spends `thinking_tokens` of maxOutputTokens first (capped by a non-negative thinkingConfig.thinkingBudget)
+        self.truncate = False
+        self.thinking_tokens = 0
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.bodies = []
+
+    def chunks(self, text: Optional[str] = None):
+        text = self.reply if text is None else text
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def reply_for(self, body: dict) -> str:
+        if not self.truncate:
+            return self.reply
+        config = body.get("generationConfig") or {}
+        limit = body.get("max_tokens") or (body.get("options") or {}).get("num_predict") or config.get("maxOutputTokens")
+        cap = (config.get("thinkingConfig") or {}).get("thinkingBudget", -1)  # -1: dynamic, uncapped
+        thinking = self.thinking_tokens if cap < 0 else min(self.thinking_tokens, cap)
+        if limit is None:
+            return self.reply
+        return self.reply[:max(0, limit - (thinking if config else 0)) * 4]
+
+    def admit(self, body: dict) -> Optional[int]:
+        """Record the call; returns a failure status to send instead of a reply, if one is queued."""
+        with self.lock:
+            self.calls += 1
+            self.bodies.append(body)
+            if self.failures:
+                return self.failures.popleft()
+            if self.quota and not self._take_quota():
+                self.rejected += 1
+                return 429
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return None
+
+    def _take_quota(self) -> bool:
+        requests, period = self.quota
+        now = time.monotonic()
+        level, last = self._quota_state or (requests, now)
+        level = min(requests, level + (now - last) * requests / period)
+        ok = level >= 1
+        self._quota_state = (level - 1 if ok else level, now)
+        return ok
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def _reply_payload(path: str, text: str):
+    if ":generateContent" in path or ":streamGenerateContent" in path:
+        return {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]}
+    if path.endswith("/chat/completions"):
+        return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+    if path.endswith("/api/chat"):
+        return {"message": {"role": "assistant", "content": text}, "done": True}
+    return None
+
+
+def _stream_frame(path: str, text: str, last: bool) -> bytes:
+    if ":streamGenerateContent" in path:
+        frame = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+        return f"data: {json.dumps(frame)}\r\n\r\n".encode()
+    if path.endswith("/chat/completions"):
+        frame = {"choices": [{"index": 0, "delta": {"content": text}}]}
+        out = f"data: {json.dumps(frame)}\n\n"
+        return (out + "data: [DONE]\n\n").encode() if last else out.encode()
+    # Ollama: newline-delimited JSON, final object has done=true
+    out = json.dumps({"message": {"role": "assistant", "content": text}, "done": False}) + "\n"
+    if last:
+        out += json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+    return out.encode()
+
+
+def _make_handler(fake: FakeLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            raw = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            if status == 429 and fake.retry_after is not None:
+                self.send_header("Retry-After", str(fake.retry_after))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            # counters for callers in another process (benchmarks)
+            with fake.lock:
+                stats = {"calls": fake.calls, "max_in_flight": fake.max_in_flight}
+                if urlparse(self.path).query == "reset":
+                    fake.calls = fake.max_in_flight = 0
+            self._send(200, stats)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            path = urlparse(self.path).path
+            if _reply_payload(path, "") is None:
+                return self._send(404, {"error": {"message": path}})
+            failure = fake.admit(body)
+            if failure is not None:
+                return self._send(failure, {"error": {"message": "fake failure"}})
+            try:
+                time.sleep(fake.latency)
+                reply = fake.reply_for(body)
+                chunks = fake.chunks(reply)
+                if ":streamGenerateContent" not in path and not body.get("stream"):
+                    time.sleep(fake.token_latency * len(chunks))
+                    return self._send(200, _reply_payload(path, reply))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream" if "/api/chat" not in path else "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, text in enumerate(chunks):
+                    frame = _stream_frame(path, text, i == len(chunks) - 1)
+                    self.wfile.write(f"{len(frame):x}\r\n".encode() + frame + b"\r\n")
+                    self.wfile.flush()
+                    if i < len(chunks) - 1:
+                        time.sleep(fake.token_latency)
+                self.wfile.write(b"0\r\n\r\n")
+            finally:
+                fake.release()
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # bursts of new connections from the concurrency tests
+
+
+def start_server(fake: FakeLLM):
+    server = _Server(("127.0.0.1", 0), _make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_fake(server, monkeypatch=None, provider: str = "gemini"):
+    """Route email_gen's HTTP providers to the fake (via monkeypatch when given, else permanently)."""
+    from backend.services import email_gen
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    values = {
+        "PROVIDER": provider,
+        "GEMINI_API_BASE": base,
+        "OPENAI_API_BASE": base + "/v1",
+        "OLLAMA_HOST": base,
+        "GEMINI_API_KEY": "fake",
+        "OPENAI_API_KEY": "fake",
+    }
+    for name, value in values.items():
+        if monkeypatch is not None:
+            monkeypatch.setattr(email_gen, name, value)
+        else:
+            setattr(email_gen, name, value)
+
+
+def fake_local_model(model_name: str, threads: int):
+    """
+    Loader for services/local_pool that stands in for a ctransformers model (runs
+    in the worker process). The prompt steers it: "[hang]" never returns,
+    "[crash]" kills the worker, "[whoami]" replies "<model> <threads> <pid>",
+    "[warmed]" the prefix the worker was warmed with; otherwise the reply is
+    DRAFT (continued after the JSON primer, if primed).
+    `delay` is the time per 8-character piece.
+    """
+    warmed = []
+
+    def llm(prompt, stream=False, delay=0.0, **kwargs):
+        if "[hang]" in prompt:
+            threading.Event().wait()
+        if "[crash]" in prompt:
+            os._exit(1)
+        text = json.dumps(DRAFT)
+        if "[whoami]" in prompt:
+            text = f"{model_name} {threads} {os.getpid()}"
+        elif "[warmed]" in prompt:
+            text = "".join(warmed)
+        elif prompt.endswith('{"subject": "'):
+            text = text[len('{"subject": "'):]
+        pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+
+        def generate():
+            for piece in pieces:
+                time.sleep(delay)
+                yield piece
+        return generate() if stream else "".join(generate())
+    llm.warm = warmed.append
+    return llm
@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from sqlalchemy import func
+
+from backend.models.db import Email
+from backend.services.mail_sync import backfill_progress, run_backfill
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+
+def test_backfill_resumes_after_failure(session):
+    fake = FakeGmail(n_messages=1234)
+    # the 6th page fails once, as if the process died there
+    fake.fail_pages = {"500"}
+    server = start_server(fake)
+    try:
+        svc = fake_service(server)
+        state = run_backfill(svc, session, "me@example.com", page_size=100, chunk_size=40)
+        progress = backfill_progress(state)
+        assert progress["status"] == "failed" and progress["resumable"]
+        assert progress["pages"] == 5 and progress["inserted"] == 500
+
+        state = run_backfill(svc, session, "me@example.com", page_size=100, chunk_size=40)
+        progress = backfill_progress(state)
+        assert progress["status"] == "done"
+        assert progress["inserted"] == 1234 and progress["pages"] == 13
+        assert progress["total_estimate"] == 1234
+        # resumed from the saved cursor instead of re-walking pages 0-400
+        assert fake.page_tokens_seen.count("0") == 1
+        assert session.query(func.count(Email.id)).scalar() == 1234
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import generate
+from backend.services import draft_batch, email_gen
+from backend.services.draft_batch import render_template
+from backend.tests.fake_llm import DRAFT
+
+
+@pytest.fixture
+def fake(fake_llm):
+    fake_llm.latency = 0.1
+    return fake_llm
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    with TestClient(app) as client:
+        yield client
+
+
+def batch(client, payload):
+    with client.stream("POST", "/generate/drafts/batch", json=payload) as r:
+        assert r.status_code == 200 and r.headers["content-type"] == "application/x-ndjson"
+        return [json.loads(line) for line in r.iter_lines() if line]
+
+
+def test_render_template():
+    assert render_template("invite {name} to {{team}} day", {"name": "Asha"}) == "invite Asha to {team} day"
+    with pytest.raises(ValueError, match="date"):
+        render_template("meet on {date}", {})
+
+
+def test_template_batch_with_bounded_concurrency(fake, client):
+    names = ["Asha", "Ben", "Chen", "Dara", "Eli", "Femi", "Gus", "Hana"]
+    items = [{"id": f"r{i}", "variables": {"name": n}} for i, n in enumerate(names)]
+    items.append({"id": "broken", "variables": {}})  # no name: fails alone
+    lines = batch(client, {"template": "thank {name} for the quarterly report", "items": items,
+                           "concurrency": 3, "sender_name": "Priya"})
+
+    summary = lines.pop()
+    assert (summary["done"], summary["total"], summary["succeeded"], summary["failed"]) == (True, 9, 8, 1)
+    by_id = {line["id"]: line for line in lines}
+    assert len(by_id) == 9 and sorted(line["index"] for line in lines) == list(range(9))
+    assert not by_id["broken"]["ok"] and "name" in by_id["broken"]["error"]
+    assert all(by_id[f"r{i}"]["draft"]["subject"] == DRAFT["subject"] for i in range(8))
+    assert "Priya" in by_id["r0"]["draft"]["body"] and "raw" not in by_id["r0"]["draft"]
+
+    prompts = " ".join(json.dumps(body) for body in fake.bodies)
+    assert all(f"thank {n} for the quarterly report" in prompts for n in names)
+    assert fake.calls == 8 and fake.max_in_flight == 3
+
+
+def test_failed_item_does_not_fail_the_batch(fake, client, monkeypatch):
+    draft = email_gen.agenerate_email_json_forced
+
+    async def flaky(prompt, **kwargs):
+        if "refund" in prompt:
+            raise RuntimeError("All LLM providers failed")
+        return await draft(prompt, **kwargs)
+
+    monkeypatch.setattr(email_gen, "agenerate_email_json_forced", flaky)
+    lines = batch(client, {"items": [{"prompt": "ask for leave on monday"},
+                                     {"prompt": "process my refund", "length": "short"},
+                                     {"prompt": "say thanks", "target_lang": "hi"}]})
+    results = {line["index"]: line for line in lines[:-1]}
+    assert [results[i]["ok"] for i in range(3)] == [True, False, True] and lines[-1]["failed"] == 1
+    assert results[1]["error"] == "All LLM providers failed"
+    assert (results[0]["draft"]["language"], results[2]["draft"]["language"]) == ("en", "hi")  # per-item overrides
+
+
+def test_rejects_bad_batches(client, monkeypatch):
+    r = client.post("/generate/drafts/batch", json={"items": [{"prompt": "hi"}, {"variables": {"name": "Asha"}}]})
+    assert r.status_code == 422
+    monkeypatch.setattr(draft_batch, "DRAFT_BATCH_MAX_ITEMS", 2)
+    r = client.post("/generate/drafts/batch", json={"items": [{"prompt": "hi"}] * 3})
+    assert r.status_code == 413
@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.db import Base, make_engine
+from backend.routers import generate
+from backend.services import draft_cache, email_gen
+from backend.services.draft_cache import DraftCache
+from backend.tests.fake_llm import DRAFT
+
+REPLY = {"raw": json.dumps(DRAFT), "parsed": DRAFT}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def shared_db():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = make_engine(f"sqlite:///{os.path.join(tmpdir, 'cache.db')}")
+        Base.metadata.create_all(bind=engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+
+
+def test_lru_and_ttl():
+    clock = Clock()
+    cache = DraftCache(max_size=2, ttl=60, session_factory=None, clock=clock)
+    cache.put("a", REPLY)
+    cache.put("b", REPLY)
+    assert cache.get("a") == REPLY  # a is now most recently used
+    cache.put("c", REPLY)
+    assert cache.get("b") is None and cache.get("a") == REPLY and cache.get("c") == REPLY
+
+    assert cache.get("a", mode="refresh") is None  # bypasses the lookup
+    clock.now += 61
+    assert cache.get("a") is None
+    cache.put("d", REPLY, mode="off")
+    assert cache.get("d") is None
+
+    s = cache.stats()
+    assert (s["memory_hits"], s["misses"], s["evictions"], s["expired"], s["bypassed"]) == (3, 3, 1, 1, 1)
+    assert s["entries"] == 1 and s["stores"] == 3 and s["hit_rate"] == 0.5
+
+
+def test_shared_tier_across_workers(shared_db):
+    clock = Clock()
+    worker_a = DraftCache(ttl=60, session_factory=shared_db, clock=clock)
+    worker_b = DraftCache(ttl=60, session_factory=shared_db, clock=clock)
+    worker_a.put("k", REPLY)
+
+    assert worker_b.get("k") == REPLY
+    assert worker_b.get("k") == REPLY
+    assert (worker_b.stats()["shared_hits"], worker_b.stats()["memory_hits"]) == (1, 1)
+
+    # the promoted copy expires with the shared row, not a fresh TTL
+    clock.now += 61
+    assert worker_b.get("k") is None and DraftCache(session_factory=shared_db, clock=clock).get("k") is None
+
+    # every worker storing the same key at once: one upsert each, no conflicts
+    workers = [DraftCache(ttl=60, session_factory=shared_db, clock=clock) for _ in range(8)]
+    threads = [threading.Thread(target=w.put, args=("same", {**REPLY, "n": i})) for i, w in enumerate(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(w.stats()["shared_errors"] for w in workers) == 0
+    assert DraftCache(session_factory=shared_db, clock=clock).get("same")["n"] in range(8)
+
+    # a broken shared tier degrades to memory only
+    broken = DraftCache(session_factory=lambda: 1 / 0, clock=clock)
+    broken.put("x", REPLY)
+    assert broken.get("x") == REPLY and broken.get("y") is None
+    assert broken.stats()["shared_errors"] == 2
+
+
+def test_draft_route_cache(shared_db, fake_llm, monkeypatch):
+    monkeypatch.setattr(draft_cache, "cache", DraftCache(session_factory=shared_db))
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+
+    with TestClient(app) as client:
+        first = client.post("/generate/draft", json={"prompt": "ask for leave on monday", "sender_name": "Asha"}).json()
+        # same request modulo whitespace/case of the weekday, different sender: served from cache
+        again = client.post("/generate/draft", json={"prompt": "  ask for  leave on Monday ", "sender_name": "Ravi"}).json()
+        assert fake_llm.calls == 1 and not first["cached"] and again["cached"]
+        assert again["subject"] == first["subject"] and again["body"].endswith("Regards,\nRavi")
+
+        # other tone: different prompt, different entry
+        client.post("/generate/draft", json={"prompt": "ask for leave on monday", "tone": "casual"})
+        assert fake_llm.calls == 2
+
+        refreshed = client.post("/generate/draft", json={"prompt": "ask for leave on monday", "cache": "refresh"}).json()
+        assert fake_llm.calls == 3 and not refreshed["cached"]
+        client.post("/generate/draft", json={"prompt": "ask for leave on monday"}, headers={"Cache-Control": "no-store"})
+        assert fake_llm.calls == 4
+
+        events = client.post("/generate/draft/stream", json={"prompt": "ask for leave on monday"}).text
+        assert fake_llm.calls == 4 and "event: done" in events and "event: body" not in events
+
+        stats = client.get("/generate/cache").json()
+        assert stats["hits"] == 2 and stats["misses"] == 2 and stats["bypassed"] == 2
+
+        # non-JSON replies are not cached
+        fake_llm.reply = "Subject: Hi\n\nplain text"
+        client.post("/generate/draft", json={"prompt": "say hi"})
+        client.post("/generate/draft", json={"prompt": "say hi"})
+        assert fake_llm.calls == 4 + 4
+
+        fake_llm.reply = json.dumps(DRAFT)
+        assert client.delete("/generate/cache").json() == {"cleared": True}
+        client.post("/generate/draft", json={"prompt": "ask for leave on monday"})
+        assert fake_llm.calls == 9
+
+
+def test_fallback_replies_are_not_cached(fake_llm, monkeypatch):
+    monkeypatch.setattr(email_gen, "GEMINI_API_KEY", "")  # the primary cannot answer
+    monkeypatch.setattr(email_gen, "LLM_FALLBACK_PROVIDERS", ["openai"])
+    monkeypatch.setattr(draft_cache, "cache", DraftCache())
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+
+    with TestClient(app) as client:
+        for _ in range(2):
+            assert not client.post("/generate/draft", json={"prompt": "ask for leave on monday"}).json()["cached"]
+            assert "event: done" in client.post("/generate/draft/stream", json={"prompt": "ask for leave on monday"}).text
+        # keys name the primary provider, so openai's replies are never stored under them
+        assert fake_llm.calls == 4 and draft_cache.cache.stats()["stores"] == 0
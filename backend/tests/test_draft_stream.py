@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import random
+import asyncio
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import generate
+from backend.services import email_gen
+from backend.services.draft_stream import DraftJSONStream
+from backend.tests.fake_llm import DRAFT
+
+TRICKY = ('```json\n{"notes": {"a": [1, "}", {"b": null}]}, "subject": "Caf\\u00e9 \\"plans\\" \\ud83d\\ude00",\n'
+          '  "count": 3, "body": "Hi all,\\n\\nSee you at 10\\\\11.\\tThanks\\/bye"}\n```')
+
+
+def _decode(chunks):
+    parser = DraftJSONStream()
+    fields = {"subject": "", "body": ""}
+    for chunk in chunks:
+        for field, delta in parser.feed(chunk):
+            fields[field] += delta
+    return fields, parser.finished
+
+
+def test_parser_matches_json_for_any_split():
+    expected = json.loads(TRICKY.strip("`json\n"))
+    expected = {"subject": expected["subject"], "body": expected["body"]}
+    assert _decode([TRICKY]) == (expected, True)
+    assert _decode(list(TRICKY)) == (expected, True)  # every escape and surrogate pair split
+    rng = random.Random(7)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(TRICKY)), 12))
+        chunks = [TRICKY[i:j] for i, j in zip([0] + cuts, cuts + [len(TRICKY)])]
+        assert _decode(chunks) == (expected, True)
+
+
+def test_parser_ignores_plain_text():
+    assert _decode(["Subject: Hello\n\nJust checking in."]) == ({"subject": "", "body": ""}, False)
+
+
+def _events(client, payload):
+    events = []
+    with client.stream("POST", "/generate/draft/stream", json=payload) as r:
+        assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+        event = None
+        for line in r.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[6:])))
+    return events
+
+
+@pytest.fixture
+def client(fake_llm):
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("provider", ["gemini", "http", "ollama"])
+def test_stream_forwards_fields_then_final_draft(client, fake_llm, provider):
+    fake_llm.latency, fake_llm.token_latency = 0.05, 0.02
+    fake_llm.use(provider)
+    events = _events(client, {"prompt": "ask for leave on monday", "sender_name": "Asha"})
+
+    names = [e for e, _ in events]
+    assert names[0] == "start" and names[-1] == "done" and "subject" in names and "body" in names
+    streamed = {f: "".join(d["delta"] for e, d in events if e == f) for f in ("subject", "body")}
+    assert streamed == DRAFT
+    final = events[-1][1]
+    assert final["subject"] == DRAFT["subject"] and final["body"].endswith("Regards,\nAsha")
+    # the first token arrives long before the reply is complete
+    assert final["timing"]["first_token_ms"] < final["timing"]["total_ms"] - 150
+    assert fake_llm.calls == 1 and (provider == "gemini" or fake_llm.bodies[0]["stream"] is True)
+
+
+def test_stream_local_model_in_thread(client, monkeypatch):
+    monkeypatch.setattr(email_gen, "PROVIDER", "local")
+    reply = json.dumps(DRAFT)
+    monkeypatch.setattr(email_gen, "stream_local_model", lambda messages, **kw: iter(reply[i:i + 5] for i in range(0, len(reply), 5)))
+    events = _events(client, {"prompt": "ask for leave"})
+    assert "".join(d["delta"] for e, d in events if e == "body") == DRAFT["body"]
+    assert events[-1][0] == "done"
+
+
+def test_stream_non_json_reply_resets_and_retries(client, fake_llm):
+    fake_llm.reply = "Subject: Hello\n\nJust checking in."
+    events = _events(client, {"prompt": "say hello"})
+    assert [e for e, _ in events] == ["start", "reset", "done"]
+    assert events[-1][1]["subject"] == "Hello"
+    assert fake_llm.calls == 2 and "ONLY valid JSON" in json.dumps(fake_llm.bodies[1])
+
+
+def test_stream_failure_becomes_error_event(client, fake_llm, monkeypatch):
+    fake_llm.failures.extend([503] * email_gen.LLM_MAX_RETRIES)
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(email_gen.asyncio, "sleep", lambda delay: real_sleep(0))
+    events = _events(client, {"prompt": "say hello"})
+    assert [e for e, _ in events] == ["start", "error"]
+    assert "after 3 attempts" in events[-1][1]["detail"]
@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.pool import StaticPool
+
+from backend.models.db import Email, _migrate, insert_ignore_emails
+from backend.routers.emails import FOLDERS, encode_cursor, folder_query
+
+USER = "me@example.com"
+
+
+@pytest.fixture
+def session(session):
+    base = datetime(2025, 1, 1)
+    rows = []
+    for u in (USER, "other@example.com"):
+        for i in range(300):
+            rows.append(dict(
+                user_email=u, gmail_id=f"{u}-{i}", from_addr=u if i % 10 == 0 else f"s{i}@example.com",
+                to_addr=u, subject=f"s{i}", snippet="", body_text="", received_at=base + timedelta(minutes=i),
+                is_spam=i % 7 == 0, is_sent=i % 10 == 0, lang="en",
+            ))
+    insert_ignore_emails(session, rows)
+    session.commit()
+    session.execute(text("ANALYZE"))
+    return session
+
+
+def _plan(session, query):
+    sql = str(query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[-1] for row in session.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+def test_folder_queries_use_index(session):
+    cursor = encode_cursor(folder_query(session, "all", USER).offset(100).first())
+    for folder in list(FOLDERS) + ["all"]:
+        for cur in (None, cursor):
+            q = folder_query(session, folder, USER, cur).limit(51)
+            plan = _plan(session, q)
+            expected = "ix_emails_user_received" if folder == "all" else "ix_emails_user_folder_received"
+            assert f"USING INDEX {expected}" in plan, (folder, plan)
+            assert "SCAN emails" not in plan, (folder, plan)
+            assert "TEMP B-TREE" not in plan, (folder, plan)
+
+
+def test_folder_semantics(session):
+    counts = {f: folder_query(session, f, USER).count() for f in ("inbox", "spam", "sent", "all")}
+    assert counts["sent"] == 30
+    assert counts["inbox"] + counts["spam"] + counts["sent"] == counts["all"] == 300
+
+
+def test_migration_backfills_folder():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        # schema as shipped before is_sent/folder existed
+        conn.execute(text(
+            "CREATE TABLE emails (id INTEGER PRIMARY KEY, user_email VARCHAR, gmail_id VARCHAR, from_addr VARCHAR, "
+            "to_addr VARCHAR, subject VARCHAR, snippet TEXT, body_text TEXT, received_at DATETIME, is_spam BOOLEAN, lang VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO emails (user_email, gmail_id, from_addr, is_spam) VALUES "
+            "('me@example.com', 'a', 'Me <ME@example.com>', 0), ('me@example.com', 'b', 'x@y.com', 1), "
+            "('me@example.com', 'c', 'x@y.com', 0), ('me@example.com', 'c', 'x@y.com', 0), ('', 'd', 'x@y.com', 0)"
+        ))
+        _migrate(conn)
+        rows = conn.execute(text("SELECT gmail_id, is_sent, folder FROM emails ORDER BY gmail_id")).fetchall()
+    assert [tuple(r) for r in rows] == [("a", 1, "sent"), ("b", 0, "spam"), ("c", 0, "inbox"), ("d", 0, "inbox")]
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "mysql"])
+def test_insert_ignore_skips_stored_rows(session, monkeypatch, dialect):
+    # mysql: no ON CONFLICT clause, stored pairs are filtered out before the insert
+    monkeypatch.setattr(session.get_bind().dialect, "name", dialect)
+    rows = [dict(user_email=USER, gmail_id=gid, from_addr="a@example.com", to_addr=USER, subject=gid)
+            for gid in (f"{USER}-0", "new-1", "new-2", "new-1")]
+    rows.append(dict(rows[1], user_email="third@example.com"))
+    assert insert_ignore_emails(session, rows) == 3
+    assert insert_ignore_emails(session, rows) == 0
+    assert session.query(Email).filter(Email.gmail_id.like("new-%")).count() == 3
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
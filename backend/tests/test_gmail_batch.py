@@ -0,0 +1,46 @@
+import os
+import sys
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.services import gmail
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+
+def test_fetch_is_batched():
+    fake = FakeGmail(n_messages=120)
+    server = start_server(fake)
+    try:
+        msgs = gmail.fetch_messages(fake_service(server), max_results=120, batch_size=50)
+        assert len(msgs) == 120
+        assert msgs[0]["gmail_id"] == "m00120"
+        assert msgs[0]["body_text"] == "body of m00120"
+        # 1 list call + ceil(120 / 50) batch round trips instead of 120 gets
+        assert fake.calls["list"] == 1
+        assert fake.calls["batch"] == 3
+    finally:
+        server.shutdown()
+
+
+def test_partial_failures():
+    fake = FakeGmail(n_messages=10)
+    fake.missing = {"m00003"}
+    fake.flaky = {"m00005": 1, "m00007": 5}
+    server = start_server(fake)
+    try:
+        svc = fake_service(server)
+        fulls, failed = gmail.get_messages(svc, [f"m{i:05d}" for i in range(1, 11)], batch_size=4, retries=2)
+        ids = [f["id"] for f in fulls]
+        assert "m00005" in ids            # recovered on retry
+        assert "m00003" not in ids        # 404 is permanent, not retried
+        assert sorted(failed) == ["m00003", "m00007"]
+        assert len(fulls) == 8
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
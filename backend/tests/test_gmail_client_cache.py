@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from backend.services import gmail
+
+USER = "me@example.com"
+
+
+@pytest.fixture
+def token_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(gmail, "_tokens_base_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(gmail, "_creds_cache", {})
+    monkeypatch.setattr(gmail, "_local", threading.local())
+    with open(tmp_path / f"token_{USER}.json", "w") as f:
+        json.dump({"token": "t0", "refresh_token": "r", "token_uri": "https://oauth2.example/token",
+                   "client_id": "c", "client_secret": "s", "scopes": ["https://mail.google.com/"]}, f)
+    return tmp_path
+
+
+def test_creds_cached_until_token_file_changes(token_dir):
+    first = gmail.load_creds(USER)
+    assert gmail.load_creds(USER) is first
+
+    path = token_dir / f"token_{USER}.json"
+    data = json.loads(path.read_text())
+    data["token"] = "t-reauth"
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    again = gmail.load_creds(USER)
+    assert again is not first and again.token == "t-reauth"
+
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        gmail.load_creds(USER)
+
+
+def test_concurrent_requests_refresh_once(token_dir, monkeypatch):
+    calls = []
+
+    def fake_refresh(self, request):
+        calls.append(1)
+        time.sleep(0.1)  # slow token endpoint: other threads pile up behind the lock
+        self.token = f"t{len(calls)}"
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    creds = gmail.load_creds(USER)
+    creds.expiry = datetime.utcnow() - timedelta(minutes=1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gmail.load_creds(USER).token)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == ["t1"] * 8
+    assert json.loads((token_dir / f"token_{USER}.json").read_text())["token"] == "t1"
+    # the persisted token does not count as a re-auth
+    assert gmail.load_creds(USER) is creds
+
+
+def test_service_reused_per_thread(token_dir):
+    svc = gmail.user_service(USER)
+    assert gmail.user_service(USER) is svc
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(gmail.user_service(USER)))
+    t.start()
+    t.join()
+    assert other[0] is not svc  # httplib2 transports are not shared across threads
@@ -0,0 +1,59 @@
+import os
+import sys
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.models.db import Email, SyncState
+from backend.services.mail_sync import sync_mailbox
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+
+def test_incremental_after_full(session):
+    fake = FakeGmail(n_messages=20)
+    server = start_server(fake)
+    try:
+        svc = fake_service(server)
+        first = sync_mailbox(svc, session, "me@example.com", max_results=20)
+        assert first["mode"] == "full" and first["inserted"] == 20
+        assert session.get(SyncState, "me@example.com").history_id == "1000"
+
+        # nothing changed: a single history.list call, no list/get traffic
+        calls = dict(fake.calls)
+        idle = sync_mailbox(svc, session, "me@example.com")
+        assert idle["mode"] == "incremental" and idle["inserted"] == 0
+        assert fake.calls["history"] == calls["history"] + 1
+        assert fake.calls["list"] == calls["list"] and fake.calls["batch"] == calls["batch"]
+
+        fake.add_message("new1")
+        fake.add_message("new2")
+        fake.delete_message("new2")
+        fake.delete_message("m00001")
+        res = sync_mailbox(svc, session, "me@example.com")
+        assert res["mode"] == "incremental"
+        assert res["inserted"] == 1 and res["deleted"] == 1
+        ids = {e.gmail_id for e in session.query(Email).all()}
+        assert "new1" in ids and "new2" not in ids and "m00001" not in ids
+        assert session.get(SyncState, "me@example.com").history_id == str(fake.history_id)
+    finally:
+        server.shutdown()
+
+
+def test_expired_history_falls_back_to_full(session):
+    fake = FakeGmail(n_messages=5)
+    server = start_server(fake)
+    try:
+        svc = fake_service(server)
+        sync_mailbox(svc, session, "me@example.com", max_results=5)
+        fake.add_message("late")
+        fake.expire_history()
+        res = sync_mailbox(svc, session, "me@example.com", max_results=5)
+        assert res["mode"] == "full" and res["inserted"] == 1
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,139 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.models.db import Email, SyncState
+from backend.services import gmail, ingest_pipeline
+from backend.services.ingest_pipeline import pipeline_stats, run_pipeline
+from backend.services.mail_sync import backfill_progress, run_backfill, store_messages, sync_mailbox
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+USER = "me@example.com"
+
+
+def test_pipeline_streams_with_bounded_lookahead(session_factory):
+    fake = FakeGmail(n_messages=400)
+    fake.add_message("fr1", subject="Réunion demain", body="Bonjour à tous, la réunion de demain est déplacée à dix heures. Merci de confirmer votre présence.")
+    server = start_server(fake)
+    ids = [m["id"] for m in fake.messages]
+    yielded, lookahead = [0], []
+
+    def feed():
+        for i in range(0, len(ids), 20):
+            yielded[0] += 1
+            yield i // 20, ids[i:i + 20]
+
+    written = []
+
+    def on_batch(batch):
+        written.append(batch.tag)
+        lookahead.append(yielded[0] - len(written))
+        session.commit()
+
+    session = session_factory()
+    # one already stored message is skipped before it is fetched
+    store_messages(session, USER, [gmail.parse_message(fake.messages[-1])])
+    session.commit()
+
+    stats = run_pipeline(fake_service(server), session, USER, feed(), store_messages, on_batch, depth=1)
+    assert written == list(range(len(written))) and len(written) == 21  # feed order kept
+    # fetch can only run a few batches ahead of the writer: 4 queues of depth 1 + one per stage
+    assert max(lookahead) <= 9
+    s = stats.as_dict()
+    assert s["skipped"] == 1 and s["stages"]["fetch"]["items"] == 400
+    assert all(s["stages"][st]["items"] == 400 for st in ingest_pipeline.STAGES)
+    assert session.query(Email).count() == 401
+    assert session.query(Email).filter_by(gmail_id="fr1").one().lang == "fr"
+    assert pipeline_stats()["last_run"]["stages"]["write"]["items"] == 400
+
+
+def test_stage_failure_keeps_earlier_batches(session_factory):
+    fake = FakeGmail(n_messages=100)
+    server = start_server(fake)
+    ids = [m["id"] for m in fake.messages]
+
+    def feed():
+        for i in range(0, 60, 20):
+            yield i, ids[i:i + 20]
+        raise RuntimeError("listing failed")
+
+    session = session_factory()
+    done = []
+
+    def on_batch(batch):
+        done.append(batch.tag)
+        session.commit()
+
+    with pytest.raises(RuntimeError, match="listing failed"):
+        run_pipeline(fake_service(server), session, USER, feed(), store_messages, on_batch)
+    assert done == [0, 20, 40]
+    assert session.query(Email).count() == 60
+
+
+def test_store_failure_stops_pipeline(session_factory):
+    fake = FakeGmail(n_messages=200)
+    server = start_server(fake)
+    ids = [m["id"] for m in fake.messages]
+    session = session_factory()
+
+    def broken_store(session, user_email, msgs):
+        raise ValueError("disk full")
+
+    feed = ((i, ids[i:i + 10]) for i in range(0, len(ids), 10))
+    with pytest.raises(ValueError, match="disk full"):
+        run_pipeline(fake_service(server), session, USER, feed, broken_store, depth=1)
+    assert next(feed, None) is not None  # the feed was not drained after the failure
+
+
+def test_stage_failure_stops_fetching(session_factory, monkeypatch):
+    fake = FakeGmail(n_messages=200)
+    server = start_server(fake)
+    ids = [m["id"] for m in fake.messages]
+    session = session_factory()
+    lang_of = ingest_pipeline._lang_of
+
+    def broken_lang(m):
+        if m["gmail_id"] == ids[25]:
+            raise RuntimeError("langdetect crashed")
+        return lang_of(m)
+
+    monkeypatch.setattr(ingest_pipeline, "_lang_of", broken_lang)
+    done = []
+    feed = ((i, ids[i:i + 10]) for i in range(0, len(ids), 10))
+    with ThreadPoolExecutor(2) as executor, pytest.raises(RuntimeError, match="langdetect"):
+        run_pipeline(fake_service(server), session, USER, feed, store_messages,
+                     lambda batch: done.append(batch.tag), executor=executor, depth=1)
+    assert done == [0, 10]  # batches ahead of the failing one are stored
+    assert next(feed, None) is not None  # fetch stopped instead of downloading the rest
+    assert fake.calls["batch"] < 15
+
+
+def test_malformed_messages_are_skipped(session):
+    fake = FakeGmail(n_messages=30)
+    del fake.messages[3]["payload"]["headers"]  # parse_message raises KeyError on this one
+    bad = fake.messages[3]["id"]
+    server = start_server(fake)
+    svc = fake_service(server)
+
+    res = sync_mailbox(svc, session, USER, max_results=30)
+    assert res["inserted"] == 29 and res["malformed"] == 1 and res["failed"] == 0
+    assert res["pipeline"]["malformed"] == 1
+    assert session.get(SyncState, USER).history_id == str(fake.history_id)
+
+    fake.add_message("new1")
+    fake.messages[0]["payload"].pop("headers")
+    res = sync_mailbox(svc, session, USER)
+    # permanent: the checkpoint still advances so the next sync does not retry it forever
+    assert res["mode"] == "incremental" and res["malformed"] == 1
+    assert session.get(SyncState, USER).history_id == str(fake.history_id)
+
+    state = run_backfill(svc, session, USER, page_size=10, chunk_size=5)
+    progress = backfill_progress(state)
+    assert progress["status"] == "done" and progress["pages"] == 4 and not progress["resumable"]
+    assert progress["failed"] == 2 and progress["inserted"] == 0  # the rest was stored by the syncs
+    assert session.query(Email).filter(Email.gmail_id.in_([bad, "new1"])).count() == 0
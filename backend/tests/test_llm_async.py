@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import asyncio
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import generate
+from backend.services import email_gen
+
+
+def test_async_draft_matches_sync(fake_llm):
+    expected = email_gen.generate_email_json_forced("ask for leave on monday", sender_name="Asha")
+    out = asyncio.run(email_gen.agenerate_email_json_forced("ask for leave on monday", sender_name="Asha"))
+    assert out == expected
+    assert out["subject"] == "Leave request for Monday" and out["body"].endswith("Regards,\nAsha")
+    assert fake_llm.bodies[0] == fake_llm.bodies[1]
+
+
+@pytest.mark.parametrize("provider", ["gemini", "http", "ollama"])
+def test_concurrent_drafts_share_client_under_limit(fake_llm, monkeypatch, provider):
+    monkeypatch.setattr(email_gen, "PROVIDER", provider)
+    monkeypatch.setattr(email_gen, "LLM_MAX_CONCURRENCY", 3)
+    fake_llm.latency = 0.1
+
+    async def run():
+        outs = await asyncio.gather(*[email_gen.agenerate_email_json_forced(f"thank the team {i}") for i in range(9)])
+        client = email_gen._aclient()[0]
+        await email_gen.aclose_llm_client()
+        return outs, client
+
+    start = time.perf_counter()
+    outs, client = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    assert all(o["subject"] == "Leave request for Monday" for o in outs)
+    assert fake_llm.max_in_flight == 3
+    assert elapsed < 0.9 * 9 * fake_llm.latency  # overlapped in waves of 3, not one at a time
+    assert client.is_closed and email_gen._aclients == {}
+
+
+def test_retries_honour_retry_after_without_blocking(fake_llm, monkeypatch):
+    fake_llm.failures.extend([429, 503])
+    fake_llm.retry_after = 0
+    slept = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(email_gen.asyncio, "sleep", fake_sleep)
+    out = asyncio.run(email_gen.agenerate_email_json_forced("ask for leave"))
+    assert out["subject"] == "Leave request for Monday"
+    assert fake_llm.calls == 3 and slept == [0.0, 2]
+
+    fake_llm.failures.extend([500] * email_gen.LLM_MAX_RETRIES)
+    with pytest.raises(RuntimeError, match="after 3 attempts"):
+        asyncio.run(email_gen.agenerate_email_json_forced("ask for leave"))
+
+
+def test_draft_route_is_async(fake_llm):
+    fake_llm.reply = "Subject: Hello\n\nJust checking in."  # not JSON: retried once, then fallback parse
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    with TestClient(app) as client:
+        r = client.post("/generate/draft", json={"prompt": "say hello"})
+    assert r.status_code == 200 and r.json()["subject"] == "Hello"
+    assert fake_llm.calls == 2
+    assert "ONLY valid JSON" in json.dumps(fake_llm.bodies[1])
@@ -0,0 +1,200 @@
+import os
+import sys
+import time
+import asyncio
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import generate
+from backend.services import email_gen, llm_router
+from backend.services.llm_router import AllProvidersFailed, LLMRouter
+from backend.services.singleflight import AsyncSingleFlight, SingleFlight
+from backend.tests.fake_llm import FakeLLM, start_server
+
+MESSAGES = [{"role": "user", "content": "ask for leave on monday"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fakes(fake_llm, monkeypatch):
+    """Gemini primary and OpenAI-over-HTTP fallback, each on its own fake server."""
+    fallback = FakeLLM()
+    server = start_server(fallback)
+    monkeypatch.setattr(email_gen, "OPENAI_API_BASE", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(email_gen, "LLM_FALLBACK_PROVIDERS", ["http"])
+    monkeypatch.setattr(email_gen, "_flights", SingleFlight())
+    monkeypatch.setattr(email_gen, "_aflights", AsyncSingleFlight())
+    monkeypatch.setattr(llm_router, "router", LLMRouter(timeout=5))
+    yield fake_llm, fallback
+    server.shutdown()
+    server.server_close()
+
+
+def test_circuit_breaker():
+    clock = Clock()
+    router = LLMRouter(breaker_failures=2, breaker_cooldown=10, clock=clock)
+    calls = []
+
+    def call(provider):
+        calls.append(provider)
+        if provider == "gemini":
+            raise RuntimeError("quota exhausted")
+        return provider
+
+    assert [router.call(["gemini", "ollama"], call) for _ in range(3)] == ["ollama"] * 3
+    assert calls == ["gemini", "ollama", "gemini", "ollama", "ollama"]  # open after two failures
+    assert router.stats()["providers"]["gemini"]["breaker"] == "open"
+
+    # after the cooldown one trial goes through; failing it re-opens the circuit
+    clock.now = 11
+    router.call(["gemini", "ollama"], call)
+    assert calls[-2:] == ["gemini", "ollama"] and router.stats()["providers"]["gemini"]["breaker"] == "open"
+    clock.now = 22
+    assert router.call(["gemini"], lambda p: "ok") == "ok"
+    assert router.stats()["providers"]["gemini"]["breaker"] == "closed"
+
+    # a pool of one surfaces the provider's own error, until the circuit opens
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="quota exhausted"):
+            router.call(["gemini"], call)
+    with pytest.raises(AllProvidersFailed, match="circuit open"):
+        router.call(["gemini"], call)
+    assert router.stats()["providers"]["gemini"]["skipped_open"] == 2
+
+
+def test_failover_and_provider_stats(fakes):
+    primary, fallback = fakes
+    primary.failures.append(400)  # not retried
+
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    with TestClient(app) as client:
+        out = client.post("/generate/draft", json={"prompt": "ask for leave on monday"}).json()
+        stats = client.get("/generate/providers").json()
+
+    assert "Leave request" in out["subject"] and (primary.calls, fallback.calls) == (1, 1)
+    assert fallback.bodies[0]["model"] == email_gen.PROVIDER_MODELS["http"]  # not the Gemini model name
+    assert stats["pool"] == ["gemini", "http"]
+    # a rejected request says nothing about gemini's health: failed over, but not held against its breaker
+    assert stats["providers"]["gemini"]["failures"] == 0 and stats["providers"]["gemini"]["client_errors"] == 1
+    assert stats["providers"]["http"]["successes"] == 1
+    assert sum(stats["providers"]["http"]["latency_histogram"].values()) == 1
+    decision = stats["recent_decisions"][-1]
+    assert decision["provider"] == "http" and "400" in decision["failed"]["gemini"]
+
+
+def test_timeout_fails_over(fakes, monkeypatch):
+    primary, fallback = fakes
+    primary.latency = 2
+    monkeypatch.setattr(llm_router, "router", LLMRouter(timeout=0.3))
+
+    start = time.perf_counter()
+    assert "Leave request" in asyncio.run(email_gen.allm_chat(MESSAGES))
+    assert time.perf_counter() - start < 1.5
+    assert llm_router.router.stats()["providers"]["gemini"]["timeouts"] == 1
+
+
+def test_sync_timeout_fails_over(fakes, monkeypatch):
+    primary, fallback = fakes
+    primary.latency = 2
+    monkeypatch.setattr(llm_router, "router", LLMRouter(timeout=0.3))
+
+    start = time.perf_counter()
+    assert "Leave request" in email_gen.llm_chat(MESSAGES)
+    assert time.perf_counter() - start < 1.5
+    assert llm_router.router.stats()["providers"]["gemini"]["timeouts"] == 1
+
+
+def test_config_and_request_errors_keep_breaker_closed(fakes, monkeypatch):
+    primary, fallback = fakes
+    router = LLMRouter(timeout=5, breaker_failures=2)
+    monkeypatch.setattr(llm_router, "router", router)
+    monkeypatch.setattr(email_gen, "GEMINI_API_KEY", "")
+    for _ in range(3):
+        assert "Leave request" in asyncio.run(email_gen.allm_chat(MESSAGES))
+        assert "Leave request" in email_gen.llm_chat(MESSAGES, temperature=0.3)
+
+    monkeypatch.setattr(email_gen, "GEMINI_API_KEY", "fake")
+    primary.failures.extend([404] * 3)
+    for _ in range(3):
+        assert "Leave request" in email_gen.llm_chat(MESSAGES, temperature=0.5)
+    gemini = router.stats()["providers"]["gemini"]
+    assert (gemini["breaker"], gemini["failures"], gemini["client_errors"]) == ("closed", 0, 9)
+
+    primary.failures.extend([503] * 9)  # an outage still opens it
+    for _ in range(2):
+        asyncio.run(email_gen.allm_chat(MESSAGES, temperature=0.7))
+    assert router.stats()["providers"]["gemini"]["breaker"] == "open"
+
+
+def test_hedge_after_p95(fakes, monkeypatch):
+    primary, fallback = fakes
+    router = LLMRouter(timeout=5, hedge=True, hedge_min_samples=3)
+    monkeypatch.setattr(llm_router, "router", router)
+
+    async def run(n):
+        return [await email_gen.allm_chat(MESSAGES, temperature=0.1 * i) for i in range(n)]
+
+    primary.latency = 0.05
+    asyncio.run(run(3))  # learn gemini's usual latency; too few samples to hedge before this
+    assert fallback.calls == 0
+
+    primary.latency = 1.5  # slows down
+    start = time.perf_counter()
+    asyncio.run(run(1))
+    assert time.perf_counter() - start < 1.0 and fallback.calls == 1
+    s = router.stats()["providers"]
+    assert s["http"]["hedges_started"] == 1 and s["http"]["hedges_won"] == 1
+    assert s["gemini"]["cancelled"] == 1 and s["gemini"]["failures"] == 0  # the loser is not held against it
+
+
+def test_stream_fails_over_before_first_token(fakes):
+    primary, fallback = fakes
+    primary.failures.append(400)
+
+    async def run():
+        return "".join([piece async for piece in email_gen.allm_stream(MESSAGES)])
+
+    assert "Leave request" in asyncio.run(run())
+    assert (primary.calls, fallback.calls) == (1, 1)
+    assert llm_router.router.decisions[-1]["provider"] == "http"
+
+
+def test_abandoned_stream_frees_the_trial_slot():
+    clock = Clock()
+    router = LLMRouter(breaker_failures=1, breaker_cooldown=10, clock=clock)
+
+    async def stream(provider):
+        for piece in ("Dear", " team", ","):
+            yield piece
+
+    async def broken(provider):
+        raise RuntimeError("down")
+        yield
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async for _ in router.astream(["a"], broken):
+                pass
+        clock.now = 11
+        # half-open trial: the reader takes one piece and goes away
+        it = router.astream(["a"], stream)
+        assert await it.__anext__() == "Dear"
+        await it.aclose()
+        return "".join([piece async for piece in router.astream(["a"], stream)])
+
+    assert asyncio.run(run()) == "Dear team,"
+    s = router.stats()["providers"]["a"]
+    assert s["cancelled"] == 1 and s["breaker"] == "closed"
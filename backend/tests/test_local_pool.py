@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.services import email_gen, local_pool
+from backend.services.local_pool import LocalModelPool, LocalModelTimeout, LocalPoolBusy
+from backend.tests.fake_llm import DRAFT, fake_local_model
+
+MESSAGES = [{"role": "user", "content": "ask for leave on monday"}]
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    pools = []
+
+    def make(**kwargs):
+        pool = LocalModelPool(**{"workers": 1, "threads": 2, "timeout": 5, "loader": fake_local_model, **kwargs})
+        pool.start("tinyllama")
+        monkeypatch.setattr(local_pool, "pool", pool)
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.stop()
+
+
+def whoami(pool):
+    model, threads, pid = pool.generate("tinyllama", "[whoami]").split()
+    return model, int(threads), int(pid)
+
+
+def test_generation_runs_in_worker_processes(make_pool):
+    pool = make_pool(workers=2, threads=3)
+    raw = email_gen.call_local_model(MESSAGES, schema=email_gen.DRAFT_SCHEMA)
+    assert json.loads(raw) == DRAFT
+    assert json.loads("".join(email_gen.stream_local_model(MESSAGES, schema=email_gen.DRAFT_SCHEMA))) == DRAFT
+
+    model, threads, pid = whoami(pool)
+    assert (model, threads) == ("tinyllama", 3) and pid != os.getpid()
+
+    pids = set()
+    threads = [threading.Thread(target=lambda: pids.add(whoami(pool)[2])) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 1 <= len(pids) <= 2  # never more processes than workers: one model per process
+
+    stats = pool.stats()
+    assert (stats["workers"], stats["alive"], stats["busy"], stats["queued"]) == (2, 2, 0, 0)
+    assert stats["completed"] == stats["requests"] == 9 and stats["generation"]["p95_ms"] is not None
+
+
+def test_hung_worker_is_killed_and_replaced(make_pool):
+    pool = make_pool(timeout=0.5)
+    before = whoami(pool)[2]
+    start = time.perf_counter()
+    with pytest.raises(LocalModelTimeout):
+        pool.generate("tinyllama", "[hang]")
+    assert time.perf_counter() - start < 2
+
+    after = whoami(pool)[2]  # a fresh worker serves the next request
+    assert after != before
+    with pytest.raises(RuntimeError, match="exited"):
+        pool.generate("tinyllama", "[crash]")
+    assert whoami(pool)[2] not in (before, after)
+    stats = pool.stats()
+    assert (stats["timeouts"], stats["errors"], stats["respawns"], stats["alive"]) == (1, 1, 2, 1)
+
+
+def test_queue_is_bounded(make_pool):
+    pool = make_pool(max_queue=1)
+    results = []
+
+    def slow():
+        results.append(pool.generate("tinyllama", "draft", delay=0.05))
+
+    running = threading.Thread(target=slow)
+    running.start()
+    time.sleep(0.2)  # holds the only worker for ~0.5 s
+    waiting = threading.Thread(target=slow)
+    waiting.start()
+    time.sleep(0.1)
+    assert pool.stats()["queued"] == 1
+    with pytest.raises(LocalPoolBusy):
+        pool.generate("tinyllama", "draft")
+    running.join()
+    waiting.join()
+
+    assert results == [json.dumps(DRAFT)] * 2
+    stats = pool.stats()
+    assert (stats["rejected"], stats["max_queued"]) == (1, 1)
+    assert stats["queue_wait"]["p95_ms"] > 100
+
+
+def test_abandoned_stream_frees_the_worker(make_pool):
+    pool = make_pool()
+    pid = whoami(pool)[2]
+    pieces = pool.stream("tinyllama", "draft", delay=0.05)
+    assert next(pieces) == json.dumps(DRAFT)[:8]
+    pieces.close()  # reader went away: the generation stops, the worker stays
+    assert pool.stats()["busy"] == 0
+    assert whoami(pool)[2] == pid and pool.stats()["respawns"] == 0
+
+
+def test_workers_are_warmed_with_the_shared_prefix(monkeypatch):
+    for model in ("tinyllama", "mistral"):
+        prefix = email_gen.local_prompt_prefix(model)
+        for lang in ("en", "hi"):
+            messages, _ = email_gen.build_draft_messages("thank the team for the launch", target_lang=lang)
+            assert email_gen._local_prompt(messages, model).startswith(email_gen.local_prompt_prefix(model, lang))
+        assert prefix.endswith("<|user|>\n" if model == "tinyllama" else "English only.\n\n")
+
+    monkeypatch.setattr(email_gen, "LLM_FALLBACK_PROVIDERS", ["local"])
+    monkeypatch.setattr(local_pool, "pool", LocalModelPool(workers=1, timeout=0.5, loader=fake_local_model))
+    email_gen.start_local_pool()  # app startup: "local" is in the provider pool
+    pool = local_pool.pool
+    try:
+        assert pool.generate("tinyllama", "[warmed]") == email_gen.local_prompt_prefix("tinyllama")
+        with pytest.raises(LocalModelTimeout):
+            pool.generate("tinyllama", "[hang]")
+        assert pool.generate("tinyllama", "[warmed]") == email_gen.local_prompt_prefix("tinyllama")  # the replacement too
+    finally:
+        pool.stop()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.services import email_gen, rate_limit
+from backend.services.rate_limit import Limit, RateLimiter, parse_limits
+
+MESSAGES = [{"role": "user", "content": "ask for leave on monday"}]
+
+
+@pytest.fixture
+def fake(fake_llm):
+    fake_llm.latency = 0.05
+    return fake_llm
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield os.path.join(tmpdir, "ratelimit.db")
+
+
+def burst(n):
+    async def run():
+        calls = [email_gen.allm_chat(MESSAGES, temperature=i / 100) for i in range(n)]  # distinct: no coalescing
+        return await asyncio.gather(*calls, return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_parse_limits():
+    limits = parse_limits("gemini=10/250000, gemini:gemini-2.5-pro=5 ,openai=500")
+    assert (limits["gemini"].requests, limits["gemini"].tokens) == (10, 250000)
+    limiter = RateLimiter(limits)
+    assert limiter.limit_for("gemini", "gemini-2.5-pro")[0] == "gemini:gemini-2.5-pro"
+    assert limiter.limit_for("gemini", "gemini-2.5-flash")[0] == "gemini"
+    assert limiter.limit_for("ollama", "llama2") == (None, None)
+    assert limiter.acquire("ollama", "llama2", 10_000) == 0.0  # unlimited: the database is not touched
+    assert limiter._conn is None
+
+
+def test_calls_queue_for_capacity_instead_of_429(fake, db_path, monkeypatch):
+    """The simulated provider allows 3 requests per second."""
+    fake.quota, fake.retry_after = (3, 1.0), 0.2
+
+    # unthrottled: the burst runs into the quota
+    monkeypatch.setattr(rate_limit, "limiter", RateLimiter({}))
+    burst(9)
+    assert fake.rejected > 0
+
+    fake._quota_state, fake.rejected = None, 0  # provider quota back to full
+    # configured a little under the quota, as in production: requests reach the provider with some jitter
+    limiter = RateLimiter({"gemini": Limit(requests=3, period=1.25)}, path=db_path)
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    start = time.perf_counter()
+    outs = burst(9)
+    elapsed = time.perf_counter() - start
+    assert all(isinstance(o, str) for o in outs)
+    assert fake.rejected == 0
+    assert elapsed >= 2.4  # 3 at once, then one every 0.42 s
+    assert limiter.stats()["acquired"] == 9 and limiter.stats()["waited"] == 6
+
+
+def test_token_budget(db_path):
+    limiter = RateLimiter({"openai": Limit(tokens=1000, period=1.0)}, path=db_path)
+
+    async def run():
+        return [await limiter.aacquire("openai", "gpt-4o-mini", 400) for _ in range(3)]
+
+    waits = asyncio.run(run())
+    assert waits[:2] == [0.0, 0.0] and 0.1 < waits[2] < 0.4  # 200 tokens left, 200 more take 0.2 s
+
+
+def test_budget_shared_between_workers(db_path):
+    """Two limiters on one file stand in for two worker processes."""
+    workers = [RateLimiter({"gemini": Limit(requests=4, period=1.0)}, path=db_path) for _ in range(2)]
+    granted = []
+
+    def worker(limiter):
+        async def run():
+            for _ in range(4):
+                await limiter.aacquire("gemini", "gemini-2.5-flash")
+                granted.append(time.perf_counter())
+        asyncio.run(run())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 8 calls against one budget of 4/s: the last four wait for refill
+    assert len(granted) == 8
+    assert max(granted) - start >= 0.9
+    assert sum(w.counts["waited"] for w in workers) == 4
+
+
+def test_retry_after_holds_every_caller(fake, db_path, monkeypatch):
+    fake.failures.append(429)
+    fake.retry_after = 1
+    first = RateLimiter({"gemini": Limit(requests=100)}, path=db_path)
+    second = RateLimiter({"gemini": Limit(requests=100)}, path=db_path)  # another worker
+    penalized_on = []
+    penalize = first.penalize
+
+    def recording(*args):
+        penalized_on.append(threading.current_thread())
+        return penalize(*args)
+
+    monkeypatch.setattr(first, "penalize", recording)
+
+    async def run():
+        monkeypatch.setattr(rate_limit, "limiter", first)
+        a = asyncio.ensure_future(email_gen.allm_chat(MESSAGES))
+        await asyncio.sleep(0.3)  # a has been told to retry after 1 s
+        monkeypatch.setattr(rate_limit, "limiter", second)
+        start = time.perf_counter()
+        await email_gen.allm_chat(MESSAGES, temperature=0.5)
+        return time.perf_counter() - start, await a
+
+    waited, _ = asyncio.run(run())
+    assert first.counts["penalties"] == 1
+    assert penalized_on and threading.main_thread() not in penalized_on  # the SQLite write stays off the loop
+    assert second.counts["waited"] >= 1 and waited >= 0.5
+    assert fake.calls == 3
@@ -0,0 +1,74 @@
+import os
+import sys
+from datetime import datetime
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+from backend.models.db import Email, insert_ignore_emails, setup_fts
+from backend.routers.emails import fts_query, search_emails
+
+USER = "me@example.com"
+
+
+@pytest.fixture
+def session(session):
+    with session.bind.begin() as conn:
+        assert setup_fts(conn)
+    rows = [
+        dict(user_email=USER, gmail_id="a", from_addr="boss@corp.com", to_addr=USER, subject="Quarterly report",
+             body_text="Please review the numbers.", is_spam=False),
+        dict(user_email=USER, gmail_id="b", from_addr="alice@corp.com", to_addr=USER, subject="Lunch",
+             body_text="Bring the quarterly report to lunch.", is_spam=False),
+        dict(user_email=USER, gmail_id="c", from_addr="lotto@scam.com", to_addr=USER, subject="Report your prize",
+             body_text="Claim now", is_spam=True),
+        dict(user_email="other@example.com", gmail_id="d", from_addr="x@corp.com", to_addr="other@example.com",
+             subject="Quarterly report", body_text="", is_spam=False),
+    ]
+    for r in rows:
+        r.update(snippet=r["body_text"][:40], received_at=datetime(2025, 1, 1), lang="en")
+    insert_ignore_emails(session, rows)
+    session.commit()
+    return session
+
+
+def _search(session, q, **kw):
+    kw.setdefault("user_email", USER)
+    kw.setdefault("folder", "all")
+    kw.setdefault("limit", 20)
+    kw.setdefault("offset", 0)
+    return search_emails(q=q, session=session, **kw)
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query('quarterly rep') == '"quarterly" "rep"*'
+    assert fts_query('a" OR NEAR(') == '"a""" "OR" "NEAR("*'
+    assert fts_query("   ") == ""
+
+
+def test_search_ranks_subject_matches_first(session):
+    page = _search(session, "quarterly report")
+    assert [h["gmail_id"] for h in page["items"]] == ["a", "b"]
+    assert "<mark>" in page["items"][0]["subject_highlight"]
+    assert "<mark>" in page["items"][1]["highlight"]
+
+
+def test_search_filters_and_pages(session):
+    assert [h["gmail_id"] for h in _search(session, "report", folder="spam")["items"]] == ["c"]
+    first = _search(session, "report", limit=1)
+    assert first["next_offset"] == 1
+    rest = _search(session, "report", limit=5, offset=first["next_offset"])
+    assert rest["next_offset"] is None
+    assert len(first["items"]) + len(rest["items"]) == 3
+
+
+def test_index_follows_updates_and_deletes(session):
+    em = session.query(Email).filter_by(gmail_id="b").one()
+    em.body_text = "Nothing to see"
+    session.commit()
+    assert [h["gmail_id"] for h in _search(session, "quarterly")["items"]] == ["a"]
+    session.delete(session.query(Email).filter_by(gmail_id="a").one())
+    session.commit()
+    assert _search(session, "quarterly")["items"] == []
@@ -0,0 +1,87 @@
+import os
+import sys
+import asyncio
+import threading
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+import pytest
+
+from backend.services import email_gen
+from backend.services.singleflight import AsyncSingleFlight, SingleFlight
+
+N = 12
+MESSAGES = [{"role": "user", "content": "ask for leave on monday"}]
+
+
+@pytest.fixture
+def fake(fake_llm, monkeypatch):
+    fake_llm.latency = 0.3
+    monkeypatch.setattr(email_gen, "_flights", SingleFlight())
+    monkeypatch.setattr(email_gen, "_aflights", AsyncSingleFlight())
+    return fake_llm
+
+
+def test_threads_share_one_provider_call(fake):
+    barrier = threading.Barrier(N)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(email_gen.llm_chat(MESSAGES, model="gemini-2.5-flash"))
+
+    threads = [threading.Thread(target=worker) for _ in range(N)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake.calls == 1 and len(results) == N and len(set(results)) == 1
+    assert email_gen._flights.stats() == {"leaders": 1, "coalesced": N - 1, "timeouts": 0, "in_flight": 0}
+
+    # once finished nothing is remembered: the next call goes upstream again
+    email_gen.llm_chat(MESSAGES, model="gemini-2.5-flash")
+    assert fake.calls == 2
+
+
+def test_concurrent_drafts_share_one_provider_call(fake):
+    async def run():
+        same = [email_gen.agenerate_email_json_forced("ask for leave on monday") for _ in range(N)]
+        other = email_gen.agenerate_email_json_forced("thank the team")
+        return await asyncio.gather(*same, other)
+
+    outs = asyncio.run(run())
+    assert fake.calls == 2  # one per distinct prompt
+    assert all(o == outs[0] for o in outs[:N])
+    s = email_gen.llm_flight_stats()["async"]
+    assert (s["leaders"], s["coalesced"], s["in_flight"]) == (2, N - 1, 0)
+
+
+def test_error_reaches_every_waiter(fake):
+    fake.failures.append(400)  # not retried
+
+    async def run():
+        return await asyncio.gather(*[email_gen.allm_chat(MESSAGES) for _ in range(N)], return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert fake.calls == 1
+    assert all(isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 400 for e in errors)
+
+
+def test_waiter_timeout_and_leader_cancellation(fake, monkeypatch):
+    async def run():
+        leader = asyncio.create_task(email_gen.allm_chat(MESSAGES))
+        await asyncio.sleep(0.05)
+        monkeypatch.setattr(email_gen, "LLM_SINGLEFLIGHT_TIMEOUT", 0.05)
+        with pytest.raises(TimeoutError, match="in-flight"):
+            await email_gen.allm_chat(MESSAGES)
+        monkeypatch.setattr(email_gen, "LLM_SINGLEFLIGHT_TIMEOUT", 5)
+        waiter = asyncio.create_task(email_gen.allm_chat(MESSAGES))
+        await asyncio.sleep(0.05)
+        leader.cancel()  # e.g. the first client disconnected
+        return await waiter
+
+    assert "Leave request" in asyncio.run(run())
+    assert fake.calls == 1
+    assert email_gen._aflights.stats()["timeouts"] == 1
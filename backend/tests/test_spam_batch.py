@@ -0,0 +1,41 @@
+import os
+import sys
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.svm import LinearSVC
+
+from backend.services import nlp
+
+HAM = ["Please find the quarterly report attached.", "Can we schedule a call on Friday?", "Thanks, noted."]
+SPAM = ["You WIN MONEY! Claim your urgent reward", "100% free casino bonus, lottery win money", "Crypto double now"]
+TEXTS = HAM + SPAM + ["", "Re: the Casino night budget", "report attached, win money"]
+
+
+def test_rule_fallback_batch_matches_per_item(monkeypatch):
+    monkeypatch.setattr(nlp, "load_spam_model", lambda: None)
+    labels, scores = nlp.predict_spam_batch(TEXTS)
+    assert labels == [nlp.predict_spam(t) for t in TEXTS]
+    assert [sc > 0 for sc in scores] == labels
+    assert nlp.predict_spam_batch([]) == ([], [])
+
+
+@pytest.mark.parametrize("estimator", [LinearSVC, LogisticRegression])
+def test_model_batch_matches_per_item(monkeypatch, estimator):
+    # same pipeline shape as scripts/train_spam.py; LogisticRegression takes the predict_proba path
+    clf = Pipeline([("tfidf", TfidfVectorizer(ngram_range=(1, 2))), ("clf", estimator())])
+    clf.fit(HAM * 3 + SPAM * 3, [0] * 9 + [1] * 9)
+    monkeypatch.setattr(nlp, "_spam_model", clf)
+    labels, scores = nlp.predict_spam_batch(TEXTS)
+    assert labels == [nlp.predict_spam(t) for t in TEXTS]
+    assert any(labels) and not all(labels) and len(scores) == len(TEXTS)
+    assert nlp.predict_spam_batch([]) == ([], [])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import generate
+from backend.services import email_gen, local_pool
+from backend.services.json_repair import repair_draft_json
+from backend.tests.fake_llm import DRAFT
+
+
+@pytest.fixture
+def fake(fake_llm, monkeypatch):
+    monkeypatch.setattr(email_gen, "_draft_counts", dict.fromkeys(email_gen._draft_counts, 0))
+    return fake_llm
+
+
+def draft(**kwargs):
+    return asyncio.run(email_gen.agenerate_email_json_forced("ask for leave on monday", **kwargs))
+
+
+def test_native_json_mode_per_provider(fake, monkeypatch):
+    draft()
+    config = fake.bodies[-1]["generationConfig"]
+    assert config["responseMimeType"] == "application/json"
+    assert config["responseSchema"]["propertyOrdering"] == ["subject", "body"]
+    assert config["responseSchema"]["properties"]["body"]["type"] == "string"
+    assert "additionalProperties" not in config["responseSchema"]  # not part of Gemini's schema subset
+
+    fake.use("http")
+    draft(model="gpt-4o-mini")
+    fmt = fake.bodies[-1]["response_format"]
+    assert fmt["type"] == "json_schema" and fmt["json_schema"]["strict"] and fmt["json_schema"]["schema"] == email_gen.DRAFT_SCHEMA
+    draft(model="gpt-3.5-turbo")
+    assert fake.bodies[-1]["response_format"] == {"type": "json_object"}  # JSON mode only on older models
+
+    fake.use("ollama")
+    draft(model="llama2")
+    assert fake.bodies[-1]["format"] == "json"
+
+    monkeypatch.setattr(email_gen, "LLM_STRUCTURED_OUTPUT", False)
+    draft(model="llama2")
+    assert "format" not in fake.bodies[-1]
+
+
+def test_local_model_is_primed(monkeypatch):
+    prompts = []
+
+    def llm(prompt, **kwargs):
+        prompts.append(prompt)
+        return 'Leave on Monday", "body": "Dear team,\\n\\nI will be out."}'
+
+    monkeypatch.setattr(local_pool, "pool", SimpleNamespace(generate=lambda model, prompt, **kwargs: llm(prompt, **kwargs)))
+    raw = email_gen.call_local_model([{"role": "user", "content": "leave"}], schema=email_gen.DRAFT_SCHEMA)
+    assert prompts[0].endswith('<|assistant|>\n{"subject": "')
+    assert json.loads(raw) == {"subject": "Leave on Monday", "body": "Dear team,\n\nI will be out."}
+
+
+@pytest.mark.parametrize("reply", [
+    '```json\n{"subject": "Leave request", "body": "Dear Sam,\\n\\nI need Monday off.",}\n```',  # fence, trailing comma
+    'Sure! Here is the email:\n{"subject": "Leave request", "body": "Dear Sam,\n\nI need Monday off."}',  # raw newlines
+    '{"subject": "Leave request", "body": "Dear Sam,\\n\\nI need Monday off.',  # cut off at MAX_TOKENS
+])
+def test_repair(reply):
+    assert repair_draft_json(reply) == {"subject": "Leave request", "body": "Dear Sam,\n\nI need Monday off."}
+
+
+def test_repair_rejects_non_json():
+    assert repair_draft_json("Subject: Hi\n\nplain text") is None
+    assert repair_draft_json('{"subject": "Hi", "body": "   ') is None
+
+
+def test_one_call_per_draft_and_retry_metric(fake):
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/generate")
+    with TestClient(app) as client:
+        out = client.post("/generate/draft", json={"prompt": "ask for leave on monday"}).json()
+        assert out["subject"] == DRAFT["subject"] and fake.calls == 1
+
+        # truncated reply: repaired, no second round trip
+        fake.reply = json.dumps(DRAFT)[:-10]
+        out = client.post("/generate/draft", json={"prompt": "ask for leave on tuesday"}).json()
+        assert out["subject"] == DRAFT["subject"] and out["body"].startswith("Dear [Manager's Name]")
+        assert fake.calls == 2
+
+        # nothing recoverable: the retry still runs, and is counted
+        fake.reply = "Subject: Hi\n\nplain text"
+        client.post("/generate/draft", json={"prompt": "say hi"})
+        assert fake.calls == 4
+
+        stats = client.get("/generate/parsing").json()
+    assert stats["structured_output"] is True
+    assert (stats["drafts"], stats["json"], stats["repaired"], stats["unparsed"], stats["retries"]) == (3, 1, 1, 2, 1)
+    assert stats["retry_rate"] == pytest.approx(1 / 3, abs=1e-3)
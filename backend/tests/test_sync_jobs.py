@@ -0,0 +1,135 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.models.db import Email, SyncJob
+from backend.services.sync_jobs import SyncWorkerPool, enqueue_job, job_progress, recover_jobs
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+
+def _wait(session_factory, job_ids, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        s = session_factory()
+        try:
+            jobs = [s.get(SyncJob, j) for j in job_ids]
+            if all(j.status in ("done", "failed") for j in jobs):
+                return [job_progress(j) for j in jobs]
+        finally:
+            s.close()
+        time.sleep(0.05)
+    raise AssertionError("jobs did not finish")
+
+
+def test_jobs_run_in_background_serialized_per_user(session_factory):
+    fake = FakeGmail(n_messages=30)
+    server = start_server(fake)
+    running, peak, lock = Counter(), Counter(), threading.Lock()
+
+    def service_factory(user_email):
+        with lock:
+            running[user_email] += 1
+            peak[user_email] = max(peak[user_email], running[user_email])
+        time.sleep(0.1)  # widen the window for a second same-user job
+        with lock:
+            running[user_email] -= 1
+        return fake_service(server)
+
+    s = session_factory()
+    ids = [enqueue_job(s, "a@example.com", max_results=30).id,
+           enqueue_job(s, "a@example.com", max_results=30, full=True).id,
+           enqueue_job(s, "b@example.com", max_results=30).id]
+    # an identical request while the first is still queued is coalesced
+    assert enqueue_job(s, "b@example.com", max_results=30).id == ids[2]
+    s.close()
+
+    pool = SyncWorkerPool(session_factory, service_factory, workers=4, poll=0.05)
+    try:
+        pool.start()
+        results = _wait(session_factory, ids)
+    finally:
+        pool.stop()
+
+    assert [r["status"] for r in results] == ["done"] * 3
+    assert peak["a@example.com"] == 1
+    assert results[0]["inserted"] + results[1]["inserted"] == 30 and results[2]["inserted"] == 30
+    assert results[0]["fetched"] == 30
+    s = session_factory()
+    assert s.query(Email).count() == 60
+    s.close()
+
+
+def test_interrupted_jobs_resume_after_restart(session_factory):
+    fake = FakeGmail(n_messages=10)
+    server = start_server(fake)
+    s = session_factory()
+    # left behind by a process that died mid-sync, plus one never started
+    s.add(SyncJob(user_email="me@example.com", kind="sync", params='{"max_results": 10}', status="running",
+                  fetched=0, inserted=0, deleted=0, failed=0, attempts=1))
+    s.add(SyncJob(user_email="me@example.com", kind="backfill", params="{}", status="queued",
+                  fetched=0, inserted=0, deleted=0, failed=0, attempts=0))
+    s.commit()
+    s.close()
+
+    pool = SyncWorkerPool(session_factory, lambda u: fake_service(server), workers=2, poll=0.05)
+    try:
+        pool.start()
+        sync, backfill = _wait(session_factory, [1, 2])
+    finally:
+        pool.stop()
+    assert sync["status"] == "done" and sync["inserted"] == 10
+    # everything was stored by the sync, so the backfill downloads nothing again
+    assert backfill["status"] == "done" and backfill["skipped"] == 10
+    assert backfill["fetched"] == 0 and backfill["inserted"] == 0
+
+
+def test_failed_job_reports_error(session_factory):
+    def no_token(user_email):
+        raise FileNotFoundError("Token file not found. Sign in via /auth/google first.")
+
+    pool = SyncWorkerPool(session_factory, no_token, workers=1, poll=0.05)
+    s = session_factory()
+    job_id = enqueue_job(s, "me@example.com").id
+    s.close()
+    try:
+        pool.start()
+        (res,) = _wait(session_factory, [job_id])
+    finally:
+        pool.stop()
+    assert res["status"] == "failed" and "Token file" in res["error"]
+
+
+def test_missing_job_is_skipped(session_factory):
+    pool = SyncWorkerPool(session_factory, lambda u: None, workers=0)
+    pool.run_job(42)  # no such row: logged and ignored, not an AttributeError
+    s = session_factory()
+    assert s.query(SyncJob).count() == 0
+    s.close()
+
+
+def test_only_stale_running_jobs_are_recovered(session_factory):
+    now = datetime.utcnow()
+    s = session_factory()
+    # one job kept alive by another live process, one whose process stopped renewing it
+    for user, beat in (("live@example.com", now - timedelta(seconds=10)), ("dead@example.com", now - timedelta(seconds=300))):
+        s.add(SyncJob(user_email=user, kind="sync", params="{}", status="running", started_at=now - timedelta(seconds=600),
+                      heartbeat_at=beat, fetched=0, inserted=0, deleted=0, failed=0, attempts=1))
+    s.commit()
+
+    assert recover_jobs(s, lease=120) == 1
+    assert {j.user_email: j.status for j in s.query(SyncJob)} == {"live@example.com": "running", "dead@example.com": "queued"}
+
+    # this process's own running job gets its lease renewed
+    pool = SyncWorkerPool(session_factory, lambda u: None, workers=0, lease=120)
+    live = s.query(SyncJob).filter_by(user_email="live@example.com").one()
+    pool._running.add(live.id)
+    pool.heartbeat()
+    s.expire_all()
+    assert s.get(SyncJob, live.id).heartbeat_at > now
+    s.close()
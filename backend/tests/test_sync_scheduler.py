@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.models.db import SyncJob
+from backend.services.sync_jobs import SyncWorkerPool
+from backend.services.sync_scheduler import SyncScheduler
+from backend.tests.fake_gmail import FakeGmail, start_server, fake_service
+
+USERS = ["a@example.com", "b@example.com", "c@example.com"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _drain(pool):
+    """Run every claimable job in the test thread."""
+    while True:
+        job_id = pool.claim_next()
+        if job_id is None:
+            return
+        pool.run_job(job_id)
+
+
+def test_scheduler_adapts_intervals_and_bounds_in_flight(session_factory):
+    fakes = {u: FakeGmail(n_messages=5) for u in USERS}
+    servers = {u: start_server(f) for u, f in fakes.items()}
+    pool = SyncWorkerPool(session_factory, lambda u: fake_service(servers[u]), workers=0)
+    clock = Clock()
+    sched = SyncScheduler(session_factory, lambda: USERS, max_in_flight=2, interval_min=10,
+                          interval_max=160, interval_start=40, jitter=0, clock=clock)
+
+    sched.tick()  # discovers accounts, first syncs spread over [0, 40)
+    clock.now += 40
+    sched.tick()
+    state = sched.state()
+    assert state["in_flight"] == 2  # third due account waits for a slot
+    assert len({a["job_id"] for a in state["accounts"]} - {None}) == 2
+
+    _drain(pool)
+    clock.now += 1
+    sched.tick()  # collects both results and queues the third account
+    _drain(pool)
+    sched.tick()
+    accounts = {a["user_email"]: a for a in sched.state()["accounts"]}
+    assert all(a["runs"] == 1 and a["last_status"] == "done" for a in accounts.values())
+    # first sync inserted mail -> interval halves
+    assert all(a["interval_s"] == 20 for a in accounts.values())
+    assert all(a["last_latency_s"] is not None for a in accounts.values())
+
+    # a busy and an idle mailbox drift apart; every account still gets turns
+    for _ in range(4):
+        fakes["a@example.com"].add_message(f"new{clock.now}")
+        clock.now += 200
+        for _ in range(3):
+            sched.tick()
+            _drain(pool)
+        clock.now += 1
+        sched.tick()
+    accounts = {a["user_email"]: a for a in sched.state()["accounts"]}
+    assert accounts["a@example.com"]["interval_s"] == 10
+    assert accounts["b@example.com"]["interval_s"] == 101.2  # 20 * 1.5 ** 4
+    assert accounts["c@example.com"]["runs"] == 5
+
+    s = session_factory()
+    assert s.query(SyncJob).filter(SyncJob.status != "done").count() == 0
+    s.close()
+
+
+def test_failing_account_backs_off(session_factory):
+
+    def revoked(user_email):
+        raise FileNotFoundError("Token file not found. Sign in via /auth/google first.")
+
+    pool = SyncWorkerPool(session_factory, revoked, workers=0)
+    clock = Clock()
+    sched = SyncScheduler(session_factory, lambda: ["x@example.com"], max_in_flight=1, interval_min=10,
+                          interval_max=100, interval_start=20, jitter=0, clock=clock)
+    sched.tick()
+    for _ in range(4):
+        clock.now += 200
+        sched.tick()
+        _drain(pool)
+        sched.tick()
+    (acct,) = sched.state()["accounts"]
+    assert acct["failures"] == 4 and acct["interval_s"] == 100
+    assert "Token file" in acct["last_error"]
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import asyncio
+
+# Add repo root to path so `backend.` imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import email_gen, token_budget
+from backend.tests.fake_llm import DRAFT
+
+
+def draft(**kwargs):
+    return asyncio.run(email_gen.agenerate_email_json_forced("ask for leave on monday", **kwargs))
+
+
+def test_budget_follows_length_and_language(monkeypatch):
+    budgets = [token_budget.draft_max_tokens(length, "en", "openai") for length in ("short", "medium", "detailed")]
+    assert budgets == sorted(budgets) and budgets[0] < 300 and budgets[-1] < 1200
+    assert token_budget.draft_max_tokens("medium", "hi", "openai") > token_budget.draft_max_tokens("medium", "en", "openai")
+
+    # Gemini 2.5 spends maxOutputTokens on thinking first
+    gemini = token_budget.draft_max_tokens("short", "en", "gemini")
+    assert gemini == budgets[0] + token_budget.GEMINI_THINKING_HEADROOM
+    assert token_budget.draft_max_tokens("short", "en", "gemini", "gemini-1.5-flash") == budgets[0]
+    monkeypatch.setattr(token_budget, "GEMINI_THINKING_BUDGET", 0)
+    assert token_budget.draft_max_tokens("short", "en", "gemini") == budgets[0]
+    assert token_budget.gemini_thinking_config("gemini-2.5-flash") == {"thinkingBudget": 0}
+    assert token_budget.gemini_thinking_config("gemini-1.5-flash") is None
+    # Pro cannot turn thinking off: it gets its minimum, and the budget reserves it
+    assert token_budget.gemini_thinking_config("gemini-2.5-pro") == {"thinkingBudget": 128}
+    assert token_budget.draft_max_tokens("short", "en", "gemini", "gemini-2.5-pro") == budgets[0] + 128
+
+
+def test_requests_carry_the_length_budget(fake_llm, monkeypatch):
+    draft(length="short")
+    config = fake_llm.bodies[-1]["generationConfig"]
+    assert config["maxOutputTokens"] == token_budget.draft_max_tokens("short", "en", "gemini", email_gen.MODEL)
+    # unset: thinking is capped at the headroom the budget reserves for it
+    assert config["thinkingConfig"] == {"thinkingBudget": token_budget.GEMINI_THINKING_HEADROOM}
+
+    monkeypatch.setattr(token_budget, "GEMINI_THINKING_BUDGET", 256)
+    draft(length="short")
+    assert fake_llm.bodies[-1]["generationConfig"]["thinkingConfig"] == {"thinkingBudget": 256}
+
+    fake_llm.use("http")
+    draft(length="detailed", model="gpt-4o-mini")
+    draft(length="short", model="gpt-4o-mini")
+    assert fake_llm.bodies[-2]["max_tokens"] > fake_llm.bodies[-1]["max_tokens"] == token_budget.draft_max_tokens("short", "en", "http")
+
+
+def test_thinking_allowance_follows_the_serving_provider(fake_llm, monkeypatch):
+    limiter_charges = []
+    charge = email_gen.rate_limit.limiter.aacquire
+
+    async def recording(provider, model, tokens):
+        limiter_charges.append((provider, tokens))
+        return await charge(provider, model, tokens)
+
+    monkeypatch.setattr(email_gen.rate_limit.limiter, "aacquire", recording)
+    out = token_budget.output_budget("short", "en")
+
+    # gemini primary fails over to openai: the fallback asks for the reply's budget only
+    monkeypatch.setattr(email_gen, "LLM_FALLBACK_PROVIDERS", ["http"])
+    fake_llm.failures.append(400)
+    draft(length="short")
+    assert fake_llm.bodies[-2]["generationConfig"]["maxOutputTokens"] == out + token_budget.GEMINI_THINKING_HEADROOM
+    assert fake_llm.bodies[-1]["max_tokens"] == out
+    assert limiter_charges[-1][0] == "openai" and limiter_charges[-1][1] < limiter_charges[-2][1]  # billed without it too
+
+    # openai primary falling over to gemini: the allowance is added once
+    fake_llm.use("http")
+    monkeypatch.setattr(email_gen, "LLM_FALLBACK_PROVIDERS", ["gemini"])
+    fake_llm.failures.append(400)
+    draft(length="short", model="gpt-4o-mini")
+    assert fake_llm.bodies[-2]["max_tokens"] == out
+    assert fake_llm.bodies[-1]["generationConfig"]["maxOutputTokens"] == out + token_budget.GEMINI_THINKING_HEADROOM
+
+
+def test_short_budget_fits_a_short_draft(fake_llm):
+    fake_llm.use("http")
+    full = draft(length="short", model="gpt-4o-mini")
+    fake_llm.truncate = True
+    assert draft(length="short", model="gpt-4o-mini") == full and full["subject"] == DRAFT["subject"]
+    assert len(fake_llm.reply_for(fake_llm.bodies[-1])) == len(json.dumps(DRAFT))
+
+
+def test_compact_prompt():
+    messages, _ = email_gen.build_draft_messages("ask for leave on monday", length="short", target_lang="hi")
+    assert [m["role"] for m in messages] == ["system", "user"]  # no worked example with native JSON output
+    assert messages[-1]["content"].count("Hindi") == 1 and "50-100 words" in messages[-1]["content"]
+    english, _ = email_gen.build_draft_messages("ask for leave on monday")
+    assert "not English" not in english[-1]["content"]
+    assert token_budget.count_message_tokens(english) < 200
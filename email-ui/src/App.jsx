@@ -1,4 +1,4 @@
-import React, { useEffect, useMemo, useState } from "react";
+import React, { useEffect, useMemo, useRef, useState } from "react";
 import * as bootstrap from "bootstrap";
 import "bootstrap-icons/font/bootstrap-icons.css";
 
@@ -22,6 +22,8 @@ export default function App() {
   const [selected, setSelected] = useState(new Set());
   const [openMail, setOpenMail] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [composeData, setComposeData] = useState(null);
   const [theme, setTheme] = useState(localStorage.getItem("theme") || "light");
   const [listWidth, setListWidth] = useState(parseInt(localStorage.getItem("listWidth")) || 400);
@@ -66,19 +68,35 @@ export default function App() {
   const load = async (f = folder) => {
     if (!userEmail) {
       setEmails([]);
+      setNextCursor(null);
       setLoading(false);
       return;
     }
     setLoading(true);
     try {
-      const data = await api.list(f, userEmail);
-      setEmails(data.map((x) => ({ ...x, starred: x.starred ?? false })));
+      const page = await api.list(f, userEmail);
+      setEmails(page.items.map((x) => ({ ...x, starred: x.starred ?? false })));
+      setNextCursor(page.next_cursor);
     } catch (e) {
       toast({ title: "Failed to load", desc: String(e), variant: "error" });
     } finally {
       setLoading(false);
     }
   };
+
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await api.list(folder, userEmail, nextCursor);
+      setEmails((arr) => [...arr, ...page.items.map((x) => ({ ...x, starred: x.starred ?? false }))]);
+      setNextCursor(page.next_cursor);
+    } catch (e) {
+      toast({ title: "Failed to load more", desc: String(e), variant: "error" });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   useEffect(() => { load(folder); }, [folder, userEmail]); // Reload when folder or userEmail changes
 
   // View switchers
@@ -88,16 +106,27 @@ export default function App() {
 
 
 
-  const filtered = useMemo(() => {
-    const q = search.trim().toLowerCase();
-    if (!q) return emails;
-    return emails.filter(
-      (e) =>
-        (e.subject || "").toLowerCase().includes(q) ||
-        (e.from_addr || "").toLowerCase().includes(q) ||
-        (e.body_text || "").toLowerCase().includes(q)
-    );
-  }, [emails, search]);
+  // Server-side full-text search (debounced) instead of filtering the loaded page
+  const [searchResults, setSearchResults] = useState(null);
+  useEffect(() => {
+    const q = search.trim();
+    if (!q || !userEmail) {
+      setSearchResults(null);
+      return;
+    }
+    let cancelled = false;
+    const t = setTimeout(async () => {
+      try {
+        const page = await api.search(q, userEmail, folder);
+        if (!cancelled) setSearchResults(page.items.map((x) => ({ ...x, starred: x.starred ?? false })));
+      } catch (e) {
+        if (!cancelled) toast({ title: "Search failed", desc: String(e), variant: "error" });
+      }
+    }, 250);
+    return () => { cancelled = true; clearTimeout(t); };
+  }, [search, folder, userEmail]);
+
+  const filtered = useMemo(() => (searchResults ?? emails), [emails, searchResults]);
 
   const toggle = (id) =>
     setSelected((s) => {
@@ -117,13 +146,24 @@ export default function App() {
     load();
   };
 
+  // Polling for the running sync; aborted by a newer sync or when the app unmounts
+  const syncPoll = useRef(null);
+  useEffect(() => () => syncPoll.current?.abort(), []);
+
   const doSync = async () => {
     if (!userEmail.trim()) return toast({ title: "Enter your Gmail", variant: "error" });
+    syncPoll.current?.abort();
+    const controller = new AbortController();
+    syncPoll.current = controller;
     try {
-      const res = await api.sync(userEmail.trim(), 50);
-      toast({ title: "Synced", desc: `${res.inserted || 0} new emails` });
+      const queued = await api.sync(userEmail.trim(), 50);
+      toast({ title: "Sync started", desc: "Fetching new mail in the background" });
+      const job = await api.waitForSync(queued.job_id, { signal: controller.signal });
+      if (job.status === "failed") throw new Error(job.error || "sync failed");
+      toast({ title: "Synced", desc: `${job.inserted || 0} new emails` });
       load();
     } catch (e) {
+      if (e.name === "AbortError") return;
       toast({ title: "Sync failed", desc: String(e), variant: "error" });
     }
   };
@@ -192,6 +232,9 @@ export default function App() {
                   onNotSpam={onNotSpam} 
                   loading={loading}
                   bulkMark={bulkMark}
+                  hasMore={!searchResults && !!nextCursor}
+                  loadingMore={loadingMore}
+                  onLoadMore={loadMore}
                 />
               </div>
 
@@ -217,7 +260,7 @@ export default function App() {
                       setComposeData({
                         to: mail.from_addr,
                         subject: `Re: ${mail.subject}`,
-                        body: `\n\nOn ${new Date(mail.received_at).toLocaleString()}, ${mail.from_addr} wrote:\n> ${mail.body_text.substring(0, 200)}...`
+                        body: `\n\nOn ${new Date(mail.received_at).toLocaleString()}, ${mail.from_addr} wrote:\n> ${(mail.body_text || mail.snippet || "").substring(0, 200)}...`
                       });
                       const modal = bootstrap.Modal.getOrCreateInstance(document.getElementById('composeModal'));
                       modal.show();
@@ -10,6 +10,7 @@ export function ComposeModal({ userEmail, onSent, toast, initialData }) {
   const [draft, setDraft] = useState(null);
   const [busy, setBusy] = useState(false);
   const closeBtn = useRef(null);
+  const lastRequest = useRef(null);
 
   // Load initial data when it changes
   React.useEffect(() => {
@@ -37,10 +38,23 @@ export function ComposeModal({ userEmail, onSent, toast, initialData }) {
             .join(' ')
             .trim()
         : "";
-      const d = await api.draft({ prompt, tone, length, target_lang: lang, sender_name: senderName });
+      // show subject/body as they stream in; the final event replaces them with the post-processed draft
+      setDraft({ subject: "", body: "" });
+      // pressing Generate again for the same request asks for a fresh draft instead of the cached one
+      const request = JSON.stringify({ prompt: prompt.trim(), tone, length, lang });
+      const cache = lastRequest.current === request ? "refresh" : "use";
+      lastRequest.current = request;
+      const d = await api.draftStream(
+        { prompt, tone, length, target_lang: lang, sender_name: senderName, cache },
+        {
+          onDelta: (field, text) => setDraft((cur) => ({ ...cur, [field]: (cur?.[field] || "") + text })),
+          onReset: () => setDraft({ subject: "", body: "" }),
+        }
+      );
       setDraft(d);
       toast({ title: "Draft ready", desc: d.intent, variant: "success" });
     } catch (e) {
+      setDraft(null);  // drop any half-streamed text
       toast({ title: "Generation failed", desc: String(e), variant: "error" });
     } finally {
       setBusy(false);
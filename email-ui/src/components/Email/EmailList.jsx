@@ -12,7 +12,10 @@ export function EmailList({
   onSpam, 
   onNotSpam, 
   loading,
-  bulkMark 
+  bulkMark,
+  hasMore,
+  loadingMore,
+  onLoadMore
 }) {
   const allSelected = emails.length > 0 && emails.every(e => selected.has(e.id));
 
@@ -67,8 +70,14 @@ export function EmailList({
         )}
       </div>
 
-      {/* List */}
-      <div className="flex-grow-1 overflow-auto">
+      {/* List - fetches the next page when scrolled near the bottom */}
+      <div
+        className="flex-grow-1 overflow-auto"
+        onScroll={(ev) => {
+          const el = ev.currentTarget;
+          if (hasMore && !loadingMore && el.scrollTop + el.clientHeight >= el.scrollHeight - 200) onLoadMore();
+        }}
+      >
         {loading ? (
           <SkeletonLoader count={8} />
         ) : emails.length === 0 ? (
@@ -80,19 +89,29 @@ export function EmailList({
             <p className="small opacity-75 mt-1">Your inbox is empty</p>
           </div>
         ) : (
-          emails.map((e, index) => (
-            <EmailRow
-              key={e.id}
-              e={e}
-              index={index}
-              selected={selected.has(e.id)}
-              toggle={toggle}
-              onOpen={onOpen}
-              onStar={onStar}
-              onSpam={onSpam}
-              onNotSpam={onNotSpam}
-            />
-          ))
+          <>
+            {emails.map((e, index) => (
+              <EmailRow
+                key={e.id}
+                e={e}
+                index={index}
+                selected={selected.has(e.id)}
+                toggle={toggle}
+                onOpen={onOpen}
+                onStar={onStar}
+                onSpam={onSpam}
+                onNotSpam={onNotSpam}
+              />
+            ))}
+            {hasMore && (
+              <div className="d-flex justify-content-center p-3">
+                <button className="btn btn-sm btn-light rounded-pill px-4" onClick={onLoadMore} disabled={loadingMore}>
+                  {loadingMore ? <i className="bi bi-arrow-repeat spin me-1" /> : <i className="bi bi-chevron-down me-1" />}
+                  Load more
+                </button>
+              </div>
+            )}
+          </>
         )}
       </div>
     </div>
@@ -50,7 +50,7 @@ export function EmailRow({ e, selected, toggle, onOpen, onStar, onSpam, onNotSpa
         <div className="text-truncate flex-grow-1">
           <span className={`fs-6 ${!e.read ? 'fw-bold text-main' : 'fw-semibold text-muted opacity-85'}`}>{e.subject || "(no subject)"}</span>
           <span className="mx-2 text-muted opacity-25">—</span>
-          <span className="text-muted small opacity-75">{e.body_text?.slice(0, 120)}</span>
+          <span className="text-muted small opacity-75">{e.snippet?.slice(0, 120)}</span>
         </div>
       </div>
 
@@ -1,14 +1,28 @@
 import React, { useState } from "react";
 import { api } from "../../services/api";
 
-export function ReadingPane({ mail, onClose, onReply }) {
+export function ReadingPane({ mail: row, onClose, onReply }) {
   const [summary, setSummary] = useState(null);
   const [loadingSummary, setLoadingSummary] = useState(false);
+  const [detail, setDetail] = useState(null);
+
+  // List rows carry only the snippet; fetch the full body when a mail is opened
+  React.useEffect(() => {
+    setDetail(null);
+    if (!row?.id) return;
+    let cancelled = false;
+    api.get(row.id)
+      .then((d) => { if (!cancelled) setDetail(d); })
+      .catch((e) => console.error(e));
+    return () => { cancelled = true; };
+  }, [row?.id]);
+
+  const mail = detail ? { ...row, ...detail } : row;
 
   const doSummary = async () => {
     setLoadingSummary(true);
     try {
-      const res = await api.summary(mail.body_text);
+      const res = await api.summary(mail.body_text || mail.snippet || "");
       setSummary(res.summary);
     } catch (e) {
       console.error(e);
@@ -72,7 +86,7 @@ export function ReadingPane({ mail, onClose, onReply }) {
           <button 
             className="btn btn-primary rounded-pill d-flex align-items-center gap-2 px-4 shadow-md transition-all"
             onClick={doSummary}
-            disabled={loadingSummary || summary}
+            disabled={loadingSummary || summary || !detail}
           >
             {loadingSummary ? <i className="bi bi-arrow-repeat spin" /> : <i className="bi bi-stars" />}
             <span className="fw-bold">{summary ? 'Summarized' : 'AI Summary'}</span>
@@ -110,7 +124,7 @@ export function ReadingPane({ mail, onClose, onReply }) {
           className="email-body fs-6" 
           style={{ whiteSpace: "pre-wrap", wordBreak: "break-word", lineHeight: "1.8", color: "var(--text-muted)", fontWeight: "400" }}
         >
-          {mail.body_text}
+          {detail ? mail.body_text : <span className="opacity-50">{mail.snippet}</span>}
         </div>
       </div>
     </div>
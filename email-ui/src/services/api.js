@@ -1,8 +1,24 @@
 export const API = import.meta?.env?.VITE_API_URL || "http://localhost:8000";
 
 export const api = {
-  list: async (folder, userEmail) => {
-    const r = await fetch(`${API}/emails?folder=${encodeURIComponent(folder)}&user_email=${encodeURIComponent(userEmail || "")}`);
+  // Returns one page: { items, next_cursor }. Pass next_cursor back to get the following page.
+  list: async (folder, userEmail, cursor = null, limit = 50) => {
+    let url = `${API}/emails?folder=${encodeURIComponent(folder)}&user_email=${encodeURIComponent(userEmail || "")}&limit=${limit}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const r = await fetch(url);
+    if (!r.ok) throw new Error(await r.text());
+    return r.json();
+  },
+  // Ranked full-text search over subject, from/to and body: { items, next_offset }.
+  search: async (q, userEmail, folder = "all", offset = 0, limit = 50) => {
+    const params = new URLSearchParams({ q, user_email: userEmail || "", folder, offset, limit });
+    const r = await fetch(`${API}/emails/search?${params}`);
+    if (!r.ok) throw new Error(await r.text());
+    return r.json();
+  },
+  // Full message including body_text (list rows only carry the snippet).
+  get: async (id) => {
+    const r = await fetch(`${API}/emails/${id}`);
     if (!r.ok) throw new Error(await r.text());
     return r.json();
   },
@@ -11,6 +27,7 @@ export const api = {
     if (!r.ok) throw new Error(await r.text());
     return r.json();
   },
+  // Queues a background sync; returns the job ({ job_id, status, ... }).
   sync: async (email, max = 50) => {
     const r = await fetch(`${API}/emails/sync?user_email=${encodeURIComponent(email)}&max_results=${max}`, {
       method: "POST",
@@ -18,6 +35,29 @@ export const api = {
     if (!r.ok) throw new Error(await r.text());
     return r.json();
   },
+  syncJob: async (jobId, signal) => {
+    const r = await fetch(`${API}/emails/sync/${jobId}`, { signal });
+    if (!r.ok) throw new Error(await r.text());
+    return r.json();
+  },
+  // Poll a sync job until it is done or failed. Gives up after timeoutMs;
+  // aborting `signal` stops polling (the job itself keeps running on the server).
+  waitForSync: async (jobId, { intervalMs = 1500, timeoutMs = 10 * 60 * 1000, signal } = {}) => {
+    const deadline = Date.now() + timeoutMs;
+    for (;;) {
+      const job = await api.syncJob(jobId, signal);
+      if (job.status === "done" || job.status === "failed") return job;
+      if (Date.now() + intervalMs > deadline) {
+        throw new Error(`Sync is still ${job.status} after ${Math.round(timeoutMs / 1000)}s; check back later.`);
+      }
+      await new Promise((res, rej) => {
+        const onAbort = () => { clearTimeout(t); rej(new DOMException("Sync polling aborted", "AbortError")); };
+        const t = setTimeout(() => { signal?.removeEventListener("abort", onAbort); res(); }, intervalMs);
+        if (signal?.aborted) onAbort();
+        else signal?.addEventListener("abort", onAbort, { once: true });
+      });
+    }
+  },
   draft: async (payload) => {
     // Create AbortController for timeout
     const controller = new AbortController();
@@ -45,6 +85,58 @@ export const api = {
       throw error;
     }
   },
+  // Streams a draft over Server-Sent Events. onDelta(field, text) gets subject/body
+  // text as the model writes it; onReset() means discard it (a retry follows).
+  // Resolves with the final post-processed draft, which replaces the streamed text.
+  draftStream: async (payload, { onStart, onDelta, onReset } = {}) => {
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), 90000); // 90 seconds for model cold start
+    try {
+      const r = await fetch(`${API}/generate/draft/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
+        signal: controller.signal,
+      });
+      if (!r.ok) {
+        const errorText = await r.text();
+        throw new Error(errorText || `Server error: ${r.status}`);
+      }
+      const reader = r.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+          const frame = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          let event = "message";
+          let data = "";
+          for (const line of frame.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          const msg = data ? JSON.parse(data) : {};
+          if (event === "start") onStart?.(msg);
+          else if (event === "subject" || event === "body") onDelta?.(event, msg.delta);
+          else if (event === "reset") onReset?.();
+          else if (event === "error") throw new Error(msg.detail || "Generation failed");
+          else if (event === "done") return msg;
+        }
+      }
+      throw new Error("Draft stream ended early");
+    } catch (error) {
+      if (error.name === 'AbortError') {
+        throw new Error('Request timed out. The AI model might be loading - please try again in a moment.');
+      }
+      throw error;
+    } finally {
+      clearTimeout(timeoutId);
+    }
+  },
   send: async (payload) => {
     const r = await fetch(`${API}/send`, {
       method: "POST",